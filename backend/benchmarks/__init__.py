@@ -0,0 +1,5 @@
+"""Бенчмарки горячих путей приложения surveys.
+
+Запуск из каталога backend: ``python -m benchmarks.<модуль>``.
+Каждый бенчмарк работает на отдельной тестовой базе данных.
+"""
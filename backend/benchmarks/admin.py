@@ -0,0 +1,49 @@
+"""Бенчмарк страниц админки на большом опросе: число запросов и время ответа.
+
+python -m benchmarks.admin --questions 100000 --iterations 5
+"""
+
+import argparse
+
+from benchmarks.common import make_survey, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    settings.ALLOWED_HOSTS = ["*"]
+    survey = make_survey(questions=args.questions, answers_per_question=2)
+    question = survey.questions.order_by("order").first()
+    flow = question.source_relationships.first()
+
+    client = Client()
+    client.force_login(User.objects.create_superuser("bench", password="bench"))
+    pages = {
+        "question changelist": reverse("admin:surveys_question_changelist"),
+        "answer changelist": reverse("admin:surveys_answer_changelist"),
+        "flow changelist": reverse("admin:surveys_questionflow_changelist"),
+        "question change": reverse("admin:surveys_question_change", args=[question.pk]),
+        "flow change": reverse("admin:surveys_questionflow_change", args=[flow.pk]),
+    }
+    for name, url in pages.items():
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        print(f"{name}: {len(queries)} запросов")
+        report(name, measure(lambda: client.get(url), args.iterations, warmup=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Нагрузочный тест чтения: синхронный WSGI против асинхронного ASGI.
+
+Запросы подаются прямо в обработчики Django без сети: под WSGI — из
+``--concurrency`` потоков (как потоковый воркер gunicorn), под ASGI — из
+стольких же задач в одном цикле событий (как воркер uvicorn) через то же
+приложение, что и ``core.asgi``. Под WSGI запросы обслуживают
+представления DRF, под ASGI — асинхронные представления из
+``surveys.async_views``.
+
+python -m benchmarks.asgi --concurrency 64 --requests 100
+python -m benchmarks.asgi --workload next --concurrency 256
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.common import percentile
+
+WORKLOADS = ("next", "answers", "bundle")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workload", action="append", choices=WORKLOADS)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=100, help="на клиента")
+    parser.add_argument("--questions", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(args, Path(directory) / "bench.sqlite3")
+
+
+def run(args, sqlite_file):
+    from benchmarks.common import make_survey, setup_django
+
+    setup_django(sqlite_file=sqlite_file)
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+    from django.contrib.auth.models import User
+    from django.core.handlers.asgi import ASGIHandler
+    from django.core.handlers.wsgi import WSGIHandler
+
+    from core.handlers import ReadRouter
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+
+    from surveys.bundle import get_bundle, get_survey_state
+    from surveys.flow_graph import get_flow_graph
+
+    survey = make_survey(questions=args.questions)
+    graph = get_flow_graph(survey.id)
+    get_bundle(get_survey_state(survey.id))
+    token = Token.objects.create(user=User.objects.create(username="bench"))
+    etag = get_survey_state(survey.id).etag
+    connection.close()
+
+    prefix = f"/api/surveys/{survey.id}"
+    headers = {"authorization": f"Token {token.key}"}
+    questions = [graph.questions[question_id] for question_id in graph.question_ids]
+
+    def next_request(rng):
+        question = rng.choice(questions[:-1])
+        answer = rng.choice(question.answers)
+        return f"{prefix}/next/", f"question={question.id}&answers={answer.id}", {}
+
+    def answers_request(rng):
+        question = rng.choice(questions)
+        return f"{prefix}/questions/{question.id}/answers/", "", {}
+
+    def bundle_request(rng):
+        return f"{prefix}/bundle/", "", {"if-none-match": etag}
+
+    requests = {
+        "next": next_request,
+        "answers": answers_request,
+        "bundle": bundle_request,
+    }
+    wsgi, asgi = WSGIHandler(), ReadRouter(ASGIHandler())
+    print(f"concurrency={args.concurrency} requests={args.concurrency * args.requests}")
+    for workload in args.workload or WORKLOADS:
+        make_request = requests[workload]
+        report(f"{workload} wsgi", *run_wsgi(wsgi, make_request, headers, args))
+        report(f"{workload} asgi", *run_asgi(asgi, make_request, headers, args))
+
+
+def run_wsgi(handler, make_request, headers, args):
+    from django.db import connection
+
+    samples, errors = [], []
+
+    def client(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(args.requests):
+                path, query, extra = make_request(rng)
+                environ = {
+                    "REQUEST_METHOD": "GET",
+                    "PATH_INFO": path,
+                    "QUERY_STRING": query,
+                    "SERVER_NAME": "testserver",
+                    "SERVER_PORT": "80",
+                    "SERVER_PROTOCOL": "HTTP/1.1",
+                    "wsgi.input": io.BytesIO(),
+                    "wsgi.url_scheme": "http",
+                }
+                for name, value in {**headers, **extra}.items():
+                    environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+                statuses = []
+                started = time.perf_counter()
+                response = handler(
+                    environ, lambda status, _headers: statuses.append(status)
+                )
+                b"".join(response)
+                response.close()
+                samples.append(time.perf_counter() - started)
+                if int(statuses[0].split()[0]) >= 400:
+                    errors.append(statuses[0])
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=client, args=(seed,))
+        for seed in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - started
+
+
+def run_asgi(application, make_request, headers, args):
+    samples, errors = [], []
+
+    async def client(seed):
+        rng = random.Random(seed)
+        for _ in range(args.requests):
+            path, query, extra = make_request(rng)
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "query_string": query.encode(),
+                "headers": [
+                    (b"host", b"testserver"),
+                    *(
+                        (name.encode(), value.encode())
+                        for name, value in {**headers, **extra}.items()
+                    ),
+                ],
+                "server": ("testserver", 80),
+                "client": ("127.0.0.1", 0),
+            }
+            statuses = []
+            body = [{"type": "http.request", "body": b"", "more_body": False}]
+            finished = asyncio.Event()
+
+            async def receive():
+                if body:
+                    return body.pop()
+                # Django ждёт отключения клиента, пока отдаёт ответ.
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+                elif not message.get("more_body"):
+                    finished.set()
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            samples.append(time.perf_counter() - started)
+            if statuses[0] >= 400:
+                errors.append(str(statuses[0]))
+
+    async def clients():
+        await asyncio.gather(*(client(seed) for seed in range(args.concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(clients())
+    return samples, errors, time.perf_counter() - started
+
+
+def report(name, samples, errors, elapsed):
+    print(
+        f"{name:<14} {elapsed:7.2f}s rps={len(samples) / elapsed:8.0f} "
+        f"p50={percentile(samples, 50) * 1e3:7.2f}ms "
+        f"p99={percentile(samples, 99) * 1e3:7.2f}ms "
+        f"errors={len(errors)}"
+        + (f" ({', '.join(sorted(set(errors)))})" if errors else ""),
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
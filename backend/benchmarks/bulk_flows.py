@@ -0,0 +1,85 @@
+"""Бенчмарк массовой загрузки связей: один запрос против поштучного создания.
+
+python -m benchmarks.bulk_flows --edges 2000
+"""
+
+import argparse
+import time
+
+from benchmarks.common import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=2000)
+    parser.add_argument(
+        "--single",
+        type=int,
+        default=200,
+        help="сколько связей создать поштучно для сравнения",
+    )
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+    from surveys.models import Answer, Question, QuestionFlow, Survey
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username="bench"))
+
+    def make_payload():
+        survey = Survey.objects.create(title="Bulk")
+        count = args.edges // 2 + 1
+        questions = Question.objects.bulk_create(
+            Question(survey=survey, text=f"Вопрос {i}", order=i) for i in range(count)
+        )
+        answers = Answer.objects.bulk_create(
+            Answer(question=question, text="Ответ") for question in questions
+        )
+        payload = []
+        for index in range(count - 1):
+            payload.append(
+                {
+                    "source_question": questions[index].id,
+                    "target_question": questions[index + 1].id,
+                    "relationship_type": FLOW_TYPE_ANY_ANSWER,
+                }
+            )
+            payload.append(
+                {
+                    "source_question": questions[index].id,
+                    "target_question": questions[-1].id,
+                    "relationship_type": FLOW_TYPE_SPECIFIC_ANSWER,
+                    "source_answer": answers[index].id,
+                }
+            )
+        return payload[: args.edges]
+
+    payload = make_payload()
+    started = time.perf_counter()
+    response = client.post(reverse("questionflow-bulk"), payload, format="json")
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 201, response.content
+    print(f"bulk create {len(payload)} edges: {elapsed * 1000:.1f}ms")
+
+    payload = make_payload()[: args.single]
+    url = reverse("questionflow-list")
+    started = time.perf_counter()
+    for item in payload:
+        response = client.post(url, item, format="json")
+        assert response.status_code == 201, response.content
+    elapsed = time.perf_counter() - started
+    print(
+        f"single create {len(payload)} edges: {elapsed * 1000:.1f}ms "
+        f"(~{elapsed / len(payload) * args.edges * 1000:.0f}ms for {args.edges})"
+    )
+    print(f"total flows: {QuestionFlow.objects.count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Бенчмарк копирования опроса пакетными вставками.
+
+python -m benchmarks.cloning --questions 5000 --iterations 5
+"""
+
+import argparse
+
+from benchmarks.common import make_survey, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from surveys.cloning import clone_survey
+
+    survey = make_survey(questions=args.questions)
+    with CaptureQueriesContext(connection) as queries:
+        clone_survey(survey.id)
+    print(f"Запросов на одну копию: {len(queries)}")
+
+    report(
+        f"clone_survey ({args.questions} вопросов)",
+        measure(lambda: clone_survey(survey.id), args.iterations, warmup=1),
+    )
+
+
+if __name__ == "__main__":
+    main()
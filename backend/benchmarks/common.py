@@ -0,0 +1,100 @@
+"""Общие утилиты бенчмарков: настройка Django, генерация данных и отчёт"""
+
+import os
+import statistics
+import time
+
+
+def setup_django(sqlite_file=None):
+    """Настраивает Django и создаёт тестовую базу данных.
+
+    ``sqlite_file`` — путь к файлу тестовой базы SQLite вместо базы в
+    памяти, чтобы соединения разных потоков работали как в продакшене.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    if sqlite_file is not None and connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = str(sqlite_file)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def make_survey(questions=100, answers_per_question=4):
+    """Создаёт ветвящийся опрос массовыми вставками.
+
+    Первый ответ каждого вопроса перескакивает через один вопрос,
+    остальные ведут к следующему вопросу.
+    """
+    from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+    from surveys.flow_graph import invalidate_flow_graph
+    from surveys.models import Answer, Question, QuestionFlow, Survey
+
+    survey = Survey.objects.create(title="Benchmark")
+    question_objs = Question.objects.bulk_create(
+        Question(survey=survey, text=f"Вопрос {i}", order=i) for i in range(questions)
+    )
+    answer_objs = Answer.objects.bulk_create(
+        Answer(question=question, text=f"Ответ {j}", order=j)
+        for question in question_objs
+        for j in range(answers_per_question)
+    )
+    first_answers = answer_objs[::answers_per_question]
+
+    flows = []
+    for index, question in enumerate(question_objs[:-1]):
+        flows.append(
+            QuestionFlow(
+                source_question=question,
+                target_question=question_objs[index + 1],
+                relationship_type=FLOW_TYPE_ANY_ANSWER,
+            )
+        )
+        if index + 2 < questions:
+            flows.append(
+                QuestionFlow(
+                    source_question=question,
+                    target_question=question_objs[index + 2],
+                    relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+                    source_answer=first_answers[index],
+                )
+            )
+    QuestionFlow.objects.bulk_create(flows, batch_size=1000)
+    invalidate_flow_graph(survey.id)
+    return survey
+
+
+def measure(func, iterations, warmup=50):
+    """Замеряет длительность вызовов ``func`` в секундах"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, value):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(value / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def report(name, samples):
+    """Печатает p50/p99 и пропускную способность одного потока"""
+    total = sum(samples)
+    print(
+        f"{name:<40} n={len(samples):<7} "
+        f"p50={percentile(samples, 50) * 1e6:9.1f}us "
+        f"p99={percentile(samples, 99) * 1e6:9.1f}us "
+        f"mean={statistics.fmean(samples) * 1e6:9.1f}us "
+        f"rps={len(samples) / total:9.0f}"
+    )
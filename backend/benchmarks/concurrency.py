@@ -0,0 +1,169 @@
+"""Бенчмарк конкурентной записи: связи и ответы из нескольких потоков.
+
+Каждый профиль базы данных запускается в отдельном процессе со своими
+переменными окружения (см. ``core/database.py``), внутри — несколько
+потоков со своими соединениями отправляют запросы через API.
+
+python -m benchmarks.concurrency --threads 8 --requests 200
+python -m benchmarks.concurrency --profile sqlite-wal --profile postgresql
+
+Профиль ``postgresql`` берёт параметры подключения из переменных
+``DB_*`` текущего окружения.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROFILES = {
+    # Настройки SQLite по умолчанию: журнал отката, синхронизация на каждой
+    # фиксации и отложенный захват блокировки записи.
+    "sqlite-default": {
+        "DB_ENGINE": "sqlite",
+        "DB_SQLITE_JOURNAL_MODE": "DELETE",
+        "DB_SQLITE_SYNCHRONOUS": "FULL",
+        "DB_SQLITE_TIMEOUT": "5",
+        "DB_SQLITE_TRANSACTION_MODE": "",
+    },
+    "sqlite-wal": {"DB_ENGINE": "sqlite"},
+    "postgresql": {"DB_ENGINE": "postgresql", "DB_POOL": "1"},
+}
+WORKLOADS = ("flows", "responses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES))
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="на поток")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    for name in args.profile or ["sqlite-default", "sqlite-wal"]:
+        print(f"== {name}", flush=True)
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks.concurrency",
+            "--worker",
+            f"--threads={args.threads}",
+            f"--requests={args.requests}",
+        ]
+        result = subprocess.run(command, env={**os.environ, **PROFILES[name]})
+        if result.returncode:
+            print(f"профиль {name} завершился с кодом {result.returncode}")
+
+
+def run_worker(args):
+    with tempfile.TemporaryDirectory() as directory:
+        _run_worker(args, Path(directory) / "bench.sqlite3")
+
+
+def _run_worker(args, sqlite_file):
+    from benchmarks.common import make_survey, setup_django
+
+    setup_django(sqlite_file=sqlite_file)
+    # Ошибки блокировок считаются ниже; трассировки 500 только мешают отчёту.
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from surveys.flow_graph import get_flow_graph
+
+    options = connection.settings_dict.get("OPTIONS", {})
+    print(f"{connection.vendor}: {options.get('init_command') or options}")
+
+    total = args.threads * args.requests
+    # Связи 0 -> 3.., 1 -> 4.., ... не пересекаются с рёбрами make_survey
+    # и не образуют циклов.
+    questions = 3
+    while (questions - 3) * (questions - 2) // 2 < total:
+        questions += 1
+    survey = make_survey(questions=questions, answers_per_question=2)
+    graph = get_flow_graph(survey.id)
+    ids = graph.question_ids
+    pairs = iter(
+        (ids[source], ids[target])
+        for source in range(len(ids))
+        for target in range(source + 3, len(ids))
+    )
+    pairs_lock = threading.Lock()
+    first = graph.questions[ids[0]]
+    user = User.objects.create(username="bench")
+    sessions = itertools.count()
+    connection.close()
+
+    def flows(client):
+        with pairs_lock:
+            source, target = next(pairs)
+        return client.post(
+            reverse("questionflow-list"),
+            {
+                "source_question": source,
+                "target_question": target,
+                "relationship_type": "any",
+            },
+            format="json",
+        )
+
+    def responses(client):
+        return client.post(
+            reverse("survey-responses", kwargs={"survey_id": survey.id}),
+            {
+                "session": f"s{next(sessions)}",
+                "is_complete": True,
+                "items": [{"question": first.id, "answers": [first.answers[0].id]}],
+            },
+            format="json",
+        )
+
+    for workload, request in (("flows", flows), ("responses", responses)):
+        errors = []
+
+        def worker():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for _ in range(args.requests):
+                    try:
+                        response = request(client)
+                    except Exception as error:  # noqa: BLE001
+                        errors.append(type(error).__name__)
+                        continue
+                    if response.status_code >= 400:
+                        errors.append(str(response.status_code))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        print(
+            f"{workload:<10} threads={args.threads:<3} requests={total:<6} "
+            f"{elapsed:7.2f}s rps={(total - len(errors)) / elapsed:8.0f} "
+            f"errors={len(errors)}"
+            + (f" ({', '.join(sorted(set(errors)))})" if errors else ""),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Микробенчмарк условий переходов: компиляция и шаг навигации.
+
+Для каждого числа правил строится граф в памяти: у каждого вопроса по
+``--per-question`` условных переходов и один безусловный. Условия
+сочетают выбранные ответы, их отрицания и числовые пороги. Отдельно
+замеряется худший случай — все правила на одном вопросе, и ни одно
+не выполняется.
+
+python -m benchmarks.conditions --rules 10 100 1000 10000 --iterations 20000
+"""
+
+import argparse
+import itertools
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+
+def build_graph(rules, per_question, rng):
+    from surveys.constants import FLOW_TYPE_ANY_ANSWER, QUESTION_TYPE_MULTIPLE
+    from surveys.flow_graph import AnswerNode, FlowEdge, FlowGraph, QuestionNode
+
+    question_count = rules // per_question + 2
+    questions = [
+        QuestionNode(
+            id=number,
+            text=str(number),
+            question_type=QUESTION_TYPE_MULTIPLE,
+            order=number,
+            is_required=False,
+            answers=tuple(
+                AnswerNode(id=number * 10 + answer, text="", order=answer)
+                for answer in range(4)
+            ),
+        )
+        for number in range(1, question_count + 1)
+    ]
+    edges = []
+
+    def add(source, target, condition="", priority=0):
+        edges.append(
+            FlowEdge(
+                len(edges) + 1,
+                source,
+                target,
+                FLOW_TYPE_ANY_ANSWER,
+                None,
+                priority,
+                condition,
+            )
+        )
+
+    for number in range(1, question_count):
+        conditions = min(per_question, rules - len(edges) + number - 1)
+        for rule in range(max(conditions, 0)):
+            earlier = [rng.randint(1, number) for _ in range(3)]
+            condition = (
+                f"A{earlier[0] * 10 + rng.randrange(4)} "
+                f"and not A{earlier[1] * 10 + rng.randrange(4)} "
+                f"or Q{earlier[2]} >= {rng.randrange(100)}"
+            )
+            target = min(question_count, number + 2 + rule)
+            add(number, target, condition, rule)
+        add(number, number + 1, priority=per_question)
+    return FlowGraph(1, questions, edges)
+
+
+def build_hub(rules):
+    """Один вопрос со всеми правилами, ни одно из которых не выполняется"""
+    from surveys.constants import FLOW_TYPE_ANY_ANSWER, QUESTION_TYPE_SINGLE
+    from surveys.flow_graph import AnswerNode, FlowEdge, FlowGraph, QuestionNode
+
+    questions = [
+        QuestionNode(
+            id=number,
+            text=str(number),
+            question_type=QUESTION_TYPE_SINGLE,
+            order=number,
+            is_required=False,
+            answers=(AnswerNode(id=number, text="", order=0),),
+        )
+        for number in range(1, rules + 2)
+    ]
+    edges = [
+        FlowEdge(target, 1, target, FLOW_TYPE_ANY_ANSWER, None, target, f"A{target}")
+        for target in range(2, rules + 2)
+    ]
+    return FlowGraph(1, questions, edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--per-question", type=int, default=4)
+    parser.add_argument("--history", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    for rules in args.rules:
+        rng = random.Random(rules)
+        graph = build_graph(rules, args.per_question, rng)
+        question_ids = graph.question_ids[:-1]
+        answer_ids = [
+            answer.id
+            for question_id in question_ids
+            for answer in graph.questions[question_id].answers
+        ]
+
+        # Шаги готовятся заранее, чтобы замер не включал генерацию данных.
+        steps = itertools.cycle(
+            [
+                (
+                    rng.choice(question_ids),
+                    rng.sample(answer_ids, min(args.history, len(answer_ids))),
+                    {rng.choice(question_ids): rng.randrange(100)},
+                )
+                for _ in range(1000)
+            ]
+        )
+
+        def step():
+            question_id, history, values = next(steps)
+            graph.next_question(question_id, (), history, values)
+
+        iterations = max(3, args.iterations // rules)
+        report(
+            f"compile {rules} rules",
+            measure(
+                lambda: build_graph(rules, args.per_question, random.Random(rules)),
+                iterations,
+                warmup=1,
+            ),
+        )
+        report(f"next_question ({rules} rules)", measure(step, args.iterations))
+
+        hub = build_hub(rules)
+        report(
+            f"next_question ({rules} rules, one question)",
+            measure(lambda: hub.next_question(1), iterations, warmup=1),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Бенчмарк горячих выборок связей до и после составных индексов.
+
+Строит набор из ``--flows`` связей (по умолчанию миллион), замеряет
+выборки с индексами из миграций, затем заменяет их одиночными индексами
+внешних ключей, как было до миграции 0005, и замеряет снова.
+
+python -m benchmarks.indexes --flows 1000000 --iterations 2000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import measure, report, setup_django
+
+QUESTIONS_PER_SURVEY = 100
+FLOWS_PER_QUESTION = 10
+ANSWERS_PER_QUESTION = 3
+
+NEW_INDEXES = {
+    "question": ["question_survey_order"],
+    "answer": ["answer_question_order"],
+    "questionflow": ["flow_source_type_answer", "flow_target_source"],
+}
+# Одиночные индексы внешних ключей, которые были до миграции 0005.
+OLD_INDEXES = {
+    "question": ["survey_id"],
+    "answer": ["question_id"],
+    "questionflow": ["source_question_id", "target_question_id"],
+}
+
+
+def populate(flows):
+    """Заполняет базу пакетными вставками, минуя ORM"""
+    from django.db import connection
+    from django.utils import timezone
+
+    from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+
+    surveys = max(1, flows // (QUESTIONS_PER_SURVEY * FLOWS_PER_QUESTION))
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO surveys_survey (id, title, description, is_active, "
+            "created_at, updated_at) VALUES (%s, %s, '', 1, %s, %s)",
+            [(s + 1, f"Опрос {s}", now, now) for s in range(surveys)],
+        )
+        question_id = 0
+        question_rows = []
+        answer_rows = []
+        flow_rows = []
+        for survey in range(1, surveys + 1):
+            first = question_id + 1
+            for order in range(QUESTIONS_PER_SURVEY):
+                question_id += 1
+                question_rows.append((question_id, survey, order, now, now))
+                for answer in range(ANSWERS_PER_QUESTION):
+                    answer_rows.append(
+                        (
+                            (question_id - 1) * ANSWERS_PER_QUESTION + answer + 1,
+                            question_id,
+                            answer,
+                            now,
+                            now,
+                        )
+                    )
+            last = question_id
+            for source in range(first, last + 1):
+                for step in range(1, FLOWS_PER_QUESTION + 1):
+                    target = source + step
+                    if target > last:
+                        break
+                    if step == 1:
+                        flow_rows.append(
+                            (source, target, FLOW_TYPE_ANY_ANSWER, None, now, now)
+                        )
+                    else:
+                        answer = (
+                            (source - 1) * ANSWERS_PER_QUESTION
+                            + (step % ANSWERS_PER_QUESTION)
+                            + 1
+                        )
+                        flow_rows.append(
+                            (
+                                source,
+                                target,
+                                FLOW_TYPE_SPECIFIC_ANSWER,
+                                answer,
+                                now,
+                                now,
+                            )
+                        )
+        cursor.executemany(
+            "INSERT INTO surveys_question (id, survey_id, text, question_type, "
+            '"order", is_required, created_at, updated_at) '
+            "VALUES (%s, %s, 'Вопрос', 'single', %s, 1, %s, %s)",
+            question_rows,
+        )
+        cursor.executemany(
+            'INSERT INTO surveys_answer (id, question_id, text, "order", '
+            "created_at, updated_at) VALUES (%s, %s, 'Ответ', %s, %s, %s)",
+            answer_rows,
+        )
+        cursor.executemany(
+            "INSERT INTO surveys_questionflow (source_question_id, "
+            "target_question_id, relationship_type, source_answer_id, "
+            "created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s)",
+            flow_rows,
+        )
+        cursor.execute("ANALYZE")
+    print(
+        f"surveys={surveys} questions={len(question_rows)} "
+        f"answers={len(answer_rows)} flows={len(flow_rows)} "
+        f"({time.perf_counter() - started:.1f}s)"
+    )
+    return surveys, question_id
+
+
+def use_old_indexes():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        for table, names in NEW_INDEXES.items():
+            for name in names:
+                cursor.execute(f"DROP INDEX {name}")
+        for table, columns in OLD_INDEXES.items():
+            for column in columns:
+                cursor.execute(
+                    f"CREATE INDEX old_{table}_{column} ON surveys_{table} ({column})"
+                )
+        cursor.execute("ANALYZE")
+
+
+def fetch(queryset):
+    """Выполняет SQL выборки напрямую, чтобы накладные расходы ORM не
+    заслоняли разницу в планах.
+    """
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def run(label, surveys, questions, iterations):
+    from surveys.constants import FLOW_TYPE_SPECIFIC_ANSWER
+    from surveys.models import Answer, Question, QuestionFlow
+
+    rng = random.Random(1)
+
+    def survey_id():
+        return rng.randint(1, surveys)
+
+    def question_id():
+        return rng.randint(1, questions)
+
+    def flow_for_answer():
+        question = question_id()
+        fetch(
+            QuestionFlow.objects.filter(
+                source_question_id=question,
+                relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+                source_answer_id=(question - 1) * ANSWERS_PER_QUESTION + 1,
+            ).values_list("id", "target_question_id")
+        )
+
+    cases = {
+        "questions of survey": lambda: fetch(
+            Question.objects.filter(survey_id=survey_id())
+            .order_by("order", "id")
+            .values_list("id", "order")
+        ),
+        "flows of survey": lambda: fetch(
+            QuestionFlow.objects.filter(source_question__survey_id=survey_id())
+            .order_by("target_question__order", "target_question_id", "id")
+            .values_list("id", "source_question_id", "target_question_id")
+        ),
+        "flows leaving question": lambda: fetch(
+            QuestionFlow.objects.filter(source_question_id=question_id()).values_list(
+                "id", "target_question_id"
+            )
+        ),
+        "flow for question and answer": flow_for_answer,
+        "flows entering question": lambda: fetch(
+            QuestionFlow.objects.filter(target_question_id=question_id()).values_list(
+                "id", "source_question_id"
+            )
+        ),
+        "answers of question": lambda: fetch(
+            Answer.objects.filter(question_id=question_id())
+            .order_by("order", "id")
+            .values_list("id", "text")
+        ),
+    }
+    for name, func in cases.items():
+        report(f"[{label}] {name}", measure(func, iterations, warmup=20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(sqlite_file=Path(directory) / "indexes.sqlite3")
+        surveys, questions = populate(args.flows)
+        run("after", surveys, questions, args.iterations)
+        use_old_indexes()
+        run("before", surveys, questions, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
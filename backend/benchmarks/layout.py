@@ -0,0 +1,38 @@
+"""Бенчмарк раскладки графа опроса: вычисление и повторная выдача.
+
+python -m benchmarks.layout --questions 10000 --iterations 20
+"""
+
+import argparse
+
+from benchmarks.common import make_survey, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from surveys.flow_graph import get_flow_graph
+    from surveys.layout import compute_layout, get_layout
+
+    survey = make_survey(questions=args.questions)
+    graph = get_flow_graph(survey.id)
+    body = get_layout(survey.id).body
+    print(f"Размер ответа: {len(body) / 1024:.0f} КиБ")
+
+    report(
+        f"compute_layout ({args.questions} вопросов)",
+        measure(lambda: compute_layout(graph), args.iterations, warmup=1),
+    )
+    report(
+        "get_layout (прогретый)",
+        measure(lambda: get_layout(survey.id), args.iterations * 100),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Бенчмарк эндпоинта навигации респондента.
+
+python -m benchmarks.navigation --questions 1000 --iterations 5000
+"""
+
+import argparse
+import random
+
+from benchmarks.common import measure, make_survey, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from surveys.flow_graph import FlowGraph, get_flow_graph
+
+    survey = make_survey(questions=args.questions)
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username="bench"))
+    url = reverse("survey-next", kwargs={"survey_id": survey.id})
+
+    graph = get_flow_graph(survey.id)
+    steps = [
+        (question_id, graph.questions[question_id].answers)
+        for question_id in graph.question_ids
+    ]
+    rng = random.Random(0)
+
+    def resolve():
+        question_id, answers = rng.choice(steps)
+        graph.next_question(question_id, (rng.choice(answers).id,))
+
+    def resolve_all():
+        question_id, answers = rng.choice(steps)
+        graph.next_question(question_id, [answer.id for answer in answers])
+
+    def request():
+        question_id, answers = rng.choice(steps)
+        response = client.get(
+            url, {"question": question_id, "answers": rng.choice(answers).id}
+        )
+        assert response.status_code == 200, response.content
+
+    report(
+        f"compile graph ({args.questions} questions)",
+        measure(lambda: FlowGraph.build(survey.id), 20, warmup=2),
+    )
+    report("FlowGraph.next_question", measure(resolve, args.iterations * 10))
+    report(
+        "FlowGraph.next_question (all answers)",
+        measure(resolve_all, args.iterations * 10),
+    )
+    report("GET /api/surveys/<id>/next/", measure(request, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
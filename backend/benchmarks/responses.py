@@ -0,0 +1,90 @@
+"""Бенчмарк приёма ответов: полная сессия одним запросом.
+
+Замеряет весь путь через API (разбор, проверку по графу и пакетную
+вставку), отдельно сохранение уже проверенной сессии, а затем тот же
+запрос с отложенной записью через очередь и перенос очереди в базу.
+
+python -m benchmarks.responses --questions 30 --iterations 2000
+"""
+
+import argparse
+import itertools
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_survey, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from surveys.flow_graph import get_flow_graph
+    from surveys.models import ResponseItem
+    from surveys.responses import SubmittedItem, save_response
+    from surveys.spool import flush_spool, get_spool
+
+    survey = make_survey(questions=args.questions)
+    graph = get_flow_graph(survey.id)
+    items = [
+        {
+            "question": question_id,
+            "answers": [graph.questions[question_id].answers[0].id],
+        }
+        for question_id in graph.question_ids
+    ]
+    sessions = itertools.count()
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username="bench"))
+    url = reverse("survey-responses", kwargs={"survey_id": survey.id})
+
+    def submit():
+        response = client.post(
+            url,
+            {"session": f"api-{next(sessions)}", "is_complete": True, "items": items},
+            format="json",
+        )
+        assert response.status_code in (201, 202), response.content
+
+    submitted = [
+        SubmittedItem(item["question"], tuple(item["answers"]), "") for item in items
+    ]
+
+    def save():
+        save_response(survey.id, f"direct-{next(sessions)}", submitted, True)
+
+    report(
+        f"POST responses ({args.questions} questions)", measure(submit, args.iterations)
+    )
+    report("save_response", measure(save, args.iterations))
+
+    with tempfile.TemporaryDirectory() as directory:
+        with override_settings(SURVEYS_RESPONSE_SPOOL=Path(directory) / "spool"):
+            report("POST responses (spooled)", measure(submit, args.iterations))
+            spool = get_spool()
+            pending = spool.metrics()["pending"]
+            started = time.perf_counter()
+            while flush_spool(spool, args.batch_size).entries:
+                pass
+            elapsed = time.perf_counter() - started
+            print(
+                f"flush {pending} sessions in batches of {args.batch_size}: "
+                f"{elapsed * 1000:.1f}ms ({pending / elapsed:.0f} sessions/s)"
+            )
+    print(f"total response items: {ResponseItem.objects.count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Read-only survey endpoints are served by async views without middleware,
+see ``core.handlers``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -11,6 +13,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from core.handlers import ReadRouter
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+application = ReadRouter(django_application)
@@ -0,0 +1,105 @@
+"""Настройки базы данных из переменных окружения.
+
+По умолчанию используется файл SQLite в режиме WAL: читатели не ждут
+писателя, ``synchronous=NORMAL`` не синхронизирует диск на каждой
+фиксации, а транзакции начинаются с ``BEGIN IMMEDIATE``, поэтому
+конкурирующие писатели ждут блокировку до ``DB_SQLITE_TIMEOUT`` секунд,
+а не получают «database is locked» посреди транзакции. Такой профиль
+рассчитан на один узел.
+
+``DB_ENGINE=postgresql`` включает PostgreSQL (нужен пакет ``psycopg``,
+для ``DB_POOL=1`` — ``psycopg[pool]``). Переменные окружения:
+
+- ``DB_ENGINE`` — ``sqlite`` (по умолчанию) или ``postgresql``;
+- ``DB_NAME``, ``DB_USER``, ``DB_PASSWORD``, ``DB_HOST``, ``DB_PORT``;
+- ``DB_CONN_MAX_AGE`` — сколько секунд держать соединение между
+  запросами (по умолчанию 60), ``DB_CONN_HEALTH_CHECKS``;
+- ``DB_POOL``, ``DB_POOL_MIN_SIZE``, ``DB_POOL_MAX_SIZE`` — пул
+  соединений PostgreSQL; с пулом постоянные соединения отключаются;
+- ``DB_SQLITE_JOURNAL_MODE`` (``WAL``), ``DB_SQLITE_SYNCHRONOUS``
+  (``NORMAL``), ``DB_SQLITE_TIMEOUT`` (20), ``DB_SQLITE_TRANSACTION_MODE``
+  (``IMMEDIATE``).
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    "sqlite": "django.db.backends.sqlite3",
+    "postgresql": "django.db.backends.postgresql",
+}
+
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _int(environ, name, default):
+    value = environ.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f"{name} должно быть целым числом: {value!r}")
+
+
+def database_settings(base_dir, environ=None):
+    """Значение ``DATABASES`` для окружения ``environ`` (по умолчанию — процесса)"""
+    environ = os.environ if environ is None else environ
+    engine = environ.get("DB_ENGINE", "sqlite").strip().lower()
+    if engine not in ENGINES:
+        raise ImproperlyConfigured(
+            f"DB_ENGINE должен быть одним из: {', '.join(ENGINES)}; получено {engine!r}"
+        )
+
+    database = {
+        "ENGINE": ENGINES[engine],
+        "CONN_MAX_AGE": _int(environ, "DB_CONN_MAX_AGE", 60),
+        "CONN_HEALTH_CHECKS": _flag(environ.get("DB_CONN_HEALTH_CHECKS", "1")),
+    }
+    if engine == "sqlite":
+        database["NAME"] = environ.get("DB_NAME") or base_dir / "db.sqlite3"
+        database["OPTIONS"] = _sqlite_options(environ)
+    else:
+        database.update(
+            {
+                "NAME": environ.get("DB_NAME", "surveys"),
+                "USER": environ.get("DB_USER", ""),
+                "PASSWORD": environ.get("DB_PASSWORD", ""),
+                "HOST": environ.get("DB_HOST", ""),
+                "PORT": environ.get("DB_PORT", ""),
+                "OPTIONS": _postgresql_options(environ),
+            }
+        )
+        if "pool" in database["OPTIONS"]:
+            # Соединениями управляет пул; Django запрещает совмещать его
+            # с постоянными соединениями.
+            database["CONN_MAX_AGE"] = 0
+    return {"default": database}
+
+
+def _sqlite_options(environ):
+    timeout = _int(environ, "DB_SQLITE_TIMEOUT", 20)
+    pragmas = [
+        f"PRAGMA journal_mode={environ.get('DB_SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA busy_timeout={timeout * 1000}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    options = {"timeout": timeout, "init_command": ";".join(pragmas)}
+    transaction_mode = environ.get("DB_SQLITE_TRANSACTION_MODE", "IMMEDIATE")
+    if transaction_mode:
+        options["transaction_mode"] = transaction_mode
+    return options
+
+
+def _postgresql_options(environ):
+    options = {}
+    if _flag(environ.get("DB_POOL", "")):
+        options["pool"] = {
+            "min_size": _int(environ, "DB_POOL_MIN_SIZE", 2),
+            "max_size": _int(environ, "DB_POOL_MAX_SIZE", 20),
+        }
+    return options
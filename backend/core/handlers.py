@@ -0,0 +1,58 @@
+"""ASGI-приложение с отдельным обработчиком асинхронных представлений чтения.
+
+Стандартные промежуточные слои Django синхронные: под ASGI каждый из них
+переводит запрос в общий поток для синхронного кода и обратно, и
+асинхронное представление теряет всё преимущество. Поэтому GET-запросы к
+маршрутам из ``ASGI_READ_URLCONF`` обслуживает обработчик без
+промежуточных слоёв; эти представления сами проверяют токен и не
+используют сессии, CSRF и сообщения. Остальные запросы идут в обычный
+обработчик Django, где адреса чтения обслуживают представления DRF.
+"""
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.urls import Resolver404, get_resolver
+
+READ_METHODS = {"GET", "HEAD"}
+
+
+class ReadASGIHandler(ASGIHandler):
+    """``ASGIHandler`` без промежуточных слоёв с маршрутами ``ASGI_READ_URLCONF``"""
+
+    def load_middleware(self, is_async=False):
+        # То же, что BaseHandler.load_middleware при пустом MIDDLEWARE.
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        self._middleware_chain = convert_exception_to_response(self._get_response_async)
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_READ_URLCONF
+        return request, error_response
+
+
+class ReadRouter:
+    """Направляет запросы чтения к ``ReadASGIHandler``, остальные — к ``application``"""
+
+    def __init__(self, application):
+        self.application = application
+        self.read_application = ReadASGIHandler()
+        self.resolver = get_resolver(settings.ASGI_READ_URLCONF)
+
+    def is_read(self, scope):
+        if scope["type"] != "http" or scope["method"] not in READ_METHODS:
+            return False
+        path = scope["path"].removeprefix(scope.get("root_path", ""))
+        try:
+            self.resolver.resolve(path)
+        except Resolver404:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if self.is_read(scope):
+            return await self.read_application(scope, receive, send)
+        return await self.application(scope, receive, send)
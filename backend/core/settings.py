@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+from core.database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +55,9 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = "core.urls"
+# Асинхронные представления чтения, которые под ASGI обслуживаются без
+# промежуточных слоёв (core.handlers).
+ASGI_READ_URLCONF = "core.urls_asgi"
 
 TEMPLATES = [
     {
@@ -76,12 +81,9 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# Профиль базы данных задаётся переменными окружения DB_* (см. core/database.py):
+# по умолчанию SQLite в режиме WAL с постоянными соединениями.
+DATABASES = database_settings(BASE_DIR)
 
 
 # Password validation
@@ -157,11 +159,37 @@ LOGGING = {
     },
 }
 
+# Файл очереди отложенной записи ответов респондентов. Если задан, API
+# сохраняет ответы в очередь, а в базу их переносит
+# manage.py flush_response_spool.
+SURVEYS_RESPONSE_SPOOL = None
+
+# Срок действия токена анонимного респондента в секундах с момента выдачи
+# (surveys.respondents).
+SURVEYS_RESPONDENT_TOKEN_MAX_AGE = 7 * 24 * 3600
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "surveys",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+# Кеш структуры опросов: псевдоним из CACHES (подойдёт любой бэкенд Django,
+# например общий Redis или Memcached для нескольких процессов) и время
+# жизни значений в секундах.
+SURVEYS_CACHE = "default"
+SURVEYS_CACHE_TIMEOUT = 300
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "surveys.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Кеш проверенных токенов (surveys.authentication).
+    "TOKEN_CACHE_SIZE": 10000,
+    "TOKEN_CACHE_TIMEOUT": 60,
 }
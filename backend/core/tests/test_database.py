@@ -0,0 +1,73 @@
+from pathlib import Path
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from core.database import database_settings
+
+BASE_DIR = Path("/srv/surveys")
+
+
+def test_sqlite_defaults():
+    database = database_settings(BASE_DIR, {})["default"]
+    assert database["ENGINE"] == "django.db.backends.sqlite3"
+    assert database["NAME"] == BASE_DIR / "db.sqlite3"
+    assert database["CONN_MAX_AGE"] == 60
+    options = database["OPTIONS"]
+    assert "PRAGMA journal_mode=WAL" in options["init_command"]
+    assert "PRAGMA synchronous=NORMAL" in options["init_command"]
+    assert options["transaction_mode"] == "IMMEDIATE"
+    assert options["timeout"] == 20
+
+
+def test_sqlite_overrides():
+    database = database_settings(
+        BASE_DIR,
+        {
+            "DB_NAME": "/tmp/other.sqlite3",
+            "DB_SQLITE_JOURNAL_MODE": "DELETE",
+            "DB_SQLITE_TIMEOUT": "5",
+            "DB_SQLITE_TRANSACTION_MODE": "",
+            "DB_CONN_MAX_AGE": "0",
+        },
+    )["default"]
+    assert database["NAME"] == "/tmp/other.sqlite3"
+    assert database["CONN_MAX_AGE"] == 0
+    assert "PRAGMA busy_timeout=5000" in database["OPTIONS"]["init_command"]
+    assert "transaction_mode" not in database["OPTIONS"]
+
+
+def test_postgresql_pool_disables_persistent_connections():
+    database = database_settings(
+        BASE_DIR,
+        {
+            "DB_ENGINE": "postgresql",
+            "DB_NAME": "surveys",
+            "DB_HOST": "db",
+            "DB_POOL": "1",
+            "DB_POOL_MAX_SIZE": "50",
+        },
+    )["default"]
+    assert database["ENGINE"] == "django.db.backends.postgresql"
+    assert database["HOST"] == "db"
+    assert database["OPTIONS"]["pool"] == {"min_size": 2, "max_size": 50}
+    assert database["CONN_MAX_AGE"] == 0
+
+
+@pytest.mark.parametrize(
+    "environ", [{"DB_ENGINE": "oracle"}, {"DB_CONN_MAX_AGE": "forever"}]
+)
+def test_invalid_configuration(environ):
+    with pytest.raises(ImproperlyConfigured):
+        database_settings(BASE_DIR, environ)
+
+
+@pytest.mark.django_db
+def test_pragmas_are_applied():
+    if connection.vendor != "sqlite":
+        pytest.skip("только для SQLite")
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA synchronous")
+        # 1 — NORMAL.
+        assert cursor.fetchone()[0] == 1
@@ -0,0 +1,7 @@
+"""Маршруты асинхронных представлений чтения для ``core.handlers``"""
+
+from django.urls import include, path
+
+urlpatterns = [
+    path("api/surveys/", include("surveys.async_urls")),
+]
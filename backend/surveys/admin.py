@@ -1,10 +1,49 @@
-from django.contrib import admin
+from urllib.parse import urlsplit
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
-from django.urls import path
-from django.http import JsonResponse
+from django.urls import Resolver404, get_script_prefix, path, resolve, reverse
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.template.response import TemplateResponse
+from django.utils.http import parse_etags
+from rest_framework.exceptions import NotFound
+
+from surveys.answer_options import answer_options
+from surveys.flow_graph import get_flow_graph
+from surveys.layout import get_layout, layout_response
+from surveys.models import Survey, Question, Answer, QuestionFlow, Response
+from surveys.inlines import (
+    AnswerInline,
+    QuestionInline,
+    QuestionFlowInline,
+    ResponseItemInline,
+)
+from surveys.navigation import parse_ids
+from surveys.versions import publish_survey
+
+# Сколько последних изменённых опросов показывает фильтр по опросу.
+SURVEY_FILTER_SIZE = 50
 
-from surveys.models import Survey, Question, Answer, QuestionFlow
-from surveys.inlines import AnswerInline, QuestionInline, QuestionFlowInline
+
+class SurveyListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по опросу, который не загружает все опросы.
+
+    Показываются последние изменённые опросы и выбранный, остальные
+    находятся поиском по названию опроса.
+    """
+
+    def field_choices(self, field, request, model_admin):
+        recent = Survey.objects.order_by("-updated_at").values("pk")
+        selected = [value for value in self.lookup_val or () if value.isdigit()]
+        return list(
+            Survey.objects.filter(
+                Q(pk__in=recent[:SURVEY_FILTER_SIZE]) | Q(pk__in=selected)
+            )
+            .order_by("-updated_at")
+            .values_list("pk", "title")
+        )
 
 
 class SurveyAdmin(admin.ModelAdmin):
@@ -15,6 +54,7 @@ class SurveyAdmin(admin.ModelAdmin):
     search_fields = ("title", "description")
     readonly_fields = ("created_at", "updated_at")
     inlines = [QuestionInline]
+    actions = ["publish"]
     fieldsets = (
         (None, {"fields": ("title", "description", "is_active")}),
         (
@@ -23,30 +63,140 @@ class SurveyAdmin(admin.ModelAdmin):
         ),
     )
 
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/graph/",
+                self.admin_site.admin_view(self.graph_view),
+                name="surveys_survey_graph",
+            ),
+            path(
+                "<path:object_id>/graph/layout/",
+                self.admin_site.admin_view(self.graph_layout, cacheable=True),
+                name="surveys_survey_graph_layout",
+            ),
+        ] + super().get_urls()
+
+    def graph_view(self, request, object_id):
+        """Страница с графом переходов опроса"""
+        survey = self.get_object(request, object_id)
+        if survey is None or not self.has_view_or_change_permission(request, survey):
+            raise Http404
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "original": survey,
+            "title": _("Граф переходов: {survey}").format(survey=survey),
+            "layout_url": reverse(
+                "admin:surveys_survey_graph_layout", args=[survey.pk]
+            ),
+        }
+        return TemplateResponse(request, "admin/surveys/survey/graph.html", context)
+
+    def graph_layout(self, request, object_id):
+        """Раскладка графа опроса для страницы ``graph_view``"""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        try:
+            return layout_response(request, get_layout(int(object_id)))
+        except (ValueError, NotFound):
+            raise Http404
+
+    @admin.action(description=_("Опубликовать новую версию"))
+    def publish(self, request, queryset):
+        for survey in queryset:
+            try:
+                version = publish_survey(survey.pk)
+            except ValidationError as error:
+                self.message_user(
+                    request, f"{survey}: {' '.join(error.messages)}", messages.ERROR
+                )
+            else:
+                self.message_user(
+                    request,
+                    _("{survey}: опубликована версия {number}").format(
+                        survey=survey, number=version.number
+                    ),
+                )
+
+
+def referring_flow_source(request):
+    """Опрос и вопрос-источник страницы, с которой пришёл запрос.
+
+    Автодополнение Django не передаёт объект формы, поэтому он берётся
+    из адреса страницы изменения вопроса или связи в ``Referer``.
+    Возвращает ``(None, None)``, если страница другая.
+    """
+    referer = urlsplit(request.headers.get("Referer", "")).path
+    prefix = get_script_prefix()
+    if not referer.startswith(prefix):
+        return None, None
+    try:
+        match = resolve("/" + referer[len(prefix) :])
+        object_id = int(match.kwargs["object_id"])
+    except (Resolver404, KeyError, ValueError):
+        return None, None
+    if match.url_name == "surveys_question_change":
+        survey_id = (
+            Question.objects.filter(pk=object_id)
+            .values_list("survey_id", flat=True)
+            .first()
+        )
+        return survey_id, object_id
+    if match.url_name == "surveys_questionflow_change":
+        row = (
+            QuestionFlow.objects.filter(pk=object_id)
+            .values_list("source_question__survey_id", "source_question_id")
+            .first()
+        )
+        return row or (None, None)
+    return None, None
+
 
 class QuestionAdmin(admin.ModelAdmin):
     """Административная модель вопросов"""
 
     list_display = ("text", "survey", "question_type", "order", "is_required")
-    list_filter = ("survey", "question_type", "is_required")
-    search_fields = ("text",)
+    list_filter = (("survey", SurveyListFilter), "question_type", "is_required")
+    list_select_related = ("survey",)
+    search_fields = ("text", "survey__title")
+    autocomplete_fields = ("survey",)
     readonly_fields = ("created_at", "updated_at")
     inlines = [AnswerInline, QuestionFlowInline]
     fieldsets = (
         (None, {"fields": ("survey", "text", "question_type", "order", "is_required")}),
+        (_("Переходы"), {"fields": ("flow_resolution", "fallback_to_next")}),
         (
             _("Информация о создании"),
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        """Цели связи в автодополнении — только вопросы опроса источника"""
+        queryset, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if (
+            request.GET.get("model_name") == "questionflow"
+            and request.GET.get("field_name") == "target_question"
+        ):
+            survey_id, source_question_id = referring_flow_source(request)
+            if survey_id is not None:
+                queryset = queryset.filter(survey_id=survey_id).exclude(
+                    pk=source_question_id
+                )
+        return queryset, may_have_duplicates
+
 
 class AnswerAdmin(admin.ModelAdmin):
     """Административная модель вариантов ответов"""
 
     list_display = ("text", "question", "order")
-    list_filter = ("question__survey", "question")
-    search_fields = ("text",)
+    list_filter = (("question__survey", SurveyListFilter),)
+    list_select_related = ("question",)
+    search_fields = ("text", "question__text")
+    autocomplete_fields = ("question",)
     readonly_fields = ("created_at", "updated_at")
     fieldsets = (
         (None, {"fields": ("question", "text", "order")}),
@@ -65,12 +215,12 @@ class QuestionFlowAdmin(admin.ModelAdmin):
         "relationship_type",
         "source_answer",
         "target_question",
+        "priority",
     )
-    list_filter = (
-        "relationship_type",
-        "source_question__survey",
-        "target_question__survey",
-    )
+    # Связи не выходят за пределы опроса, поэтому хватает опроса источника.
+    list_filter = ("relationship_type", ("source_question__survey", SurveyListFilter))
+    list_select_related = ("source_question", "source_answer", "target_question")
+    autocomplete_fields = ("source_question", "target_question")
     search_fields = (
         "source_question__text",
         "target_question__text",
@@ -87,6 +237,8 @@ class QuestionFlowAdmin(admin.ModelAdmin):
                     "relationship_type",
                     "source_answer",
                     "target_question",
+                    "priority",
+                    "condition",
                 )
             },
         ),
@@ -98,6 +250,16 @@ class QuestionFlowAdmin(admin.ModelAdmin):
 
     def get_form(self, request, object_instance=None, **form_options):
         form_object = super().get_form(request, object_instance, **form_options)
+        # Адрес вариантов ответа и опрос для их предзагрузки на странице.
+        source_field = form_object.base_fields.get("source_question")
+        if source_field is not None:
+            source_field.widget.attrs["data-answer-options-url"] = reverse(
+                "admin:answer_options"
+            )
+            if object_instance is not None:
+                source_field.widget.attrs["data-survey"] = Question.objects.get(
+                    pk=object_instance.source_question_id
+                ).survey_id
         return form_object
 
     def formfield_for_foreignkey(self, database_field, request, **field_kwargs):
@@ -108,15 +270,11 @@ class QuestionFlowAdmin(admin.ModelAdmin):
                     question_id=sourceQuestionIdentifier
                 )
             elif request.resolver_match.kwargs.get("object_id"):
-                questionFlowInstance = QuestionFlow.objects.get(
-                    pk=request.resolver_match.kwargs.get("object_id")
-                )
-                if questionFlowInstance.source_question:
-                    field_kwargs["queryset"] = Answer.objects.filter(
-                        question=questionFlowInstance.source_question
+                field_kwargs["queryset"] = Answer.objects.filter(
+                    question__source_relationships=request.resolver_match.kwargs.get(
+                        "object_id"
                     )
-                else:
-                    field_kwargs["queryset"] = Answer.objects.none()
+                )
             else:
                 field_kwargs["queryset"] = Answer.objects.none()
         return super().formfield_for_foreignkey(database_field, request, **field_kwargs)
@@ -125,23 +283,37 @@ class QuestionFlowAdmin(admin.ModelAdmin):
         defaultUrls = super().get_urls()
         customUrls = [
             path(
-                "fetch-answers/",
-                self.admin_site.admin_view(self.fetch_answers),
-                name="fetch_answers",
+                "answer-options/",
+                self.admin_site.admin_view(self.fetch_answer_options, cacheable=True),
+                name="answer_options",
             ),
         ]
         return customUrls + defaultUrls
 
-    def fetch_answers(self, request):
-        sourceQuestionID = request.GET.get("source_question")
-        if sourceQuestionID:
-            answerQuerySet = Answer.objects.filter(question_id=sourceQuestionID)
-            answerOptions = [
-                {"id": answer.pk, "text": answer.text} for answer in answerQuerySet
-            ]
+    def fetch_answer_options(self, request):
+        """Варианты ответа вопросов ``questions`` и всех вопросов опросов ``survey``.
+
+        Варианты сгруппированы по вопросам и упорядочены по ``order``.
+        Ответ отдаётся с ETag; при совпадающем ``If-None-Match`` — 304.
+        """
+        try:
+            question_ids = parse_ids(request.GET.getlist("questions"))
+            survey_ids = parse_ids(request.GET.getlist("survey"))
+        except ValueError:
+            return JsonResponse(
+                {"detail": _("Идентификаторы должны быть целыми числами")}, status=400
+            )
+        for survey_id in survey_ids:
+            question_ids.extend(get_flow_graph(survey_id).question_ids)
+
+        options, etag = answer_options(question_ids)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
         else:
-            answerOptions = []
-        return JsonResponse({"options": answerOptions})
+            response = JsonResponse({"questions": options})
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
     class Media:
         js = (
@@ -150,7 +322,26 @@ class QuestionFlowAdmin(admin.ModelAdmin):
         )
 
 
+class ResponseAdmin(admin.ModelAdmin):
+    """Административная модель ответов респондентов"""
+
+    list_display = ("session_key", "survey", "is_complete", "created_at", "updated_at")
+    list_filter = ("is_complete", ("survey", SurveyListFilter))
+    list_select_related = ("survey",)
+    search_fields = ("session_key",)
+    readonly_fields = ("survey", "session_key", "created_at", "updated_at")
+    inlines = [ResponseItemInline]
+    fieldsets = (
+        (None, {"fields": ("survey", "session_key", "is_complete")}),
+        (
+            _("Информация о создании"),
+            {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
+        ),
+    )
+
+
 admin.site.register(Survey, SurveyAdmin)
 admin.site.register(Question, QuestionAdmin)
 admin.site.register(Answer, AnswerAdmin)
 admin.site.register(QuestionFlow, QuestionFlowAdmin)
+admin.site.register(Response, ResponseAdmin)
@@ -0,0 +1,47 @@
+"""Варианты ответа вопросов для выпадающих списков админки.
+
+Варианты каждого вопроса хранятся в общем кеше структуры опросов
+(``surveys.cache``) под меткой вопроса, которую сбрасывают сигналы
+изменения ответов, поэтому прогретый запрос не обращается к базе данных.
+ETag набора вычисляется по максимальному ``updated_at`` и числу
+вариантов каждого вопроса, поэтому удаление варианта тоже меняет его.
+"""
+
+import hashlib
+import json
+
+from surveys.cache import cached_many
+from surveys.models import Answer
+
+
+def _load(question_ids):
+    entries = {
+        question_id: {"options": [], "updated": None} for question_id in question_ids
+    }
+    answers = (
+        Answer.objects.filter(question_id__in=question_ids)
+        .order_by("question_id", "order", "pk")
+        .values_list("pk", "question_id", "text", "updated_at")
+    )
+    for pk, question_id, text, updated_at in answers:
+        entry = entries[question_id]
+        entry["options"].append({"id": pk, "text": text})
+        updated = updated_at.isoformat()
+        if entry["updated"] is None or updated > entry["updated"]:
+            entry["updated"] = updated
+    return entries
+
+
+def answer_options(question_ids):
+    """Варианты ответа по вопросам в порядке ``order`` и ETag набора.
+
+    Для неизвестных вопросов возвращается пустой список.
+    """
+    entries = cached_many("answers", "question", question_ids, _load)
+    version = [
+        [question_id, entry["updated"], len(entry["options"])]
+        for question_id, entry in entries.items()
+    ]
+    digest = hashlib.sha1(json.dumps(version).encode()).hexdigest()
+    options = {question_id: entry["options"] for question_id, entry in entries.items()}
+    return options, f'"{digest}"'
@@ -0,0 +1,28 @@
+"""Асинхронные маршруты чтения; под ASGI их обслуживает ``core.handlers``"""
+
+from django.urls import path
+
+from surveys.async_views import (
+    AsyncSurveyAnswersView,
+    AsyncSurveyBundleView,
+    AsyncSurveyNavigationView,
+)
+
+# Имена совпадают с синхронными маршрутами: reverse() даёт тот же адрес.
+urlpatterns = [
+    path(
+        "<int:survey_id>/next/",
+        AsyncSurveyNavigationView.as_view(),
+        name="survey-next",
+    ),
+    path(
+        "<int:survey_id>/bundle/",
+        AsyncSurveyBundleView.as_view(),
+        name="survey-bundle",
+    ),
+    path(
+        "<int:survey_id>/questions/<int:question_id>/answers/",
+        AsyncSurveyAnswersView.as_view(),
+        name="survey-answers",
+    ),
+]
@@ -0,0 +1,151 @@
+"""Асинхронные представления чтения для работы под ASGI.
+
+Навигация, снимок опроса и варианты ответа отдаются из скомпилированных
+структур в памяти процесса, поэтому на прогретом пути представление не
+занимает поток: в базу данных ходит только проверка токена. Промахи
+кешей собираются теми же синхронными функциями через ``sync_to_async``.
+
+Маршруты подключаются через ``core.urls_asgi`` только под ASGI (см.
+``core.handlers``); под WSGI те же адреса обслуживают представления
+DRF из ``surveys.views``. Редактирование остаётся синхронным.
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+)
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+
+from surveys.authentication import (
+    AsyncTokenAuthentication,
+    RespondentTokenAuthentication,
+)
+from surveys.bundle import aget_bundle, aget_survey_state, bundle_response, is_fresh
+from surveys.flow_graph import aget_flow_graph
+from surveys.navigation import answers_data, navigation_data, version_number
+from surveys.permissions import IsSurveyRespondent
+from surveys.respondents import (
+    RespondentSession,
+    arespondent_graph,
+    respondent_navigation,
+)
+from surveys.versions import aget_latest_version, aget_version
+
+
+class AsyncAPIView(View):
+    """Асинхронное представление с аутентификацией, разрешениями и ошибками
+    в формате DRF.
+
+    Аутентификаторы с ``aauthenticate`` вызываются асинхронно, остальные —
+    напрямую, поэтому они не должны обращаться к базе данных.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    authentication_classes = [AsyncTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    renderer = JSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticators = [cls() for cls in self.authentication_classes]
+        try:
+            await self.perform_authentication(request, authenticators)
+            self.check_permissions(request)
+
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or not handler:
+                raise MethodNotAllowed(request.method)
+            return await handler(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(exc, authenticators[0])
+
+    async def perform_authentication(self, request, authenticators):
+        request.user, request.auth = AnonymousUser(), None
+        for authenticator in authenticators:
+            if hasattr(authenticator, "aauthenticate"):
+                user_auth = await authenticator.aauthenticate(request)
+            else:
+                user_auth = authenticator.authenticate(request)
+            if user_auth is not None:
+                request.user, request.auth = user_auth
+                return
+
+    def check_permissions(self, request):
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if request.auth is None:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+
+    def handle_exception(self, exc, authenticator):
+        # Как rest_framework.views.exception_handler.
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        response = self.render(data, exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response["WWW-Authenticate"] = authenticator.authenticate_header(None)
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            content_type="application/json",
+            status=status_code,
+        )
+
+
+class AsyncSurveyNavigationView(AsyncAPIView):
+    """Асинхронный вариант ``SurveyNavigationView``"""
+
+    authentication_classes = [AsyncTokenAuthentication, RespondentTokenAuthentication]
+    permission_classes = [IsAuthenticated | IsSurveyRespondent]
+
+    async def get(self, request, survey_id):
+        if isinstance(request.auth, RespondentSession):
+            graph = await arespondent_graph(survey_id, request.auth)
+            return self.render(respondent_navigation(graph, request.auth, request.GET))
+
+        number = version_number(request.GET)
+        version = None
+        if number is not None:
+            version = await aget_version(survey_id, number)
+            if version is None:
+                raise NotFound(_("Версия опроса не найдена"))
+        elif "question" not in request.GET:
+            version = await aget_latest_version(survey_id)
+
+        if version is not None:
+            graph = version.graph
+        else:
+            graph = await aget_flow_graph(survey_id)
+        return self.render(navigation_data(graph, version, request.GET))
+
+
+class AsyncSurveyBundleView(AsyncAPIView):
+    """Асинхронный вариант ``SurveyBundleView``"""
+
+    async def get(self, request, survey_id):
+        state = await aget_survey_state(survey_id)
+        if state is None:
+            raise NotFound(_("Опрос не найден"))
+        body = None if is_fresh(request, state) else await aget_bundle(state)
+        return bundle_response(state, body)
+
+
+class AsyncSurveyAnswersView(AsyncAPIView):
+    """Асинхронный вариант ``SurveyAnswersView``"""
+
+    async def get(self, request, survey_id, question_id):
+        graph = await aget_flow_graph(survey_id)
+        return self.render(answers_data(graph, question_id))
@@ -0,0 +1,172 @@
+"""Аутентификация по токену с кешем проверенных токенов.
+
+``CachedTokenAuthentication`` хранит проверенные токены в памяти процесса
+в LRU-кеше ограниченного размера с временем жизни, поэтому на прогретом
+пути запрос аутентифицируется без обращения к базе данных. Токен
+забывается при удалении (в том числе каскадом вместе с пользователем) и
+при сохранении его пользователя, например при деактивации. Изменения в
+других процессах и через ``QuerySet.update()`` сигналов не отправляют:
+там токен действует до истечения времени жизни.
+
+Настройки в ``REST_FRAMEWORK``: ``TOKEN_CACHE_SIZE`` — сколько токенов
+держать (по умолчанию 10000), ``TOKEN_CACHE_TIMEOUT`` — время жизни в
+секундах (по умолчанию 60, 0 отключает кеш).
+
+``RespondentTokenAuthentication`` принимает подписанные токены анонимных
+респондентов (``surveys.respondents``) и проверяет только подпись.
+
+DRF 3.14 не умеет асинхронные представления, поэтому
+``AsyncTokenAuthentication`` повторяет разбор заголовка и сообщения об
+ошибках ``TokenAuthentication`` поверх асинхронного ORM и того же кеша.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from surveys.respondents import load_token
+
+_tokens = OrderedDict()
+# Растёт при каждом сбросе: токен, прочитанный до сброса, не кешируется.
+_generation = 0
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, "REST_FRAMEWORK", {}).get(name, default)
+
+
+def _cached(key):
+    entry = _tokens.get(key)
+    if entry is None:
+        return None
+    expires, user, token = entry
+    with _lock:
+        if expires <= time.monotonic():
+            if _tokens.get(key) is entry:
+                del _tokens[key]
+            return None
+        if key in _tokens:
+            _tokens.move_to_end(key)
+    return user, token
+
+
+def _remember(user, token, generation):
+    timeout = _setting("TOKEN_CACHE_TIMEOUT", 60)
+    if timeout <= 0:
+        return
+    with _lock:
+        if generation != _generation:
+            return
+        _tokens[token.key] = (time.monotonic() + timeout, user, token)
+        _tokens.move_to_end(token.key)
+        while len(_tokens) > _setting("TOKEN_CACHE_SIZE", 10000):
+            _tokens.popitem(last=False)
+
+
+def forget_tokens(*, key=None, user_id=None):
+    """Убирает из кеша токен, токены пользователя, а без аргументов — все"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if key is None and user_id is None:
+            _tokens.clear()
+            return
+        for cached_key, (_expires, user, _token) in list(_tokens.items()):
+            if cached_key == key or user.pk == user_id:
+                del _tokens[cached_key]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` с кешем проверенных токенов"""
+
+    def authenticate_credentials(self, key):
+        cached = _cached(key)
+        if cached is not None:
+            return cached
+        generation = _generation
+        user, token = super().authenticate_credentials(key)
+        _remember(user, token, generation)
+        return user, token
+
+
+class AsyncTokenAuthentication(CachedTokenAuthentication):
+    """``CachedTokenAuthentication`` с асинхронным ``aauthenticate``"""
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise AuthenticationFailed(
+                _("Invalid token header. No credentials provided.")
+            )
+        if len(auth) > 2:
+            raise AuthenticationFailed(
+                _("Invalid token header. Token string should not contain spaces.")
+            )
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(
+                _(
+                    "Invalid token header. "
+                    "Token string should not contain invalid characters."
+                )
+            )
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cached = _cached(key)
+        if cached is not None:
+            return cached
+        generation = _generation
+        token = (
+            await self.get_model()
+            .objects.select_related("user")
+            .filter(key=key)
+            .afirst()
+        )
+        if token is None:
+            raise AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+        _remember(token.user, token, generation)
+        return token.user, token
+
+
+class RespondentTokenAuthentication(BaseAuthentication):
+    """Токен респондента: ``Authorization: Respondent <токен>``.
+
+    Пользователь запроса анонимный, а ``request.auth`` — сессия
+    респондента ``RespondentSession``.
+    """
+
+    keyword = "Respondent"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(_("Некорректный заголовок токена респондента"))
+        try:
+            respondent = load_token(auth[1].decode())
+        except (UnicodeError, signing.BadSignature):
+            raise AuthenticationFailed(_("Токен респондента недействителен"))
+        return AnonymousUser(), respondent
+
+    def authenticate_header(self, request):
+        return self.keyword
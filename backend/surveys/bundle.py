@@ -0,0 +1,150 @@
+"""Полный снимок опроса одним ответом: вопросы, ответы и таблица маршрутов.
+
+Сериализованный снимок хранится в памяти процесса в виде байтов вместе
+с ETag. ETag вычисляется одним запросом по максимальному ``updated_at``
+и количеству строк опроса, поэтому удаление строк тоже меняет версию.
+"""
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from surveys.flow_graph import FlowGraph
+from surveys.models import Answer, Question, QuestionFlow, Survey
+
+
+@dataclass(frozen=True, slots=True)
+class SurveyState:
+    """Версия опроса и поля, нужные для построения снимка"""
+
+    survey_id: int
+    etag: str
+    title: str
+    description: str
+
+
+def _aggregate(queryset, survey_lookup, function, output_field=None):
+    """Подзапрос с агрегатом по строкам опроса"""
+    return Subquery(
+        queryset.filter(**{survey_lookup: OuterRef("pk")})
+        .order_by()
+        .values(survey_lookup)
+        .annotate(value=function)
+        .values("value"),
+        output_field=output_field,
+    )
+
+
+def _state_queryset(survey_id):
+    sources = {
+        "question": (Question.objects.all(), "survey"),
+        "answer": (Answer.objects.all(), "question__survey"),
+        "flow": (QuestionFlow.objects.all(), "source_question__survey"),
+    }
+    annotations = {}
+    for name, (queryset, lookup) in sources.items():
+        annotations[f"{name}_updated"] = _aggregate(queryset, lookup, Max("updated_at"))
+        annotations[f"{name}_count"] = _aggregate(
+            queryset, lookup, Count("id"), IntegerField()
+        )
+    return (
+        Survey.objects.filter(pk=survey_id)
+        .annotate(**annotations)
+        .values("title", "description", "updated_at", *annotations)
+    )
+
+
+def _state(survey_id, row):
+    if row is None:
+        return None
+    keys = sorted(set(row) - {"title", "description", "updated_at"})
+    fingerprint = "|".join(str(row[key]) for key in ["updated_at", *keys])
+    digest = hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+    return SurveyState(
+        survey_id=survey_id,
+        etag=f'"{digest}"',
+        title=row["title"],
+        description=row["description"],
+    )
+
+
+def get_survey_state(survey_id):
+    """Возвращает версию опроса одним запросом или None, если опроса нет"""
+    return _state(survey_id, _state_queryset(survey_id).first())
+
+
+async def aget_survey_state(survey_id):
+    """Асинхронный ``get_survey_state``"""
+    return _state(survey_id, await _state_queryset(survey_id).afirst())
+
+
+def render_bundle(state):
+    """Сериализует опрос целиком в JSON"""
+    graph = FlowGraph.build(state.survey_id)
+    bundle = {
+        "id": state.survey_id,
+        "title": state.title,
+        "description": state.description,
+        "questions": [graph.payloads[q] for q in graph.question_ids],
+        "routing": graph.routing_table(),
+    }
+    return json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+_bundles = {}
+_lock = threading.Lock()
+
+
+def _cached_bundle(state):
+    cached = _bundles.get(state.survey_id)
+    if cached is not None and cached[0] == state.etag:
+        return cached[1]
+    return None
+
+
+def get_bundle(state):
+    """Возвращает сериализованный снимок опроса, собирая его только при смене версии"""
+    body = _cached_bundle(state)
+    if body is not None:
+        return body
+
+    body = render_bundle(state)
+    with _lock:
+        _bundles[state.survey_id] = (state.etag, body)
+    return body
+
+
+async def aget_bundle(state):
+    """Асинхронный ``get_bundle``: готовый снимок отдаётся без перехода в поток"""
+    body = _cached_bundle(state)
+    if body is not None:
+        return body
+    return await sync_to_async(get_bundle)(state)
+
+
+def is_fresh(request, state):
+    """Совпадает ли ``If-None-Match`` запроса с версией опроса"""
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    return state.etag in if_none_match or "*" in if_none_match
+
+
+def bundle_response(state, body):
+    """Ответ со снимком опроса; без ``body`` — 304 Not Modified"""
+    if body is None:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = state.etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def clear_bundles():
+    with _lock:
+        _bundles.clear()
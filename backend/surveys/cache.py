@@ -0,0 +1,192 @@
+"""Общий кеш структуры опросов поверх Django cache.
+
+Значения хранятся под ключами с метками версий: у каждого опроса и
+вопроса есть метка, которую сигналы ``post_save``/``post_delete`` (и
+массовые операции через функции сброса графа) заменяют новой случайной.
+Старые значения при этом не удаляются, а просто перестают читаться и
+вытесняются бэкендом. Метка — случайная строка, а не счётчик, поэтому
+вытесненная метка не может совпасть с прежней.
+
+Бэкенд задаётся ``SURVEYS_CACHE`` (псевдоним из ``CACHES``), время
+жизни значений — ``SURVEYS_CACHE_TIMEOUT``. По изменению ответа или
+связи опрос находится через сохранённое в кеше соответствие вопроса
+опросу, без запросов к базе; если оно вытеснено раньше значения,
+значение устареет не дольше чем на время жизни.
+"""
+
+import secrets
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_PREFIX = "surveys"
+_MISSING = object()
+
+_counters = defaultdict(lambda: [0, 0])
+_counters_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, "SURVEYS_CACHE", "default")]
+
+
+def _timeout():
+    return getattr(settings, "SURVEYS_CACHE_TIMEOUT", 300)
+
+
+def _stamp_key(scope, object_id):
+    return f"{CACHE_PREFIX}:stamp:{scope}:{object_id}"
+
+
+def _question_survey_key(question_id):
+    return f"{CACHE_PREFIX}:question-survey:{question_id}"
+
+
+def _stamp_values(cache, scopes):
+    """Текущие метки версий; отсутствующие метки создаются"""
+    keys = [_stamp_key(scope, object_id) for scope, object_id in scopes]
+    stamps = cache.get_many(keys)
+    missing = {key: secrets.token_hex(6) for key in keys if key not in stamps}
+    if missing:
+        for key, stamp in missing.items():
+            # Параллельный процесс мог создать метку раньше: берём его.
+            if not cache.add(key, stamp, timeout=None):
+                stamp = cache.get(key, stamp)
+            stamps[key] = stamp
+    return [stamps[key] for key in keys]
+
+
+def _stamps(cache, scopes):
+    return ".".join(_stamp_values(cache, scopes))
+
+
+def _count(kind, hit):
+    with _counters_lock:
+        _counters[kind][0 if hit else 1] += 1
+
+
+def cached(kind, object_id, scopes, build, keep=None):
+    """Значение из кеша по меткам ``scopes`` или результат ``build()``.
+
+    ``scopes`` — пары (область, идентификатор): ``("survey", id)``,
+    ``("question", id)``. Метки читаются до построения значения, поэтому
+    изменение во время построения уводит следующих читателей на новый
+    ключ, и устаревшее значение не читается. ``keep`` решает, сохранять
+    ли построенное значение.
+    """
+    cache = get_cache()
+    stamps = _stamps(cache, [("survey", "*"), *scopes])
+    key = f"{CACHE_PREFIX}:{kind}:{object_id}:{stamps}"
+    value = cache.get(key, _MISSING)
+    _count(kind, value is not _MISSING)
+    if value is _MISSING:
+        value = build()
+        if keep is None or keep(value):
+            cache.set(key, value, _timeout())
+    return value
+
+
+def cached_many(kind, scope, object_ids, build):
+    """``cached`` для многих объектов, каждый под своей меткой ``(scope, id)``.
+
+    Метки и значения читаются пачкой, ``build(ids)`` строит словарь
+    значений сразу для всех промахов. Ключи совпадают с ключами
+    ``cached(kind, id, [(scope, id)], ...)``.
+    """
+    cache = get_cache()
+    object_ids = list(dict.fromkeys(object_ids))
+    common, *stamps = _stamp_values(
+        cache, [("survey", "*"), *((scope, object_id) for object_id in object_ids)]
+    )
+    keys = {
+        object_id: f"{CACHE_PREFIX}:{kind}:{object_id}:{common}.{stamp}"
+        for object_id, stamp in zip(object_ids, stamps)
+    }
+    found = cache.get_many(keys.values())
+    values = {object_id: found[key] for object_id, key in keys.items() if key in found}
+    for object_id in object_ids:
+        _count(kind, object_id in values)
+    missing = [object_id for object_id in object_ids if object_id not in values]
+    if missing:
+        built = build(missing)
+        cache.set_many(
+            {keys[object_id]: built[object_id] for object_id in missing}, _timeout()
+        )
+        values.update(built)
+    return {object_id: values[object_id] for object_id in object_ids}
+
+
+def survey_stamp(survey_id):
+    """Текущая метка опроса вместе с общей меткой.
+
+    Нужна значениям, которые хранятся в памяти процесса: если метка
+    изменилась, опрос меняли, возможно в другом процессе.
+    """
+    return _stamps(get_cache(), [("survey", "*"), ("survey", survey_id)])
+
+
+def remember_questions(survey_id, question_ids):
+    """Запоминает опрос вопросов, чтобы сбрасывать его без запросов к базе"""
+    get_cache().set_many(
+        {_question_survey_key(question_id): survey_id for question_id in question_ids},
+        timeout=None,
+    )
+
+
+def bump_surveys(survey_ids):
+    """Меняет метки опросов: все их закешированные значения устаревают"""
+    get_cache().set_many(
+        {
+            _stamp_key("survey", survey_id): secrets.token_hex(6)
+            for survey_id in survey_ids
+        },
+        timeout=None,
+    )
+
+
+def bump_questions(question_ids):
+    """Меняет метки вопросов и известных кешу опросов этих вопросов"""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return
+    cache = get_cache()
+    surveys = cache.get_many(
+        [_question_survey_key(question_id) for question_id in question_ids]
+    )
+    stamps = {
+        _stamp_key("question", question_id): secrets.token_hex(6)
+        for question_id in question_ids
+    }
+    stamps.update(
+        {
+            _stamp_key("survey", survey_id): secrets.token_hex(6)
+            for survey_id in set(surveys.values())
+        }
+    )
+    cache.set_many(stamps, timeout=None)
+
+
+def bump_all():
+    """Меняет общую метку, входящую в ключи всех значений"""
+    bump_surveys(["*"])
+
+
+def cache_stats():
+    """Попадания и промахи кеша по видам значений с момента запуска процесса"""
+    with _counters_lock:
+        counters = {kind: tuple(values) for kind, values in _counters.items()}
+    return {
+        kind: {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+        for kind, (hits, misses) in sorted(counters.items())
+    }
+
+
+def reset_cache_stats():
+    with _counters_lock:
+        _counters.clear()
@@ -0,0 +1,413 @@
+"""Копирование опроса и загрузка структуры из выгрузки.
+
+Структура описывается записями в формате ``surveys.export``: ``survey``,
+``question``, ``answer`` и ``flow`` со старыми идентификаторами. Вопросы
+и ответы вставляются через ``bulk_create``, по возвращённым ключам
+строится соответствие старых идентификаторов новым, после чего
+пересчитанные связи вставляются тем же способом. Всё выполняется одной
+транзакцией, а число запросов зависит только от числа пакетов вставки.
+"""
+
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models, transaction
+from django.utils.translation import gettext_lazy as _
+
+from surveys import reachability
+from surveys.conditions import (
+    ConditionError,
+    condition_references,
+    parse_condition,
+    rename_references,
+)
+from surveys.constants import (
+    FLOW_RESOLUTION_PRIORITY,
+    FLOW_RESOLUTIONS,
+    FLOW_TYPE_ANY_ANSWER,
+    FLOW_TYPE_SPECIFIC_ANSWER,
+    QUESTION_FLOW_TYPES,
+    QUESTION_TYPES,
+)
+from surveys.export import export_records
+from surveys.flow_graph import invalidate_flow_graph
+from surveys.graph_analysis import strongly_connected_components
+from surveys.models import Answer, Question, QuestionFlow, Survey
+from surveys.validation import FlowCandidate, flow_key
+
+CLONE_BATCH_SIZE = 1000
+# Записи ответов в выгрузке при загрузке структуры пропускаются.
+IGNORED_RECORDS = {"response", "response_item"}
+MAX_IMPORT_ERRORS = 50
+
+
+@dataclass
+class SurveyStructure:
+    """Структура опроса со старыми идентификаторами"""
+
+    survey: dict | None = None
+    questions: list = field(default_factory=list)
+    answers: list = field(default_factory=list)
+    flows: list = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ClonedSurvey:
+    """Созданный опрос и соответствие старых идентификаторов новым"""
+
+    survey: Survey
+    questions: dict
+    answers: dict
+    flows: dict
+
+
+def _int(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("true", "1")
+
+
+_PARSERS = {
+    "survey": lambda record: {
+        "title": str(record["title"]),
+        "description": str(record.get("description") or record.get("text") or ""),
+        "is_active": _bool(record.get("is_active", True)),
+    },
+    "question": lambda record: {
+        "id": _int(record["id"]),
+        "text": str(record["text"]),
+        "question_type": record["question_type"],
+        "order": _int(record.get("order")) or 0,
+        "is_required": _bool(record.get("is_required", True)),
+        "flow_resolution": record.get("flow_resolution") or FLOW_RESOLUTION_PRIORITY,
+        "fallback_to_next": _bool(record.get("fallback_to_next", False)),
+    },
+    "answer": lambda record: {
+        "id": _int(record["id"]),
+        "question_id": _int(record["question_id"]),
+        "text": str(record["text"]),
+        "order": _int(record.get("order")) or 0,
+    },
+    "flow": lambda record: {
+        "id": _int(record.get("id")),
+        "question_id": _int(record["question_id"]),
+        "target_question_id": _int(record["target_question_id"]),
+        "relationship_type": record["relationship_type"],
+        "answer_id": _int(record.get("answer_id")),
+        "priority": _int(record.get("priority")) or 0,
+        "condition": str(record.get("condition") or ""),
+    },
+}
+
+
+def read_structure(records):
+    """Собирает структуру из записей выгрузки (JSONL или CSV).
+
+    Значения из CSV приходят строками и приводятся к нужным типам.
+    """
+    structure = SurveyStructure()
+    targets = {
+        "question": structure.questions,
+        "answer": structure.answers,
+        "flow": structure.flows,
+    }
+    errors = []
+    for number, record in enumerate(records, start=1):
+        kind = record.get("record")
+        if kind in IGNORED_RECORDS:
+            continue
+        if kind not in _PARSERS:
+            errors.append(
+                _("Запись {number}: неизвестный тип «{kind}»").format(
+                    number=number, kind=kind
+                )
+            )
+            continue
+        try:
+            row = _PARSERS[kind](record)
+        except (KeyError, TypeError, ValueError):
+            errors.append(
+                _("Запись {number}: некорректные поля записи «{kind}»").format(
+                    number=number, kind=kind
+                )
+            )
+            continue
+        if kind == "survey":
+            if structure.survey is not None:
+                errors.append(_("В данных больше одной записи опроса"))
+            structure.survey = row
+        else:
+            targets[kind].append(row)
+        if len(errors) >= MAX_IMPORT_ERRORS:
+            break
+    if errors:
+        raise ValidationError(errors)
+    return structure
+
+
+def _too_long(model, row):
+    """Поля записи длиннее ``max_length`` поля модели: (название, длина).
+
+    Поля с вариантами значений не проверяются: их значения сверяются
+    с вариантами отдельно.
+    """
+    for name, value in row.items():
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if (
+            isinstance(model_field, models.CharField)
+            and not model_field.choices
+            and isinstance(value, str)
+            and len(value) > model_field.max_length
+        ):
+            yield model_field.verbose_name, model_field.max_length
+
+
+def structure_errors(structure, *, title=None):
+    """Проверяет структуру в памяти, не обращаясь к базе данных.
+
+    Проверяются ссылки между записями, типы вопросов и связей, длина
+    строковых полей, повторы связей и циклы — те же правила, что и при
+    сохранении связей, поэтому вставка не падает на данных выгрузки.
+    ``title`` заменяет название из записи опроса.
+    """
+    errors = []
+    question_types = dict(QUESTION_TYPES)
+    resolutions = dict(FLOW_RESOLUTIONS)
+    flow_types = dict(QUESTION_FLOW_TYPES)
+
+    survey = dict(structure.survey or {})
+    if title is not None:
+        survey["title"] = title
+    for field_name, length in _too_long(Survey, survey):
+        errors.append(
+            _("Опрос: поле «{field}» длиннее {length} символов").format(
+                field=field_name, length=length
+            )
+        )
+
+    question_ids = set()
+    for question in structure.questions:
+        if question["id"] in question_ids:
+            errors.append(
+                _("Вопрос {id} повторяется").format(id=question["id"]),
+            )
+        question_ids.add(question["id"])
+        if question["question_type"] not in question_types:
+            errors.append(
+                _("Вопрос {id}: неизвестный тип вопроса").format(id=question["id"])
+            )
+        if question["flow_resolution"] not in resolutions:
+            errors.append(
+                _("Вопрос {id}: неизвестный способ выбора перехода").format(
+                    id=question["id"]
+                )
+            )
+        for field_name, length in _too_long(Question, question):
+            errors.append(
+                _("Вопрос {id}: поле «{field}» длиннее {length} символов").format(
+                    id=question["id"], field=field_name, length=length
+                )
+            )
+
+    answer_questions = {}
+    for answer in structure.answers:
+        if answer["id"] in answer_questions:
+            errors.append(_("Ответ {id} повторяется").format(id=answer["id"]))
+        answer_questions[answer["id"]] = answer["question_id"]
+        if answer["question_id"] not in question_ids:
+            errors.append(
+                _("Ответ {id}: вопрос {question} не найден").format(
+                    id=answer["id"], question=answer["question_id"]
+                )
+            )
+        for field_name, length in _too_long(Answer, answer):
+            errors.append(
+                _("Ответ {id}: поле «{field}» длиннее {length} символов").format(
+                    id=answer["id"], field=field_name, length=length
+                )
+            )
+
+    successors = {question_id: [] for question_id in question_ids}
+    keys = set()
+    for number, flow in enumerate(structure.flows, start=1):
+        source = flow["question_id"]
+        target = flow["target_question_id"]
+        flow_errors = []
+        if source not in question_ids or target not in question_ids:
+            flow_errors.append(_("вопрос не найден"))
+        elif source == target:
+            flow_errors.append(_("исходный и целевой вопросы не могут совпадать"))
+        if flow["priority"] < 0:
+            flow_errors.append(_("приоритет не может быть отрицательным"))
+        for field_name, length in _too_long(QuestionFlow, flow):
+            flow_errors.append(
+                _("поле «{field}» длиннее {length} символов").format(
+                    field=field_name, length=length
+                )
+            )
+        if flow["condition"]:
+            try:
+                referenced_answers, referenced_questions = condition_references(
+                    parse_condition(flow["condition"])
+                )
+            except ConditionError:
+                flow_errors.append(_("некорректное условие"))
+            else:
+                if not referenced_answers <= answer_questions.keys() or not (
+                    referenced_questions <= question_ids
+                ):
+                    flow_errors.append(_("условие ссылается на неизвестный объект"))
+        if flow["relationship_type"] not in flow_types:
+            flow_errors.append(_("неизвестный тип связи"))
+        elif flow["relationship_type"] == FLOW_TYPE_SPECIFIC_ANSWER:
+            if flow["answer_id"] is None:
+                flow_errors.append(
+                    _("для связи по конкретному ответу необходимо указать ответ")
+                )
+            elif answer_questions.get(flow["answer_id"]) != source:
+                flow_errors.append(_("ответ должен принадлежать исходному вопросу"))
+        elif flow["relationship_type"] == FLOW_TYPE_ANY_ANSWER:
+            # Для связи по любому ответу ответ не используется.
+            flow["answer_id"] = None
+
+        if not flow_errors:
+            key = flow_key(
+                FlowCandidate(
+                    None, source, target, flow["relationship_type"], flow["answer_id"]
+                )
+            )
+            if key in keys:
+                flow_errors.append(_("связь повторяется"))
+            keys.add(key)
+            successors[source].append(target)
+        for message in flow_errors:
+            errors.append(
+                _("Связь {number}: {message}").format(number=number, message=message)
+            )
+
+    # Переходы к следующему вопросу замыкают циклы наравне со связями.
+    # Копия нумерует вопросы в порядке записей, поэтому при равном
+    # порядке соседей определяет порядок записей.
+    ordered = sorted(structure.questions, key=lambda question: question["order"])
+    for source, target in reachability.fallback_pairs(
+        (question["id"], question["fallback_to_next"]) for question in ordered
+    ):
+        successors[source].append(target)
+
+    for component in strongly_connected_components(successors):
+        if len(component) > 1:
+            errors.append(
+                _("Связи образуют цикл между вопросами {ids}").format(
+                    ids=", ".join(map(str, sorted(component)))
+                )
+            )
+    return errors[:MAX_IMPORT_ERRORS]
+
+
+def create_survey(structure, *, title=None):
+    """Создаёт опрос по проверенной структуре одной транзакцией.
+
+    Вопросы, ответы и связи вставляются пакетами по ``CLONE_BATCH_SIZE``;
+    соответствие идентификаторов строится по ключам, которые возвращает
+    ``bulk_create``.
+    """
+    survey_fields = dict(structure.survey or {})
+    if title is not None:
+        survey_fields["title"] = title
+
+    with transaction.atomic():
+        survey = Survey.objects.create(**survey_fields)
+
+        questions = Question.objects.bulk_create(
+            [
+                Question(
+                    survey=survey,
+                    text=question["text"],
+                    question_type=question["question_type"],
+                    order=question["order"],
+                    is_required=question["is_required"],
+                    flow_resolution=question["flow_resolution"],
+                    fallback_to_next=question["fallback_to_next"],
+                )
+                for question in structure.questions
+            ],
+            batch_size=CLONE_BATCH_SIZE,
+        )
+        question_ids = {
+            old["id"]: new.pk for old, new in zip(structure.questions, questions)
+        }
+
+        answers = Answer.objects.bulk_create(
+            [
+                Answer(
+                    question_id=question_ids[answer["question_id"]],
+                    text=answer["text"],
+                    order=answer["order"],
+                )
+                for answer in structure.answers
+            ],
+            batch_size=CLONE_BATCH_SIZE,
+        )
+        answer_ids = {old["id"]: new.pk for old, new in zip(structure.answers, answers)}
+
+        flows = QuestionFlow.objects.bulk_create(
+            [
+                QuestionFlow(
+                    source_question_id=question_ids[flow["question_id"]],
+                    target_question_id=question_ids[flow["target_question_id"]],
+                    relationship_type=flow["relationship_type"],
+                    source_answer_id=answer_ids.get(flow["answer_id"]),
+                    priority=flow["priority"],
+                    condition=rename_references(
+                        flow["condition"], answer_ids, question_ids
+                    ),
+                )
+                for flow in structure.flows
+            ],
+            batch_size=CLONE_BATCH_SIZE,
+        )
+        flow_ids = {old["id"]: new.pk for old, new in zip(structure.flows, flows)}
+
+    # Массовые вставки не отправляют сигналы: сбрасываем кеши нового опроса.
+    invalidate_flow_graph(survey.pk)
+    reachability.invalidate_reachability(survey.pk)
+    return ClonedSurvey(survey, question_ids, answer_ids, flow_ids)
+
+
+def clone_survey(survey_id, *, title=None):
+    """Копирует структуру опроса без ответов респондентов.
+
+    Исходный опрос читается четырьмя запросами; по умолчанию к названию
+    копии добавляется «(копия)».
+    """
+    structure = read_structure(export_records(survey_id, ("structure",)))
+    if structure.survey is None:
+        raise Survey.DoesNotExist(survey_id)
+    if title is None:
+        original = structure.survey["title"]
+        title = _("{title} (копия)").format(title=original)
+        overflow = len(title) - Survey._meta.get_field("title").max_length
+        if overflow > 0:
+            # Укорачиваем исходное название, чтобы пометка копии сохранилась.
+            title = _("{title} (копия)").format(title=original[:-overflow])
+    return create_survey(structure, title=title)
+
+
+def import_survey(records, *, title=None):
+    """Создаёт опрос из записей выгрузки; ошибки — ``ValidationError``"""
+    structure = read_structure(records)
+    errors = structure_errors(structure, title=title)
+    if structure.survey is None and title is None:
+        errors.insert(0, _("В данных нет записи опроса"))
+    if errors:
+        raise ValidationError(errors)
+    return create_survey(structure, title=title)
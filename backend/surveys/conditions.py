@@ -0,0 +1,322 @@
+"""Условия переходов: разбор выражений и компиляция в предикаты.
+
+Условие связи записывается выражением над ответами респондента:
+
+- ``A12`` — выбран ответ 12;
+- ``Q5`` — на вопрос 5 дан ответ (выбран вариант или указано число);
+- ``Q5 >= 18`` — числовое значение текстового ответа на вопрос 5
+  (операторы ``<``, ``<=``, ``>``, ``>=``, ``=``, ``!=``);
+- ``and``, ``or``, ``not`` и скобки, например ``A12 and not (A31 or Q7 < 3)``.
+
+Выражение разбирается один раз и компилируется в замыкание
+``predicate(mask, values)``. Выбранные ответы передаются битовой маской:
+каждому ответу опроса граф назначает свой бит. Проверки ответов внутри
+``and`` и ``or`` сворачиваются в общие маски, поэтому такие условия
+вычисляются несколькими операциями над целым числом. ``values`` —
+словарь «вопрос -> число» для текстовых ответов.
+"""
+
+import operator
+import re
+
+from django.utils.translation import gettext_lazy as _
+
+
+class ConditionError(ValueError):
+    """Синтаксическая ошибка в условии"""
+
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<ref>[AaQq]\d+)|(?P<number>-?\d+(?:\.\d+)?)"
+    r"|(?P<op><=|>=|!=|==|=|<|>)|(?P<paren>[()])|(?P<word>[A-Za-z_]+)|(?P<bad>\S))"
+)
+
+_COMPARISONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_KEYWORDS = {"and", "or", "not"}
+
+#: Наибольшая вложенность скобок и ``not``: разбор рекурсивный, и глубже
+#: этого предела он упёрся бы в ограничение стека интерпретатора.
+MAX_CONDITION_DEPTH = 32
+
+
+def _tokenize(text):
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "bad":
+            raise ConditionError(
+                _("Недопустимый символ «{char}» в условии").format(char=value)
+            )
+        if kind == "word":
+            value = value.lower()
+            if value not in _KEYWORDS:
+                raise ConditionError(
+                    _("Неизвестное слово «{word}» в условии").format(word=value)
+                )
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Рекурсивный спуск: ``or`` < ``and`` < ``not`` < сравнение и скобки"""
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.depth = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ConditionError(_("Условие пустое"))
+        node = self.disjunction()
+        if self.position < len(self.tokens):
+            raise ConditionError(
+                _("Лишнее «{token}» в условии").format(token=self.peek()[1])
+            )
+        return node
+
+    def nested(self, parse):
+        self.depth += 1
+        if self.depth > MAX_CONDITION_DEPTH:
+            raise ConditionError(
+                _("Условие вложено глубже {depth} уровней").format(
+                    depth=MAX_CONDITION_DEPTH
+                )
+            )
+        node = parse()
+        self.depth -= 1
+        return node
+
+    def disjunction(self):
+        items = [self.conjunction()]
+        while self.peek() == ("word", "or"):
+            self.take()
+            items.append(self.conjunction())
+        return items[0] if len(items) == 1 else ("or", tuple(items))
+
+    def conjunction(self):
+        items = [self.negation()]
+        while self.peek() == ("word", "and"):
+            self.take()
+            items.append(self.negation())
+        return items[0] if len(items) == 1 else ("and", tuple(items))
+
+    def negation(self):
+        if self.peek() == ("word", "not"):
+            self.take()
+            return ("not", self.nested(self.negation))
+        return self.atom()
+
+    def atom(self):
+        kind, value = self.take()
+        if (kind, value) == ("paren", "("):
+            node = self.nested(self.disjunction)
+            if self.take() != ("paren", ")"):
+                raise ConditionError(_("Не закрыта скобка в условии"))
+            return node
+        if kind != "ref":
+            raise ConditionError(
+                _("Ожидался ответ или вопрос, получено «{token}»").format(
+                    token=value or _("конец условия")
+                )
+            )
+        object_id = int(value[1:])
+        if value[0] in "Aa":
+            return ("answer", object_id)
+        if self.peek()[0] != "op":
+            return ("question", object_id)
+        op = self.take()[1]
+        number_kind, number = self.take()
+        if number_kind != "number":
+            raise ConditionError(_("После «{op}» ожидалось число").format(op=op))
+        return ("compare", object_id, op, float(number))
+
+
+def parse_condition(text):
+    """Дерево условия из текста; при ошибке — ``ConditionError``"""
+    return _Parser(text).parse()
+
+
+def condition_references(node):
+    """Ответы и вопросы, на которые ссылается условие"""
+    answer_ids = set()
+    question_ids = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind == "answer":
+            answer_ids.add(node[1])
+        elif kind in ("question", "compare"):
+            question_ids.add(node[1])
+        elif kind == "not":
+            stack.append(node[1])
+        else:
+            stack.extend(node[1])
+    return answer_ids, question_ids
+
+
+_REFERENCE = re.compile(r"\b([AaQq])(\d+)\b")
+
+
+def rename_references(text, answer_ids, question_ids):
+    """Условие с заменёнными идентификаторами, например при копировании опроса"""
+
+    def replace(match):
+        prefix, object_id = match.group(1), int(match.group(2))
+        ids = answer_ids if prefix in "Aa" else question_ids
+        return f"{prefix}{ids.get(object_id, object_id)}"
+
+    return _REFERENCE.sub(replace, text)
+
+
+def _never(mask, values):
+    return False
+
+
+def _always(mask, values):
+    return True
+
+
+def _literal(node):
+    """``(бит ответа, отрицание)`` для ``A1`` и ``not A1``, иначе None"""
+    if node[0] == "answer":
+        return node[1], False
+    if node[0] == "not" and node[1][0] == "answer":
+        return node[1][1], True
+    return None
+
+
+def compile_condition(node, answer_bits, question_masks):
+    """Предикат ``predicate(mask, values)`` для дерева условия.
+
+    ``answer_bits`` — бит каждого ответа опроса, ``question_masks`` —
+    объединение битов ответов вопроса. Ответы вне опроса никогда не
+    считаются выбранными.
+    """
+    kind = node[0]
+    if kind == "answer":
+        bit = answer_bits.get(node[1], 0)
+        if not bit:
+            return _never
+        return lambda mask, values: mask & bit != 0
+
+    if kind == "question":
+        question_id = node[1]
+        question_mask = question_masks.get(question_id, 0)
+        return lambda mask, values: (mask & question_mask != 0 or question_id in values)
+
+    if kind == "compare":
+        _kind, question_id, op, number = node
+        compare = _COMPARISONS[op]
+
+        def predicate(mask, values):
+            value = values.get(question_id)
+            return value is not None and compare(value, number)
+
+        return predicate
+
+    if kind == "not":
+        inner = compile_condition(node[1], answer_bits, question_masks)
+        if inner is _never:
+            return _always
+        if inner is _always:
+            return _never
+        return lambda mask, values: not inner(mask, values)
+
+    if kind == "and":
+        return _compile_and(node[1], answer_bits, question_masks)
+    return _compile_or(node[1], answer_bits, question_masks)
+
+
+def _compile_and(items, answer_bits, question_masks):
+    required = 0
+    forbidden = 0
+    rest = []
+    for item in items:
+        literal = _literal(item)
+        if literal is None:
+            predicate = compile_condition(item, answer_bits, question_masks)
+            if predicate is _never:
+                return _never
+            if predicate is not _always:
+                rest.append(predicate)
+            continue
+        answer_id, negated = literal
+        bit = answer_bits.get(answer_id, 0)
+        if negated:
+            forbidden |= bit
+        elif not bit:
+            return _never
+        else:
+            required |= bit
+    if required & forbidden:
+        return _never
+
+    if not rest:
+        if not required and not forbidden:
+            return _always
+        return lambda mask, values: mask & required == required and not (
+            mask & forbidden
+        )
+    rest = tuple(rest)
+
+    def predicate(mask, values):
+        if mask & required != required or mask & forbidden:
+            return False
+        for check in rest:
+            if not check(mask, values):
+                return False
+        return True
+
+    return predicate
+
+
+def _compile_or(items, answer_bits, question_masks):
+    any_of = 0
+    rest = []
+    for item in items:
+        if item[0] == "answer":
+            any_of |= answer_bits.get(item[1], 0)
+            continue
+        predicate = compile_condition(item, answer_bits, question_masks)
+        if predicate is _always:
+            return _always
+        if predicate is not _never:
+            rest.append(predicate)
+
+    if not rest:
+        if not any_of:
+            return _never
+        return lambda mask, values: mask & any_of != 0
+    rest = tuple(rest)
+
+    def predicate(mask, values):
+        if mask & any_of:
+            return True
+        for check in rest:
+            if check(mask, values):
+                return True
+        return False
+
+    return predicate
@@ -17,3 +17,14 @@ QUESTION_FLOW_TYPES = [
     (FLOW_TYPE_ANY_ANSWER, _("любой ответ вопроса")),
     (FLOW_TYPE_SPECIFIC_ANSWER, _("конкретный ответ вопроса")),
 ]
+
+# Как выбирается переход, если выбрано несколько ответов с разными связями.
+FLOW_RESOLUTION_PRIORITY = "priority"
+FLOW_RESOLUTION_FIRST_MATCH = "first_match"
+FLOW_RESOLUTION_LOWEST_ORDER = "lowest_order"
+
+FLOW_RESOLUTIONS = [
+    (FLOW_RESOLUTION_PRIORITY, _("связь с наименьшим приоритетом")),
+    (FLOW_RESOLUTION_FIRST_MATCH, _("первый выбранный ответ по порядку")),
+    (FLOW_RESOLUTION_LOWEST_ORDER, _("целевой вопрос с наименьшим порядком")),
+]
@@ -0,0 +1,208 @@
+"""Потоковая выгрузка структуры опроса и ответов в CSV или JSONL.
+
+Каждая таблица читается через ``iterator(chunk_size=...)`` без кеша
+запроса, а записи сразу превращаются в текст и отдаются порциями,
+поэтому потребление памяти не зависит от числа строк, а первые байты
+уходят клиенту до чтения всей выборки.
+
+Все записи выгрузки имеют общий набор колонок; колонка ``record``
+указывает тип записи: ``survey``, ``question``, ``answer``, ``flow``,
+``response`` или ``response_item``.
+"""
+
+import csv
+import json
+
+from surveys.models import (
+    Answer,
+    Question,
+    QuestionFlow,
+    Response,
+    ResponseItem,
+    Survey,
+)
+
+EXPORT_CHUNK_SIZE = 2000
+# Примерный размер порции текста, отдаваемой за один шаг генератора.
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+EXPORT_PARTS = ("structure", "responses")
+
+COLUMNS = (
+    "record",
+    "id",
+    "survey_id",
+    "question_id",
+    "answer_id",
+    "target_question_id",
+    "response_id",
+    "session_key",
+    "question_type",
+    "relationship_type",
+    "order",
+    "is_required",
+    "is_active",
+    "is_complete",
+    "flow_resolution",
+    "fallback_to_next",
+    "priority",
+    "condition",
+    "title",
+    "text",
+    "created_at",
+    "updated_at",
+)
+
+
+def _sources(survey_id, parts):
+    """Тип записи, выборка и соответствие колонок полям модели"""
+    if "structure" in parts:
+        yield (
+            "survey",
+            Survey.objects.filter(pk=survey_id),
+            {
+                "id": "id",
+                "title": "title",
+                "text": "description",
+                "is_active": "is_active",
+                "created_at": "created_at",
+                "updated_at": "updated_at",
+            },
+        )
+        yield (
+            "question",
+            Question.objects.filter(survey_id=survey_id),
+            {
+                "id": "id",
+                "survey_id": "survey_id",
+                "text": "text",
+                "question_type": "question_type",
+                "order": "order",
+                "is_required": "is_required",
+                "flow_resolution": "flow_resolution",
+                "fallback_to_next": "fallback_to_next",
+            },
+        )
+        yield (
+            "answer",
+            Answer.objects.filter(question__survey_id=survey_id),
+            {
+                "id": "id",
+                "question_id": "question_id",
+                "text": "text",
+                "order": "order",
+            },
+        )
+        yield (
+            "flow",
+            QuestionFlow.objects.filter(source_question__survey_id=survey_id),
+            {
+                "id": "id",
+                "question_id": "source_question_id",
+                "target_question_id": "target_question_id",
+                "relationship_type": "relationship_type",
+                "answer_id": "source_answer_id",
+                "priority": "priority",
+                "condition": "condition",
+            },
+        )
+    if "responses" in parts:
+        yield (
+            "response",
+            Response.objects.filter(survey_id=survey_id),
+            {
+                "id": "id",
+                "survey_id": "survey_id",
+                "session_key": "session_key",
+                "is_complete": "is_complete",
+                "created_at": "created_at",
+                "updated_at": "updated_at",
+            },
+        )
+        yield (
+            "response_item",
+            ResponseItem.objects.filter(response__survey_id=survey_id),
+            {
+                "id": "id",
+                "response_id": "response_id",
+                "question_id": "question_id",
+                "answer_id": "answer_id",
+                "text": "text",
+                "created_at": "created_at",
+            },
+        )
+
+
+def export_records(survey_id, parts=EXPORT_PARTS):
+    """Записи выгрузки по одной: словари с колонкой ``record`` и полями записи"""
+    for record, queryset, mapping in _sources(survey_id, parts):
+        columns = tuple(mapping)
+        rows = (
+            queryset.order_by("id")
+            .values_list(*mapping.values())
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        for row in rows:
+            yield {"record": record, **dict(zip(columns, row))}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class _LineBuffer:
+    """Буфер для ``csv.writer``, из которого забираются готовые строки"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+
+def iter_export(survey_id, export_format="csv", parts=EXPORT_PARTS):
+    """Генератор текста выгрузки порциями около ``EXPORT_BUFFER_SIZE`` символов"""
+    buffer = _LineBuffer()
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+
+        def write(record):
+            writer.writerow([_csv_value(record.get(column)) for column in COLUMNS])
+
+    elif export_format == "jsonl":
+
+        def write(record):
+            buffer.parts.append(
+                json.dumps(record, ensure_ascii=False, default=_json_default) + "\n"
+            )
+
+    else:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+
+    size = 0
+    for record in export_records(survey_id, parts):
+        write(record)
+        size += len(buffer.parts[-1])
+        if size >= EXPORT_BUFFER_SIZE:
+            yield "".join(buffer.parts)
+            buffer.parts.clear()
+            size = 0
+    if buffer.parts:
+        yield "".join(buffer.parts)
@@ -0,0 +1,514 @@
+"""Скомпилированный граф переходов опроса.
+
+Граф строится один раз из строк ``Question``, ``Answer`` и ``QuestionFlow``
+и дальше отвечает на вопрос «куда идти дальше» только поиском по словарям,
+без обращений к базе данных. Собранные графы хранятся в памяти процесса,
+а строки для их сборки — ещё и в общем кеше (``surveys.cache``), чтобы
+другие процессы не читали их из базы повторно.
+"""
+
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+
+from surveys import cache
+from surveys.conditions import ConditionError, compile_condition, parse_condition
+from surveys.constants import (
+    FLOW_RESOLUTION_FIRST_MATCH,
+    FLOW_RESOLUTION_LOWEST_ORDER,
+    FLOW_RESOLUTION_PRIORITY,
+    FLOW_TYPE_ANY_ANSWER,
+    FLOW_TYPE_SPECIFIC_ANSWER,
+)
+from surveys.models import Answer, Question, QuestionFlow
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerNode:
+    """Вариант ответа внутри скомпилированного графа"""
+
+    id: int
+    text: str
+    order: int
+
+
+@dataclass(frozen=True, slots=True)
+class QuestionNode:
+    """Вопрос внутри скомпилированного графа"""
+
+    id: int
+    text: str
+    question_type: str
+    order: int
+    is_required: bool
+    answers: tuple[AnswerNode, ...]
+    flow_resolution: str = FLOW_RESOLUTION_PRIORITY
+    fallback_to_next: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class FlowEdge:
+    """Переход между вопросами"""
+
+    id: int
+    source_question_id: int
+    target_question_id: int
+    relationship_type: str
+    source_answer_id: int | None
+    priority: int = 0
+    condition: str = ""
+
+
+def question_payload(question):
+    """Представление вопроса с упорядоченными ответами для API"""
+    return {
+        "id": question.id,
+        "text": question.text,
+        "question_type": question.question_type,
+        "order": question.order,
+        "is_required": question.is_required,
+        "answers": [
+            {"id": answer.id, "text": answer.text, "order": answer.order}
+            for answer in question.answers
+        ],
+    }
+
+
+def route_key(strategy, edge, position, target_order):
+    """Ключ сравнения переходов по ответам одного вопроса: меньший побеждает.
+
+    ``position`` — место ответа среди ответов вопроса, ``target_order`` —
+    порядок целевого вопроса. Ключи всех стратегий заканчиваются
+    различающимися полями, поэтому ничьих не бывает.
+    """
+    target = (target_order, edge.target_question_id)
+    if strategy == FLOW_RESOLUTION_FIRST_MATCH:
+        return (position, edge.priority, *target)
+    if strategy == FLOW_RESOLUTION_LOWEST_ORDER:
+        return (*target, edge.priority, position)
+    return (edge.priority, *target, position)
+
+
+class FlowGraph:
+    """Неизменяемый граф переходов одного опроса"""
+
+    __slots__ = (
+        "survey_id",
+        "questions",
+        "question_ids",
+        "edges",
+        "payloads",
+        "_answer_question",
+        "_answer_bits",
+        "_answer_routes",
+        "_any_routes",
+        "_fallbacks",
+        "_conditional",
+    )
+
+    def __init__(self, survey_id, questions, edges):
+        answer_question = {}
+        answer_position = {}
+        answer_bits = {}
+        question_masks = {}
+        for question in questions:
+            question_mask = 0
+            for position, answer in enumerate(question.answers):
+                answer_question[answer.id] = question.id
+                answer_position[answer.id] = position
+                answer_bits[answer.id] = 1 << len(answer_bits)
+                question_mask |= answer_bits[answer.id]
+            question_masks[question.id] = question_mask
+        target_orders = {question.id: question.order for question in questions}
+        strategies = {question.id: question.flow_resolution for question in questions}
+
+        def key(edge):
+            return route_key(
+                strategies[edge.source_question_id],
+                edge,
+                answer_position[edge.source_answer_id],
+                target_orders.get(edge.target_question_id, 0),
+            )
+
+        def any_key(edge):
+            target_order = target_orders.get(edge.target_question_id, 0)
+            return (edge.priority, target_order, edge.target_question_id)
+
+        # Условия компилируются один раз на граф; сохранённое в обход
+        # проверки некорректное условие никогда не выполняется.
+        checks = {}
+        for edge in edges:
+            if edge.condition:
+                try:
+                    tree = parse_condition(edge.condition)
+                except ConditionError:
+                    checks[edge.id] = _unsatisfiable
+                else:
+                    checks[edge.id] = compile_condition(
+                        tree, answer_bits, question_masks
+                    )
+
+        answer_edges = {}
+        any_edges = {}
+        for edge in edges:
+            if edge.relationship_type == FLOW_TYPE_SPECIFIC_ANSWER:
+                # Ответ должен принадлежать исходному вопросу, иначе ребро
+                # никогда не сработает.
+                if answer_question.get(edge.source_answer_id) != (
+                    edge.source_question_id
+                ):
+                    continue
+                answer_edges.setdefault(edge.source_question_id, []).append(edge)
+            elif edge.relationship_type == FLOW_TYPE_ANY_ANSWER:
+                any_edges.setdefault(edge.source_question_id, []).append(edge)
+
+        # Ранг ребра среди рёбер по ответам вопроса считается один раз при
+        # сборке, поэтому выбор из нескольких ответов не сортирует их. Для
+        # ответа хранятся его рёбра по рангу до первого безусловного: рёбра
+        # после него сработать уже не могут.
+        answer_routes = {}
+        for question_edges in answer_edges.values():
+            question_edges.sort(key=key)
+            for rank, edge in enumerate(question_edges):
+                routes = answer_routes.setdefault(edge.source_answer_id, [])
+                if not routes or routes[-1][2] is not None:
+                    routes.append((rank, edge, checks.get(edge.id)))
+        any_routes = {}
+        for question_id, question_edges in any_edges.items():
+            routes = []
+            for edge in sorted(question_edges, key=any_key):
+                routes.append((edge, checks.get(edge.id)))
+                if edge.id not in checks:
+                    break
+            any_routes[question_id] = tuple(routes)
+
+        fallbacks = {}
+        for question, following in zip(questions, questions[1:]):
+            routes = any_routes.get(question.id)
+            if question.fallback_to_next and (not routes or routes[-1][1] is not None):
+                fallbacks[question.id] = following.id
+
+        self.survey_id = survey_id
+        self.questions = MappingProxyType({q.id: q for q in questions})
+        self.question_ids = tuple(q.id for q in questions)
+        self.edges = tuple(edges)
+        self.payloads = MappingProxyType({q.id: question_payload(q) for q in questions})
+        self._answer_question = MappingProxyType(answer_question)
+        self._answer_bits = MappingProxyType(answer_bits)
+        self._answer_routes = MappingProxyType(
+            {answer_id: tuple(routes) for answer_id, routes in answer_routes.items()}
+        )
+        self._any_routes = MappingProxyType(any_routes)
+        self._fallbacks = MappingProxyType(fallbacks)
+        self._conditional = frozenset(
+            edge.source_question_id for edge in edges if edge.id in checks
+        )
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        super().__setattr__(name, value)
+
+    @classmethod
+    def build(cls, survey_id):
+        """Собирает граф опроса тремя запросами к базе данных"""
+        return cls(survey_id, *cls.read(survey_id))
+
+    @staticmethod
+    def read(survey_id):
+        """Вопросы с ответами и рёбра опроса для сборки графа"""
+        answers_by_question = {}
+        answer_rows = (
+            Answer.objects.filter(question__survey_id=survey_id)
+            .order_by("order", "id")
+            .values_list("id", "question_id", "text", "order")
+        )
+        for answer_id, question_id, text, order in answer_rows:
+            answers_by_question.setdefault(question_id, []).append(
+                AnswerNode(id=answer_id, text=text, order=order)
+            )
+
+        question_rows = (
+            Question.objects.filter(survey_id=survey_id)
+            .order_by("order", "id")
+            .values_list(
+                "id",
+                "text",
+                "question_type",
+                "order",
+                "is_required",
+                "flow_resolution",
+                "fallback_to_next",
+            )
+        )
+        questions = [
+            QuestionNode(
+                id=question_id,
+                text=text,
+                question_type=question_type,
+                order=order,
+                is_required=is_required,
+                answers=tuple(answers_by_question.get(question_id, ())),
+                flow_resolution=flow_resolution,
+                fallback_to_next=fallback_to_next,
+            )
+            for (
+                question_id,
+                text,
+                question_type,
+                order,
+                is_required,
+                flow_resolution,
+                fallback_to_next,
+            ) in question_rows
+        ]
+
+        edges = [FlowEdge(*row) for row in FlowGraph.edge_rows(survey_id)]
+        return questions, edges
+
+    @staticmethod
+    def edge_rows(survey_id):
+        """Запрос строк рёбер опроса в полях ``FlowEdge``"""
+        # Какое из рёбер с одним ключом сработает, решает конструктор графа,
+        # а порядок здесь нужен для стабильных снимков и раскладки.
+        return (
+            QuestionFlow.objects.filter(source_question__survey_id=survey_id)
+            .order_by("priority", "target_question__order", "target_question_id", "id")
+            .values_list(
+                "id",
+                "source_question_id",
+                "target_question_id",
+                "relationship_type",
+                "source_answer_id",
+                "priority",
+                "condition",
+            )
+        )
+
+    @property
+    def first_question_id(self):
+        """Первый вопрос опроса по порядку"""
+        return self.question_ids[0] if self.question_ids else None
+
+    def has_question(self, question_id):
+        return question_id in self.questions
+
+    def answer_question_id(self, answer_id):
+        """Вопрос, которому принадлежит ответ, или None"""
+        return self._answer_question.get(answer_id)
+
+    def answer_mask(self, answer_ids):
+        """Битовая маска выбранных ответов для проверки условий"""
+        bits = self._answer_bits
+        mask = 0
+        for answer_id in answer_ids:
+            mask |= bits.get(answer_id, 0)
+        return mask
+
+    def resolve(self, question_id, answer_ids=(), history=(), values=None):
+        """Возвращает ребро, по которому респондент уйдёт с вопроса, или None.
+
+        Из переходов по выбранным ответам срабатывает переход с наименьшим
+        рангом по стратегии вопроса (``Question.flow_resolution``), поэтому
+        результат не зависит от порядка ``answer_ids`` и считается за O(k).
+        Если ни один ответ не ведёт дальше, срабатывает переход по любому
+        ответу. Условия рёбер (``surveys.conditions``) проверяются по
+        ``answer_ids`` вместе с ответами ``history`` на прежние вопросы и
+        по числовым ответам ``values`` (вопрос -> число).
+        """
+        best = None
+        best_rank = None
+        mask = None
+        for answer_id in answer_ids:
+            routes = self._answer_routes.get(answer_id)
+            if routes is None or routes[0][1].source_question_id != question_id:
+                continue
+            for rank, edge, check in routes:
+                if best is not None and rank >= best_rank:
+                    break
+                if check is not None:
+                    if mask is None:
+                        mask = self.answer_mask(answer_ids) | self.answer_mask(history)
+                    if not check(mask, values or _NO_VALUES):
+                        continue
+                best, best_rank = edge, rank
+                break
+        if best is not None:
+            return best
+
+        for edge, check in self._any_routes.get(question_id, ()):
+            if check is not None:
+                if mask is None:
+                    mask = self.answer_mask(answer_ids) | self.answer_mask(history)
+                if not check(mask, values or _NO_VALUES):
+                    continue
+            return edge
+        return None
+
+    def fallback_question_id(self, question_id):
+        """Следующий по порядку вопрос, если с вопроса разрешён переход к нему"""
+        return self._fallbacks.get(question_id)
+
+    def next_question(self, question_id, answer_ids=(), history=(), values=None):
+        """Возвращает идентификатор следующего вопроса или None, если опрос окончен"""
+        edge = self.resolve(question_id, answer_ids, history, values)
+        if edge is not None:
+            return edge.target_question_id
+        return self._fallbacks.get(question_id)
+
+    @property
+    def has_conditions(self):
+        return bool(self._conditional)
+
+    def routing_table(self):
+        """Компактная таблица маршрутов для клиентов, которые ходят по опросу сами.
+
+        Ключи — идентификаторы исходных вопросов, ``any`` — цель перехода по
+        любому ответу (или следующий по порядку вопрос), ``answers`` — цели
+        переходов по конкретным ответам. Если таких переходов несколько,
+        ``order`` перечисляет ответы от сильнейшего: из выбранных ответов
+        срабатывает первый в этом списке. В таблицу попадают только
+        безусловные переходы; у вопросов с условными переходами стоит
+        ``conditional``, и следующий вопрос для них нужно запросить у сервера.
+        """
+        table = {}
+
+        def entry(question_id):
+            return table.setdefault(question_id, {"any": None, "answers": {}})
+
+        ranked = sorted(
+            (routes[-1] for routes in self._answer_routes.values()),
+            key=lambda route: route[0],
+        )
+        for _rank, edge, check in ranked:
+            if check is None:
+                answers = entry(edge.source_question_id)["answers"]
+                answers[edge.source_answer_id] = edge.target_question_id
+        for item in table.values():
+            if len(item["answers"]) > 1:
+                item["order"] = list(item["answers"])
+        for question_id, routes in self._any_routes.items():
+            edge, check = routes[-1]
+            if check is None:
+                entry(question_id)["any"] = edge.target_question_id
+        for question_id, target_id in self._fallbacks.items():
+            entry(question_id)["any"] = target_id
+        for question_id in self._conditional:
+            entry(question_id)["conditional"] = True
+        return table
+
+
+_NO_VALUES = MappingProxyType({})
+
+
+def _unsatisfiable(mask, values):
+    return False
+
+
+_graphs = {}
+_generations = {}
+# Вопрос -> опрос для закешированных графов: позволяет сбрасывать граф
+# по изменению ответа или связи без запроса к базе данных.
+_question_surveys = {}
+_epoch = 0
+_lock = threading.Lock()
+
+
+def _generation(survey_id):
+    return _epoch, _generations.get(survey_id, 0)
+
+
+def _drop(survey_id):
+    _generations[survey_id] = _generations.get(survey_id, 0) + 1
+    graph = _graphs.pop(survey_id, None)
+    if graph is not None:
+        for question_id in graph.question_ids:
+            if _question_surveys.get(question_id) == survey_id:
+                del _question_surveys[question_id]
+
+
+def get_flow_graph(survey_id):
+    """Возвращает скомпилированный граф опроса, собирая его при необходимости"""
+    graph = _graphs.get(survey_id)
+    if graph is not None:
+        return graph
+
+    with _lock:
+        generation = _generation(survey_id)
+    graph = FlowGraph(survey_id, *_read_cached(survey_id))
+    with _lock:
+        # Пока граф собирался, опрос могли изменить: такой граф не кешируем.
+        # Пустые графы тоже не храним, чтобы запросы к несуществующим опросам
+        # не раздували кеш.
+        if graph.question_ids and _generation(survey_id) == generation:
+            _graphs[survey_id] = graph
+            for question_id in graph.question_ids:
+                _question_surveys[question_id] = survey_id
+    return graph
+
+
+async def aget_flow_graph(survey_id):
+    """Асинхронный ``get_flow_graph``: собранный граф отдаётся без перехода в поток"""
+    graph = _graphs.get(survey_id)
+    if graph is not None:
+        return graph
+    return await sync_to_async(get_flow_graph)(survey_id)
+
+
+def _read_cached(survey_id):
+    def read():
+        questions, edges = FlowGraph.read(survey_id)
+        cache.remember_questions(survey_id, [question.id for question in questions])
+        return questions, edges
+
+    return cache.cached(
+        "graph",
+        survey_id,
+        [("survey", survey_id)],
+        read,
+        keep=lambda rows: bool(rows[0]),
+    )
+
+
+def invalidate_flow_graph(survey_id=None):
+    """Сбрасывает граф опроса, а без аргумента — все графы"""
+    global _epoch
+    with _lock:
+        if survey_id is None:
+            _epoch += 1
+            _graphs.clear()
+            _question_surveys.clear()
+        else:
+            _drop(survey_id)
+    if survey_id is None:
+        cache.bump_all()
+    else:
+        cache.bump_surveys([survey_id])
+
+
+def invalidate_question_graph(question_id):
+    """Сбрасывает граф опроса, которому принадлежит вопрос, без запросов к базе"""
+    _forget_question(question_id)
+    cache.bump_questions([question_id])
+
+
+def _forget_question(question_id):
+    global _epoch
+    with _lock:
+        survey_id = _question_surveys.get(question_id)
+        if survey_id is None:
+            # Закешированного графа с этим вопросом нет, но он может собираться
+            # прямо сейчас: не даём сохранить такие графы.
+            _epoch += 1
+        else:
+            _drop(survey_id)
+
+
+def invalidate_question_graphs(question_ids):
+    """Сбрасывает графы для набора вопросов, например после массовой записи"""
+    question_ids = list(question_ids)
+    for question_id in question_ids:
+        _forget_question(question_id)
+    cache.bump_questions(question_ids)
@@ -0,0 +1,182 @@
+"""Анализ графа переходов опроса.
+
+Все алгоритмы итеративные и работают за O(V + E) по вопросам и связям,
+поэтому подходят для опросов с десятками тысяч вопросов без риска
+переполнить стек рекурсии.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class GraphAnalysis:
+    """Результат анализа графа опроса"""
+
+    first_question_id: int | None
+    cycles: list[list[int]]
+    unreachable: list[int]
+    dead_ends: list[int]
+    longest_path: list[int]
+
+    @property
+    def has_cycles(self):
+        return bool(self.cycles)
+
+    def as_dict(self):
+        return {
+            "first_question": self.first_question_id,
+            "has_cycles": self.has_cycles,
+            "cycles": self.cycles,
+            "unreachable": self.unreachable,
+            "dead_ends": self.dead_ends,
+            "longest_path": self.longest_path,
+        }
+
+
+def adjacency(graph):
+    """Списки смежности по вопросам опроса без повторяющихся рёбер.
+
+    Переход к следующему по порядку вопросу, когда ни одна связь не
+    сработала, тоже считается ребром.
+    """
+    successors = {question_id: [] for question_id in graph.question_ids}
+    seen = set()
+    pairs = [(edge.source_question_id, edge.target_question_id) for edge in graph.edges]
+    for question_id in graph.question_ids:
+        target_id = graph.fallback_question_id(question_id)
+        if target_id is not None:
+            pairs.append((question_id, target_id))
+    for pair in pairs:
+        if pair in seen or pair[1] not in successors:
+            continue
+        if pair[0] in successors:
+            seen.add(pair)
+            successors[pair[0]].append(pair[1])
+    return successors
+
+
+def strongly_connected_components(successors):
+    """Компоненты сильной связности итеративным алгоритмом Тарьяна.
+
+    Компоненты возвращаются в обратном топологическом порядке: каждая
+    компонента идёт раньше тех, из которых в неё есть рёбра.
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def reachable_from(successors, start):
+    """Вопросы, достижимые из ``start`` (обход в ширину)"""
+    if start is None:
+        return set()
+    visited = {start}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for child in successors[node]:
+            if child not in visited:
+                visited.add(child)
+                queue.append(child)
+    return visited
+
+
+def longest_path(successors, components, order):
+    """Самый длинный путь по вопросам в графе компонент.
+
+    Каждая компонента сильной связности считается одним шагом, поэтому
+    при наличии циклов путь проходит через первый по порядку вопрос цикла.
+    """
+    component_of = {}
+    for number, component in enumerate(components):
+        for node in component:
+            component_of[node] = number
+
+    # Компоненты в обратном топологическом порядке: преемники уже посчитаны.
+    length = [1] * len(components)
+    following = [None] * len(components)
+    for number, component in enumerate(components):
+        for node in component:
+            for child in successors[node]:
+                child_component = component_of[child]
+                if (
+                    child_component != number
+                    and length[child_component] + 1 > (length[number])
+                ):
+                    length[number] = length[child_component] + 1
+                    following[number] = child_component
+
+    if not components:
+        return []
+    current = max(range(len(components)), key=length.__getitem__)
+    path = []
+    while current is not None:
+        path.append(min(components[current], key=order.__getitem__))
+        current = following[current]
+    return path
+
+
+def analyze(graph):
+    """Анализирует скомпилированный граф опроса за линейное время"""
+    successors = adjacency(graph)
+    components = strongly_connected_components(successors)
+    order = {
+        question_id: position for position, question_id in enumerate(graph.question_ids)
+    }
+
+    cycles = []
+    for component in components:
+        if len(component) > 1 or component[0] in successors[component[0]]:
+            cycles.append(sorted(component, key=order.__getitem__))
+    cycles.sort(key=lambda component: order[component[0]])
+
+    reachable = reachable_from(successors, graph.first_question_id)
+    return GraphAnalysis(
+        first_question_id=graph.first_question_id,
+        cycles=cycles,
+        unreachable=[q for q in graph.question_ids if q not in reachable],
+        dead_ends=[q for q in graph.question_ids if not successors[q]],
+        longest_path=longest_path(successors, components, order),
+    )
@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
 
-from surveys.models import Answer, Question, QuestionFlow
+from surveys.models import Answer, Question, QuestionFlow, ResponseItem
+from surveys.validation import FlowCandidate, validate_flows
 
 
 class AnswerInline(admin.TabularInline):
@@ -21,16 +25,149 @@ class QuestionInline(admin.StackedInline):
     classes = ["collapse"]
 
 
+class PrefetchedAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, которое берёт подписи выбранных значений из ``labels``.
+
+    ``AutocompleteSelect`` читает выбранный объект отдельным запросом в
+    каждой форме набора; здесь подписи заполняет набор форм один раз. Если
+    подписи нет (например, значение выбрано в отправленной форме), объект
+    читается как обычно.
+    """
+
+    labels = None
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [str(v) for v in value if str(v) not in ("", "None")]
+        if self.labels is None or not all(v in self.labels for v in selected):
+            return super().optgroups(name, value, attrs)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        for v in selected:
+            options.append(
+                self.create_option(name, v, self.labels[v], True, len(options))
+            )
+        return [(None, options, 0)]
+
+
+class QuestionFlowInlineFormSet(BaseInlineFormSet):
+    """Набор форм связей, который проверяет все связи вопроса разом.
+
+    Проверка каждой связи в ``QuestionFlow.clean()`` отключается, а в
+    ``clean()`` набора все связи проверяются одним запросом к базе.
+    Варианты ответа и подписи вопросов-целей читаются один раз на набор,
+    а не в каждой форме, поэтому число запросов не зависит от числа связей.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._answer_choices = None
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.instance.defer_batch_validation = True
+        return form
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        answer_field = form.fields.get("source_answer")
+        if answer_field is not None:
+            if self._answer_choices is None:
+                self._answer_choices = list(answer_field.choices)
+            answer_field.choices = self._answer_choices
+        target_field = form.fields.get("target_question")
+        if target_field is not None:
+            widget = getattr(target_field.widget, "widget", target_field.widget)
+            if isinstance(widget, PrefetchedAutocompleteSelect):
+                widget.labels = self.target_labels
+
+    @cached_property
+    def target_labels(self):
+        return {
+            str(flow.target_question_id): str(flow.target_question)
+            for flow in self.get_queryset()
+            if flow.target_question_id is not None
+        }
+
+    def clean(self):
+        super().clean()
+
+        forms = []
+        deleted_pks = set()
+        for form in self.forms:
+            if not hasattr(form, "cleaned_data") or not form.cleaned_data:
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                if form.instance.pk is not None:
+                    deleted_pks.add(form.instance.pk)
+                continue
+            if form.is_valid():
+                forms.append(form)
+
+        question_surveys = {self.instance.pk: self.instance.survey_id}
+        answer_questions = {}
+        candidates = []
+        for form in forms:
+            target_question = form.cleaned_data.get("target_question")
+            source_answer = form.cleaned_data.get("source_answer")
+            if target_question is not None:
+                question_surveys[target_question.pk] = target_question.survey_id
+            if source_answer is not None:
+                answer_questions[source_answer.pk] = source_answer.question_id
+            candidates.append(
+                FlowCandidate(
+                    pk=form.instance.pk,
+                    source_question_id=self.instance.pk,
+                    target_question_id=target_question and target_question.pk,
+                    relationship_type=form.cleaned_data.get("relationship_type"),
+                    source_answer_id=source_answer and source_answer.pk,
+                    condition=form.cleaned_data.get("condition", ""),
+                )
+            )
+
+        results = validate_flows(
+            candidates,
+            question_surveys=question_surveys,
+            answer_questions=answer_questions,
+            ignored_pks=deleted_pks,
+        )
+        for form, errors in zip(forms, results):
+            for field, messages in errors.items():
+                form.add_error(field if field in form.fields else None, messages)
+
+
 class QuestionFlowInline(admin.TabularInline):
     """Встроенная форма для связей между вопросами"""
 
     model = QuestionFlow
+    formset = QuestionFlowInlineFormSet
     fk_name = "source_question"
     extra = 1
-    fields = ("relationship_type", "source_answer", "target_question")
+    fields = (
+        "relationship_type",
+        "source_answer",
+        "target_question",
+        "priority",
+        "condition",
+    )
+    autocomplete_fields = ("target_question",)
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            # Подпись строки (QuestionFlow.__str__) выводит и вопрос-источник.
+            .select_related("source_question", "source_answer", "target_question")
+        )
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        """Фильтрация полей выбора в зависимости от контекста"""
+        """Фильтрация полей выбора в зависимости от контекста.
+
+        Ответы — только текущего вопроса, цели — вопросы того же опроса
+        через автодополнение вместо списка всех вопросов. Поиск
+        автодополнения ограничивает тем же опросом
+        ``QuestionAdmin.get_search_results``.
+        """
         question_id = None
 
         if hasattr(request, "resolver_match") and request.resolver_match.kwargs.get(
@@ -45,6 +182,28 @@ class QuestionFlowInline(admin.TabularInline):
             if db_field.name == "source_answer":
                 kwargs["queryset"] = Answer.objects.filter(question_id=question_id)
             elif db_field.name == "target_question":
-                kwargs["queryset"] = Question.objects.exclude(id=question_id)
+                kwargs["queryset"] = Question.objects.filter(
+                    survey__questions=question_id
+                ).exclude(id=question_id)
+        if db_field.name == "target_question":
+            kwargs["widget"] = PrefetchedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using")
+            )
 
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class ResponseItemInline(admin.TabularInline):
+    """Ответы респондента на вопросы (только просмотр)"""
+
+    model = ResponseItem
+    extra = 0
+    can_delete = False
+    fields = ("question", "answer", "text")
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("question", "answer")
+
+    def has_add_permission(self, request, obj=None):
+        return False
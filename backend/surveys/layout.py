@@ -0,0 +1,209 @@
+"""Послойная раскладка графа опроса для визуализации.
+
+Раскладка вычисляется за O(V + E) плюс сортировка слоёв:
+
+1. Компоненты сильной связности сжимаются в вершины, и слои назначаются
+   самым длинным путём по полученному ациклическому графу. Вопросы одного
+   цикла занимают подряд идущие слои в порядке ``order``.
+2. Порядок вопросов в слое уточняется двумя проходами барицентров: вниз по
+   предшественникам и вверх по преемникам.
+
+Ответ сериализуется один раз и хранится в памяти процесса вместе с
+графом, по которому построен: для версии опроса граф неизменяем, а для
+текущей структуры заменяется новым при любом изменении, поэтому раскладка
+пересчитывается только после правок. Формат колоночный: вершины и рёбра —
+параллельные массивы, рёбра ссылаются на индексы вершин.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+
+from surveys.constants import FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.flow_graph import FlowGraph, get_flow_graph
+from surveys.graph_analysis import adjacency, strongly_connected_components
+from surveys.versions import get_version
+
+LAYOUT_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True, slots=True)
+class SurveyLayout:
+    """Сериализованная раскладка и граф, по которому она построена"""
+
+    graph: FlowGraph
+    etag: str
+    body: bytes
+
+
+def assign_layers(graph, successors):
+    """Слой каждого вопроса: самый длинный путь по графу компонент"""
+    components = strongly_connected_components(successors)
+    order = {
+        question_id: position for position, question_id in enumerate(graph.question_ids)
+    }
+    component_of = {}
+    for number, component in enumerate(components):
+        component.sort(key=order.__getitem__)
+        for node in component:
+            component_of[node] = number
+
+    # Компоненты идут в обратном топологическом порядке, поэтому с конца
+    # каждая компонента обрабатывается после всех своих предшественников.
+    start = [0] * len(components)
+    for number in reversed(range(len(components))):
+        end = start[number] + len(components[number])
+        for node in components[number]:
+            for child in successors[node]:
+                child_component = component_of[child]
+                if child_component != number and start[child_component] < end:
+                    start[child_component] = end
+
+    layers = {}
+    for number, component in enumerate(components):
+        for offset, node in enumerate(component):
+            layers[node] = start[number] + offset
+    return layers
+
+
+def order_layers(graph, successors, layers):
+    """Вопросы по слоям, упорядоченные двумя проходами барицентров"""
+    rows = [[] for _ in range(max(layers.values()) + 1)] if layers else []
+    for question_id in graph.question_ids:
+        rows[layers[question_id]].append(question_id)
+
+    predecessors = {question_id: [] for question_id in graph.question_ids}
+    for node, children in successors.items():
+        for child in children:
+            predecessors[child].append(node)
+
+    position = {}
+    for row in rows:
+        for index, node in enumerate(row):
+            position[node] = index
+
+    def sweep(indices, neighbours, before):
+        for layer in indices:
+            row = rows[layer]
+            keys = {}
+            for node in row:
+                linked = [
+                    position[other]
+                    for other in neighbours[node]
+                    if before(layers[other], layer)
+                ]
+                keys[node] = sum(linked) / len(linked) if linked else position[node]
+            row.sort(key=keys.__getitem__)
+            for index, node in enumerate(row):
+                position[node] = index
+
+    sweep(range(1, len(rows)), predecessors, lambda other, layer: other < layer)
+    sweep(range(len(rows) - 2, -1, -1), successors, lambda other, layer: other > layer)
+    return rows
+
+
+def compute_layout(graph):
+    """Раскладка графа в колоночном формате для клиента"""
+    successors = adjacency(graph)
+    layers = assign_layers(graph, successors)
+    rows = order_layers(graph, successors, layers)
+
+    nodes = [node for row in rows for node in row]
+    index = {node: number for number, node in enumerate(nodes)}
+    position = {node: number for row in rows for number, node in enumerate(row)}
+    answer_texts = {
+        answer.id: answer.text
+        for question in graph.questions.values()
+        for answer in question.answers
+    }
+
+    edges = [
+        edge
+        for edge in graph.edges
+        if edge.source_question_id in index and edge.target_question_id in index
+    ]
+    return {
+        "layers": [len(row) for row in rows],
+        "nodes": {
+            "id": nodes,
+            "layer": [layers[node] for node in nodes],
+            "position": [position[node] for node in nodes],
+            "text": [graph.questions[node].text for node in nodes],
+        },
+        "edges": {
+            "source": [index[edge.source_question_id] for edge in edges],
+            "target": [index[edge.target_question_id] for edge in edges],
+            "answer": [
+                edge.source_answer_id
+                if edge.relationship_type == FLOW_TYPE_SPECIFIC_ANSWER
+                else None
+                for edge in edges
+            ],
+            "label": [
+                answer_texts.get(edge.source_answer_id)
+                if edge.relationship_type == FLOW_TYPE_SPECIFIC_ANSWER
+                else None
+                for edge in edges
+            ],
+        },
+    }
+
+
+_layouts = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_layout(survey_id, number=None):
+    """Раскладка текущей структуры опроса или его версии ``number``"""
+    if number is None:
+        graph = get_flow_graph(survey_id)
+    else:
+        version = get_version(survey_id, number)
+        if version is None:
+            raise NotFound(_("Версия опроса не найдена"))
+        graph = version.graph
+    if not graph.question_ids:
+        raise NotFound(_("Опрос не найден"))
+
+    key = (survey_id, number)
+    layout = _layouts.get(key)
+    if layout is not None and layout.graph is graph:
+        with _lock:
+            if key in _layouts:
+                _layouts.move_to_end(key)
+        return layout
+
+    data = {"survey": survey_id, "version": number, **compute_layout(graph)}
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    layout = SurveyLayout(
+        graph=graph, etag=f'"{hashlib.sha1(body).hexdigest()}"', body=body
+    )
+    with _lock:
+        _layouts[key] = layout
+        _layouts.move_to_end(key)
+        while len(_layouts) > LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    return layout
+
+
+def layout_response(request, layout):
+    """Ответ с раскладкой; при совпадающем ``If-None-Match`` — 304"""
+    if layout.etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(layout.body, content_type="application/json")
+    response["ETag"] = layout.etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def clear_layouts():
+    with _lock:
+        _layouts.clear()
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.flow_graph import FlowGraph
+from surveys.graph_analysis import analyze
+from surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = "Ищет циклы, недостижимые вопросы и тупики в графе переходов опроса"
+
+    def add_arguments(self, parser):
+        parser.add_argument("survey_id", type=int)
+        parser.add_argument(
+            "--json", action="store_true", help="вывести результат в формате JSON"
+        )
+        parser.add_argument(
+            "--fail-on-cycles",
+            action="store_true",
+            help="завершиться с ошибкой, если в графе есть циклы",
+        )
+
+    def handle(self, *args, survey_id, **options):
+        if not Survey.objects.filter(pk=survey_id).exists():
+            raise CommandError(f"Опрос {survey_id} не найден")
+
+        result = analyze(FlowGraph.build(survey_id))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result.as_dict(), ensure_ascii=False))
+        else:
+            self.stdout.write(f"Первый вопрос: {result.first_question_id}")
+            self.stdout.write(f"Циклы: {len(result.cycles)}")
+            for cycle in result.cycles:
+                self.stdout.write("  " + " -> ".join(map(str, cycle)))
+            self.stdout.write(f"Недостижимые вопросы: {result.unreachable}")
+            self.stdout.write(f"Тупики: {result.dead_ends}")
+            self.stdout.write(
+                f"Самый длинный путь ({len(result.longest_path)}): "
+                + " -> ".join(map(str, result.longest_path))
+            )
+
+        if options["fail_on_cycles"] and result.has_cycles:
+            raise CommandError("В графе опроса есть циклы")
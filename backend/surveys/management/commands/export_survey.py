@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.export import EXPORT_FORMATS, EXPORT_PARTS, iter_export
+from surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = "Выгружает структуру опроса и ответы в CSV или JSONL потоком"
+
+    def add_arguments(self, parser):
+        parser.add_argument("survey_id", type=int)
+        parser.add_argument(
+            "--format",
+            choices=sorted(EXPORT_FORMATS),
+            default="csv",
+            dest="export_format",
+        )
+        parser.add_argument(
+            "--include",
+            choices=EXPORT_PARTS,
+            action="append",
+            help="что выгружать (можно повторять); по умолчанию всё",
+        )
+        parser.add_argument(
+            "--output", help="файл для записи; по умолчанию стандартный вывод"
+        )
+
+    def handle(self, *args, survey_id, export_format, include, output, **options):
+        if not Survey.objects.filter(pk=survey_id).exists():
+            raise CommandError(f"Опрос {survey_id} не найден")
+
+        chunks = iter_export(survey_id, export_format, include or EXPORT_PARTS)
+        if output is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(output, "w", encoding="utf-8", newline="") as file:
+            for chunk in chunks:
+                file.write(chunk)
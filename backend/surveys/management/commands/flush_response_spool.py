@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.spool import flush_spool, get_spool
+
+
+class Command(BaseCommand):
+    help = "Переносит ответы из очереди отложенной записи в основную базу данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="сколько отправок сохранять одной транзакцией",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="пауза в секундах, когда очередь пуста",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="сбросить очередь до конца и завершиться",
+        )
+
+    def handle(self, *args, batch_size, interval, once, **options):
+        spool = get_spool()
+        if spool is None:
+            raise CommandError("Очередь не настроена: задайте SURVEYS_RESPONSE_SPOOL")
+
+        try:
+            while True:
+                stats = flush_spool(spool, batch_size)
+                if stats.entries:
+                    self.stdout.write(
+                        f"отправок={stats.entries} сессий={stats.sessions} "
+                        f"ответов={stats.items} время={stats.duration * 1000:.1f}мс "
+                        f"отставание={stats.lag:.2f}с"
+                    )
+                if stats.entries < batch_size:
+                    if once:
+                        break
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
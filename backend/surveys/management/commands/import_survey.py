@@ -0,0 +1,51 @@
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.cloning import import_survey
+from surveys.export import EXPORT_FORMATS
+
+
+def _jsonl_records(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = "Создаёт опрос из выгрузки export_survey (записи ответов пропускаются)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="файл выгрузки")
+        parser.add_argument(
+            "--format",
+            choices=sorted(EXPORT_FORMATS),
+            dest="export_format",
+            help="формат файла; по умолчанию определяется по расширению",
+        )
+        parser.add_argument("--title", help="название нового опроса")
+
+    def handle(self, *args, path, export_format, title, **options):
+        if export_format is None:
+            export_format = "jsonl" if path.endswith(".jsonl") else "csv"
+        try:
+            with open(path, encoding="utf-8", newline="") as file:
+                records = (
+                    csv.DictReader(file)
+                    if export_format == "csv"
+                    else _jsonl_records(file)
+                )
+                result = import_survey(records, title=title)
+        except OSError as error:
+            raise CommandError(f"Не удалось прочитать файл: {error}")
+        except json.JSONDecodeError as error:
+            raise CommandError(f"Некорректная строка JSONL: {error}")
+        except ValidationError as error:
+            raise CommandError("\n".join(error.messages))
+
+        self.stdout.write(
+            f"Создан опрос {result.survey.pk}: вопросов {len(result.questions)}, "
+            f"ответов {len(result.answers)}, связей {len(result.flows)}"
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.flow_graph import FlowGraph
+from surveys.models import Survey
+from surveys.statistics import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает статистику ответов опросов с нуля"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "survey_ids",
+            nargs="*",
+            type=int,
+            help="идентификаторы опросов; без них пересчитываются все опросы",
+        )
+
+    def handle(self, *args, survey_ids, **options):
+        surveys = Survey.objects.order_by("id")
+        if survey_ids:
+            surveys = surveys.filter(pk__in=survey_ids)
+            missing = set(survey_ids) - set(surveys.values_list("id", flat=True))
+            if missing:
+                raise CommandError(
+                    f"Опросы не найдены: {', '.join(map(str, sorted(missing)))}"
+                )
+
+        for survey_id in list(surveys.values_list("id", flat=True)):
+            delta = rebuild_statistics(FlowGraph.build(survey_id))
+            started, completed = delta.surveys[survey_id]
+            self.stdout.write(
+                f"Опрос {survey_id}: сессий {started}, завершено {completed}"
+            )
@@ -0,0 +1,128 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Response",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="дата обновления"),
+                ),
+                (
+                    "session_key",
+                    models.CharField(max_length=64, verbose_name="сессия респондента"),
+                ),
+                (
+                    "is_complete",
+                    models.BooleanField(default=False, verbose_name="завершён"),
+                ),
+                (
+                    "survey",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="responses",
+                        to="surveys.survey",
+                        verbose_name="опрос",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "ответ на опрос",
+                "verbose_name_plural": "ответы на опросы",
+            },
+        ),
+        migrations.CreateModel(
+            name="ResponseItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="дата обновления"),
+                ),
+                ("text", models.TextField(blank=True, verbose_name="текст ответа")),
+                (
+                    "answer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="response_items",
+                        to="surveys.answer",
+                        verbose_name="выбранный ответ",
+                    ),
+                ),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="response_items",
+                        to="surveys.question",
+                        verbose_name="вопрос",
+                    ),
+                ),
+                (
+                    "response",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="surveys.response",
+                        verbose_name="ответ на опрос",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "ответ на вопрос",
+                "verbose_name_plural": "ответы на вопросы",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="response",
+            constraint=models.UniqueConstraint(
+                fields=("survey", "session_key"), name="unique_response_session"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="responseitem",
+            index=models.Index(
+                fields=["response", "question"], name="response_item_question"
+            ),
+        ),
+    ]
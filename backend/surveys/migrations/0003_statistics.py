@@ -0,0 +1,103 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0002_responses"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnswerStat",
+            fields=[
+                (
+                    "answer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stat",
+                        serialize=False,
+                        to="surveys.answer",
+                        verbose_name="вариант ответа",
+                    ),
+                ),
+                ("count", models.IntegerField(default=0, verbose_name="выбран")),
+            ],
+            options={
+                "verbose_name": "статистика ответа",
+                "verbose_name_plural": "статистика ответов",
+            },
+        ),
+        migrations.CreateModel(
+            name="FlowStat",
+            fields=[
+                (
+                    "flow",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stat",
+                        serialize=False,
+                        to="surveys.questionflow",
+                        verbose_name="связь вопросов",
+                    ),
+                ),
+                ("taken", models.IntegerField(default=0, verbose_name="переходов")),
+            ],
+            options={
+                "verbose_name": "статистика связи",
+                "verbose_name_plural": "статистика связей",
+            },
+        ),
+        migrations.CreateModel(
+            name="QuestionStat",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stat",
+                        serialize=False,
+                        to="surveys.question",
+                        verbose_name="вопрос",
+                    ),
+                ),
+                ("reached", models.IntegerField(default=0, verbose_name="ответили")),
+                (
+                    "completed",
+                    models.IntegerField(default=0, verbose_name="завершили опрос"),
+                ),
+            ],
+            options={
+                "verbose_name": "статистика вопроса",
+                "verbose_name_plural": "статистика вопросов",
+            },
+        ),
+        migrations.CreateModel(
+            name="SurveyStat",
+            fields=[
+                (
+                    "survey",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stat",
+                        serialize=False,
+                        to="surveys.survey",
+                        verbose_name="опрос",
+                    ),
+                ),
+                ("started", models.IntegerField(default=0, verbose_name="начато")),
+                ("completed", models.IntegerField(default=0, verbose_name="завершено")),
+            ],
+            options={
+                "verbose_name": "статистика опроса",
+                "verbose_name_plural": "статистика опросов",
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0003_statistics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SurveyVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("number", models.PositiveIntegerField(verbose_name="номер версии")),
+                ("snapshot", models.BinaryField(verbose_name="снимок структуры")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="дата публикации"
+                    ),
+                ),
+                (
+                    "survey",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="versions",
+                        to="surveys.survey",
+                        verbose_name="опрос",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "версия опроса",
+                "verbose_name_plural": "версии опросов",
+            },
+        ),
+        migrations.AddField(
+            model_name="response",
+            name="version",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="responses",
+                to="surveys.surveyversion",
+                verbose_name="версия опроса",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="surveyversion",
+            constraint=models.UniqueConstraint(
+                fields=("survey", "number"), name="unique_survey_version"
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0004_survey_versions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answer",
+            name="question",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="surveys.question",
+                verbose_name="вопрос",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="question",
+            name="survey",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="questions",
+                to="surveys.survey",
+                verbose_name="опрос",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="questionflow",
+            name="source_question",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="source_relationships",
+                to="surveys.question",
+                verbose_name="исходный вопрос",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="questionflow",
+            name="target_question",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="target_relationships",
+                to="surveys.question",
+                verbose_name="целевой вопрос",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["question", "order"], name="answer_question_order"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["survey", "order"], name="question_survey_order"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="questionflow",
+            index=models.Index(
+                fields=["source_question", "relationship_type", "source_answer"],
+                name="flow_source_type_answer",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="questionflow",
+            index=models.Index(
+                fields=["target_question", "source_question"], name="flow_target_source"
+            ),
+        ),
+    ]
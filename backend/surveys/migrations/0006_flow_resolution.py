@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0005_flow_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="fallback_to_next",
+            field=models.BooleanField(
+                default=False,
+                help_text="Если ни одна связь не сработала, перейти к следующему вопросу по порядку, а не завершать опрос",
+                verbose_name="переход к следующему вопросу",
+            ),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="flow_resolution",
+            field=models.CharField(
+                choices=[
+                    ("priority", "связь с наименьшим приоритетом"),
+                    ("first_match", "первый выбранный ответ по порядку"),
+                    ("lowest_order", "целевой вопрос с наименьшим порядком"),
+                ],
+                default="priority",
+                help_text="Какая связь срабатывает, если выбрано несколько ответов с разными переходами",
+                max_length=20,
+                verbose_name="выбор перехода",
+            ),
+        ),
+        migrations.AddField(
+            model_name="questionflow",
+            name="priority",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Из нескольких сработавших связей выбирается меньшее значение",
+                verbose_name="приоритет",
+            ),
+        ),
+    ]
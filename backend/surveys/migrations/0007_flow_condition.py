@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0006_flow_resolution"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="questionflow",
+            name="condition",
+            field=models.CharField(
+                blank=True,
+                help_text="Связь срабатывает, только если условие выполнено, например «A12 and not A31» или «Q5 >= 18»",
+                max_length=500,
+                verbose_name="условие",
+            ),
+        ),
+    ]
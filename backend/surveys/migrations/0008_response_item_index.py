@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("surveys", "0007_flow_condition"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="responseitem",
+            name="response",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="items",
+                to="surveys.response",
+                verbose_name="ответ на опрос",
+            ),
+        ),
+    ]
@@ -9,6 +9,8 @@ from surveys.constants import (
     FLOW_TYPE_ANY_ANSWER,
     FLOW_TYPE_SPECIFIC_ANSWER,
     QUESTION_FLOW_TYPES,
+    FLOW_RESOLUTION_PRIORITY,
+    FLOW_RESOLUTIONS,
 )
 
 
@@ -30,11 +32,13 @@ class Survey(TimeStampedModel):
 class Question(TimeStampedModel):
     """Модель для представления вопроса в опросе"""
 
+    # Индекс по опросу покрывает составной индекс question_survey_order.
     survey = models.ForeignKey(
         Survey,
         on_delete=models.CASCADE,
         related_name="questions",
         verbose_name=_("опрос"),
+        db_index=False,
     )
     text = models.TextField(_("текст вопроса"))
     question_type = models.CharField(
@@ -45,11 +49,32 @@ class Question(TimeStampedModel):
     )
     order = models.PositiveIntegerField(_("порядок"), default=0)
     is_required = models.BooleanField(_("обязательный"), default=True)
+    flow_resolution = models.CharField(
+        _("выбор перехода"),
+        max_length=20,
+        choices=FLOW_RESOLUTIONS,
+        default=FLOW_RESOLUTION_PRIORITY,
+        help_text=_(
+            "Какая связь срабатывает, если выбрано несколько ответов "
+            "с разными переходами"
+        ),
+    )
+    fallback_to_next = models.BooleanField(
+        _("переход к следующему вопросу"),
+        default=False,
+        help_text=_(
+            "Если ни одна связь не сработала, перейти к следующему вопросу "
+            "по порядку, а не завершать опрос"
+        ),
+    )
 
     class Meta:
         verbose_name = _("вопрос")
         verbose_name_plural = _("вопросы")
         ordering = ["order"]
+        indexes = [
+            models.Index(fields=["survey", "order"], name="question_survey_order"),
+        ]
 
     def __str__(self):
         return self.text
@@ -58,11 +83,13 @@ class Question(TimeStampedModel):
 class Answer(TimeStampedModel):
     """Модель для представления варианта ответа на вопрос"""
 
+    # Индекс по вопросу покрывает составной индекс answer_question_order.
     question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE,
         related_name="answers",
         verbose_name=_("вопрос"),
+        db_index=False,
     )
     text = models.CharField(_("текст ответа"), max_length=255)
     order = models.PositiveIntegerField(_("порядок"), default=0)
@@ -71,6 +98,9 @@ class Answer(TimeStampedModel):
         verbose_name = _("вариант ответа")
         verbose_name_plural = _("варианты ответов")
         ordering = ["order"]
+        indexes = [
+            models.Index(fields=["question", "order"], name="answer_question_order"),
+        ]
 
     def __str__(self):
         return self.text
@@ -79,17 +109,25 @@ class Answer(TimeStampedModel):
 class QuestionFlow(TimeStampedModel):
     """Модель для связи между вопросами на основе ответов"""
 
+    batch_validated_constraints = {"unique_question_flow", "unique_any_answer_flow"}
+    # Устанавливается формсетом, который проверяет все связи пакетно.
+    defer_batch_validation = False
+
+    # Отдельные индексы по вопросам не нужны: их покрывают составные
+    # индексы flow_source_type_answer и flow_target_source.
     source_question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE,
         related_name="source_relationships",
         verbose_name=_("исходный вопрос"),
+        db_index=False,
     )
     target_question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE,
         related_name="target_relationships",
         verbose_name=_("целевой вопрос"),
+        db_index=False,
     )
     relationship_type = models.CharField(
         _("тип связи"),
@@ -105,6 +143,20 @@ class QuestionFlow(TimeStampedModel):
         null=True,
         blank=True,
     )
+    priority = models.PositiveIntegerField(
+        _("приоритет"),
+        default=0,
+        help_text=_("Из нескольких сработавших связей выбирается меньшее значение"),
+    )
+    condition = models.CharField(
+        _("условие"),
+        max_length=500,
+        blank=True,
+        help_text=_(
+            "Связь срабатывает, только если условие выполнено, например "
+            "«A12 and not A31» или «Q5 >= 18»"
+        ),
+    )
 
     class Meta:
         verbose_name = _("связь вопросов")
@@ -125,6 +177,18 @@ class QuestionFlow(TimeStampedModel):
                 name="unique_any_answer_flow",
             ),
         ]
+        indexes = [
+            # Связи, уходящие с вопроса, и связь по конкретному ответу.
+            models.Index(
+                fields=["source_question", "relationship_type", "source_answer"],
+                name="flow_source_type_answer",
+            ),
+            # Связи, ведущие в вопрос: проверки и удаление вопроса.
+            models.Index(
+                fields=["target_question", "source_question"],
+                name="flow_target_source",
+            ),
+        ]
 
     def __str__(self):
         if self.relationship_type == FLOW_TYPE_ANY_ANSWER:
@@ -138,41 +202,239 @@ class QuestionFlow(TimeStampedModel):
                 target=self.target_question,
             )
 
+    def get_constraints(self):
+        # Ограничения уникальности связи проверяются пакетно в clean(),
+        # поэтому не повторяем их отдельными запросами на каждую связь.
+        return [
+            (
+                model_class,
+                [
+                    constraint
+                    for constraint in constraints
+                    if constraint.name not in self.batch_validated_constraints
+                ],
+            )
+            for model_class, constraints in super().get_constraints()
+        ]
+
     def clean(self):
         if (
             self.relationship_type == FLOW_TYPE_SPECIFIC_ANSWER
-            and self.source_answer is None
+            and self.source_answer_id is None
         ):
             raise ValidationError(
                 _("Для связи по конкретному ответу необходимо указать ответ")
             )
 
-        if self.source_answer and self.source_answer.question != self.source_question:
+        if self.source_question_id == self.target_question_id:
+            raise ValidationError(_("Исходный и целевой вопросы не могут совпадать"))
+
+        # Формсет, проверяющий все связи вопроса сразу, отключает проверку
+        # по одной связи.
+        if self.defer_batch_validation:
+            return
+
+        from surveys.validation import validate_flow_instances
+
+        errors = validate_flow_instances([self])[0]
+        if errors:
             raise ValidationError(
-                _("Выбранный ответ должен принадлежать исходному вопросу")
+                [message for messages in errors.values() for message in messages]
             )
 
-        if self.source_question == self.target_question:
-            raise ValidationError(_("Исходный и целевой вопросы не могут совпадать"))
 
-        # Проверяем уникальность связи с учетом всех особенностей
-        existing_flows = QuestionFlow.objects.filter(
-            source_question=self.source_question,
-            target_question=self.target_question,
-            relationship_type=self.relationship_type,
+class SurveyVersion(models.Model):
+    """Опубликованная версия опроса: неизменяемый снимок структуры.
+
+    Снимок хранит вопросы, варианты ответов и связи в сжатом виде (см.
+    ``surveys.versions``), поэтому навигация по версии не читает живые
+    строки опроса, а сам снимок можно кешировать без сброса.
+    """
+
+    survey = models.ForeignKey(
+        Survey,
+        on_delete=models.CASCADE,
+        related_name="versions",
+        verbose_name=_("опрос"),
+    )
+    number = models.PositiveIntegerField(_("номер версии"))
+    snapshot = models.BinaryField(_("снимок структуры"))
+    created_at = models.DateTimeField(_("дата публикации"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("версия опроса")
+        verbose_name_plural = _("версии опросов")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["survey", "number"], name="unique_survey_version"
+            ),
+        ]
+
+    def __str__(self):
+        return _("{survey}, версия {number}").format(
+            survey=self.survey, number=self.number
         )
 
-        # Исключаем текущий объект при редактировании
-        if self.pk:
-            existing_flows = existing_flows.exclude(pk=self.pk)
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Опубликованную версию опроса нельзя изменить")
+        super().save(*args, **kwargs)
 
-        # Для связи на основе конкретного ответа проверяем по source_answer
-        if (
-            self.relationship_type == FLOW_TYPE_SPECIFIC_ANSWER
-            and existing_flows.filter(source_answer=self.source_answer).exists()
-        ):
-            raise ValidationError(_("Такая связь уже существует"))
 
-        # Для связи на основе любого ответа - просто проверяем наличие
-        if self.relationship_type == FLOW_TYPE_ANY_ANSWER and existing_flows.exists():
-            raise ValidationError(_("Связь между этими вопросами уже существует"))
+class Response(TimeStampedModel):
+    """Модель для представления ответов одного респондента на опрос"""
+
+    survey = models.ForeignKey(
+        Survey,
+        on_delete=models.CASCADE,
+        related_name="responses",
+        verbose_name=_("опрос"),
+    )
+    # Версия, по которой сессия проходит опрос; фиксируется при создании.
+    version = models.ForeignKey(
+        SurveyVersion,
+        on_delete=models.SET_NULL,
+        related_name="responses",
+        verbose_name=_("версия опроса"),
+        null=True,
+        blank=True,
+    )
+    session_key = models.CharField(_("сессия респондента"), max_length=64)
+    is_complete = models.BooleanField(_("завершён"), default=False)
+
+    class Meta:
+        verbose_name = _("ответ на опрос")
+        verbose_name_plural = _("ответы на опросы")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["survey", "session_key"],
+                name="unique_response_session",
+            ),
+        ]
+
+    def __str__(self):
+        return self.session_key
+
+
+class ResponseItem(TimeStampedModel):
+    """Модель для представления ответа респондента на вопрос.
+
+    Для вопросов с выбором хранится по строке на каждый выбранный
+    вариант, для текстового вопроса — одна строка с текстом.
+    """
+
+    # Индекс по сессии покрывает составной индекс response_item_question.
+    response = models.ForeignKey(
+        Response,
+        on_delete=models.CASCADE,
+        related_name="items",
+        verbose_name=_("ответ на опрос"),
+        db_index=False,
+    )
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE,
+        related_name="response_items",
+        verbose_name=_("вопрос"),
+    )
+    answer = models.ForeignKey(
+        Answer,
+        on_delete=models.CASCADE,
+        related_name="response_items",
+        verbose_name=_("выбранный ответ"),
+        null=True,
+        blank=True,
+    )
+    text = models.TextField(_("текст ответа"), blank=True)
+
+    class Meta:
+        verbose_name = _("ответ на вопрос")
+        verbose_name_plural = _("ответы на вопросы")
+        indexes = [
+            models.Index(
+                fields=["response", "question"], name="response_item_question"
+            ),
+        ]
+
+    def __str__(self):
+        if self.answer_id is not None:
+            return str(self.answer)
+        return self.text
+
+
+class SurveyStat(models.Model):
+    """Счётчики сессий опроса, обновляемые при приёме ответов"""
+
+    survey = models.OneToOneField(
+        Survey,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stat",
+        verbose_name=_("опрос"),
+    )
+    started = models.IntegerField(_("начато"), default=0)
+    completed = models.IntegerField(_("завершено"), default=0)
+
+    class Meta:
+        verbose_name = _("статистика опроса")
+        verbose_name_plural = _("статистика опросов")
+
+
+class QuestionStat(models.Model):
+    """Сколько сессий ответили на вопрос и сколько из них завершили опрос"""
+
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stat",
+        verbose_name=_("вопрос"),
+    )
+    reached = models.IntegerField(_("ответили"), default=0)
+    completed = models.IntegerField(_("завершили опрос"), default=0)
+
+    class Meta:
+        verbose_name = _("статистика вопроса")
+        verbose_name_plural = _("статистика вопросов")
+
+
+class AnswerStat(models.Model):
+    """Сколько раз выбран вариант ответа"""
+
+    answer = models.OneToOneField(
+        Answer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stat",
+        verbose_name=_("вариант ответа"),
+    )
+    count = models.IntegerField(_("выбран"), default=0)
+
+    class Meta:
+        verbose_name = _("статистика ответа")
+        verbose_name_plural = _("статистика ответов")
+
+
+class FlowStat(models.Model):
+    """Сколько раз респонденты ушли с вопроса по связи.
+
+    Связь определяется по графу опроса в момент приёма ответа, поэтому
+    после изменения связей счётчик приблизителен до пересчёта командой
+    ``rebuild_statistics``. По той же причине нет ограничения внешнего
+    ключа: граф другого процесса может ссылаться на только что удалённую
+    связь.
+    """
+
+    flow = models.OneToOneField(
+        QuestionFlow,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stat",
+        verbose_name=_("связь вопросов"),
+        db_constraint=False,
+    )
+    taken = models.IntegerField(_("переходов"), default=0)
+
+    class Meta:
+        verbose_name = _("статистика связи")
+        verbose_name_plural = _("статистика связей")
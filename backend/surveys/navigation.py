@@ -0,0 +1,170 @@
+"""Разбор параметров запроса и проверка выбора респондента по графу опроса"""
+
+import math
+from typing import NamedTuple
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
+
+from surveys.constants import QUESTION_TYPE_SINGLE, QUESTION_TYPE_TEXT
+
+
+def parse_names(values):
+    """Разбирает значения из повторяющихся и/или перечисленных через запятую параметров.
+
+    Порядок сохраняется, повторы отбрасываются.
+    """
+    names = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if part:
+                names.append(part)
+    return list(dict.fromkeys(names))
+
+
+def parse_ids(values):
+    """Разбирает идентификаторы так же, как ``parse_names``.
+
+    При некорректном значении поднимается ``ValueError``.
+    """
+    return list(dict.fromkeys(int(name) for name in parse_names(values)))
+
+
+def parse_number(value):
+    """Конечное число из строки; иначе ``ValueError``"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+def parse_values(values):
+    """Числовые ответы из пар ``<вопрос>:<число>``, как в ``parse_names``"""
+    parsed = {}
+    for name in parse_names(values):
+        question_id, separator, number = name.partition(":")
+        if not separator:
+            raise ValueError(name)
+        parsed[int(question_id)] = parse_number(number)
+    return parsed
+
+
+class Step(NamedTuple):
+    """Шаг навигации: вопрос, выбранные ответы и числовой ответ"""
+
+    question_id: int
+    answer_ids: list
+    value: float | None
+
+
+def parse_step(query_params):
+    """Шаг навигации из параметров ``question``, ``answers`` и ``value``"""
+    try:
+        question_id = int(query_params["question"])
+        answer_ids = parse_ids(query_params.getlist("answers"))
+    except ValueError:
+        raise ValidationError(_("Идентификаторы должны быть целыми числами"))
+    value = query_params.get("value")
+    if value is not None:
+        try:
+            value = parse_number(value)
+        except ValueError:
+            raise ValidationError({"value": [_("Значение должно быть числом")]})
+    return Step(question_id, answer_ids, value)
+
+
+def parse_history(query_params):
+    """Ответы на прежние вопросы из ``history`` и ``values`` для условий"""
+    try:
+        history = parse_ids(query_params.getlist("history"))
+    except ValueError:
+        raise ValidationError(_("Идентификаторы должны быть целыми числами"))
+    try:
+        values = parse_values(query_params.getlist("values"))
+    except ValueError:
+        raise ValidationError(
+            {"values": [_("Ожидаются пары «вопрос:число» через запятую")]}
+        )
+    return history, values
+
+
+def next_question_id(graph, step, history, values):
+    """Следующий вопрос после проверенного шага ``step``"""
+    errors = selection_errors(graph, step.question_id, step.answer_ids)
+    if errors:
+        raise ValidationError(errors)
+    if step.value is not None:
+        values = {**values, step.question_id: step.value}
+    return graph.next_question(step.question_id, step.answer_ids, history, values)
+
+
+def selection_errors(graph, question_id, answer_ids):
+    """Возвращает словарь ошибок выбора ответов или пустой словарь"""
+    question = graph.questions.get(question_id)
+    if question is None:
+        return {"question": [_("Вопрос не принадлежит опросу")]}
+
+    if question.question_type == QUESTION_TYPE_TEXT:
+        if answer_ids:
+            return {"answers": [_("Текстовый вопрос не имеет вариантов ответа")]}
+        return {}
+
+    if any(graph.answer_question_id(a) != question_id for a in answer_ids):
+        return {"answers": [_("Ответ должен принадлежать текущему вопросу")]}
+
+    if question.question_type == QUESTION_TYPE_SINGLE and len(answer_ids) > 1:
+        return {"answers": [_("На этот вопрос можно выбрать только один ответ")]}
+
+    if question.is_required and not answer_ids:
+        return {"answers": [_("Необходимо выбрать ответ")]}
+
+    return {}
+
+
+def version_number(query_params):
+    """Номер версии из параметра ``version`` или None"""
+    raw_version = query_params.get("version")
+    if raw_version is None:
+        return None
+    try:
+        return int(raw_version)
+    except ValueError:
+        raise ValidationError(_("Идентификаторы должны быть целыми числами"))
+
+
+def navigation_data(graph, version, query_params):
+    """Ответ навигации: вопрос, следующий за ``question`` при ответах ``answers``.
+
+    Для условий переходов клиент передаёт ответы на прежние вопросы в
+    ``history`` и ``values``, а числовой ответ на текущий вопрос — в
+    ``value``. Общий для синхронного и асинхронного представлений;
+    обращений к базе данных нет, ошибки поднимаются исключениями DRF.
+    """
+    if not graph.question_ids:
+        raise NotFound(_("Опрос не найден"))
+
+    if query_params.get("question") is None:
+        question_id = graph.first_question_id
+    else:
+        question_id = next_question_id(
+            graph, parse_step(query_params), *parse_history(query_params)
+        )
+
+    data = {
+        "question": graph.payloads.get(question_id),
+        "is_finished": question_id is None,
+    }
+    if version is not None:
+        data["version"] = version.number
+    return data
+
+
+def answers_data(graph, question_id):
+    """Упорядоченные варианты ответа вопроса из скомпилированного графа"""
+    if not graph.question_ids:
+        raise NotFound(_("Опрос не найден"))
+    payload = graph.payloads.get(question_id)
+    if payload is None:
+        raise NotFound(_("Вопрос не найден"))
+    return {"question": question_id, "answers": payload["answers"]}
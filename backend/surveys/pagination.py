@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class QuestionFlowCursorPagination(CursorPagination):
+    """Курсорная пагинация связей: стабильна при вставках и не делает COUNT(*)"""
+
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
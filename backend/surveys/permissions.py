@@ -0,0 +1,14 @@
+"""Разрешения API опросов"""
+
+from rest_framework.permissions import BasePermission
+
+from surveys.respondents import RespondentSession
+
+
+class IsSurveyRespondent(BasePermission):
+    """Респондент с токеном сессии того опроса, к которому обращается запрос"""
+
+    def has_permission(self, request, view):
+        return isinstance(
+            request.auth, RespondentSession
+        ) and request.auth.survey_id == view.kwargs.get("survey_id")
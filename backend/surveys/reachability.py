@@ -0,0 +1,344 @@
+"""Инкрементально поддерживаемая достижимость вопросов для проверки циклов.
+
+Для каждого опроса хранится транзитивное замыкание графа связей: для
+каждого вопроса — битовая маска достижимых из него вопросов. Проверка
+«создаст ли связь цикл» сводится к одной битовой операции, добавление
+связи обновляет маски за O(V) операций над целыми числами, а удаление
+связи помечает замыкание устаревшим и пересчитывает его за O(V + E)
+при следующей проверке.
+
+Переход к следующему по порядку вопросу (``Question.fallback_to_next``)
+тоже считается ребром — даже если у вопроса есть безусловная связь и
+переход на деле не сработает. Изменение порядка вопросов или флажка
+сбрасывает индекс опроса.
+
+Индекс обновляется сигналами в текущем процессе. Изменения из других
+процессов видны по метке опроса в общем кеше (``surveys.cache``): её
+меняют сигналы связей и вопросов, и индекс с устаревшей меткой
+собирается заново при следующей проверке. Если метку не удалось сменить
+(соответствие вопроса опросу вытеснено из кеша), изменения и откаченные
+транзакции учитываются пересборкой индекса не реже, чем раз в
+``SURVEYS_REACHABILITY_MAX_AGE`` секунд.
+"""
+
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from surveys import cache
+from surveys.graph_analysis import strongly_connected_components
+from surveys.models import Question, QuestionFlow
+
+
+def fallback_pairs(questions):
+    """Пары (вопрос, следующий вопрос) для переходов по порядку.
+
+    ``questions`` — пары (вопрос, ``fallback_to_next``), упорядоченные
+    так же, как в графе переходов: по порядку, затем по идентификатору.
+    """
+    questions = list(questions)
+    return [
+        (question_id, following_id)
+        for (question_id, fallback), (following_id, _) in zip(questions, questions[1:])
+        if fallback
+    ]
+
+
+class ReachabilityIndex:
+    """Транзитивное замыкание графа связей одного опроса"""
+
+    def __init__(self, question_ids, pairs, fallbacks=()):
+        self.has_fallbacks = bool(fallbacks)
+        pairs = list(pairs) + list(fallbacks)
+        self._bits = {}
+        self._pairs = Counter()
+        self._successors = {}
+        self._reach = {}
+        self._dirty = False
+        for question_id in question_ids:
+            self.add_question(question_id)
+        for source, target in pairs:
+            self.add_question(source)
+            self.add_question(target)
+            self._pairs[(source, target)] += 1
+            if self._pairs[(source, target)] == 1:
+                self._successors[source].add(target)
+        self._recompute()
+
+    @classmethod
+    def build(cls, survey_id):
+        """Собирает индекс опроса двумя запросами"""
+        questions = list(
+            Question.objects.filter(survey_id=survey_id)
+            .order_by("order", "id")
+            .values_list("id", "fallback_to_next")
+        )
+        pairs = QuestionFlow.objects.filter(
+            source_question__survey_id=survey_id
+        ).values_list("source_question_id", "target_question_id")
+        # По этому соответствию сигналы связей меняют метку опроса.
+        question_ids = [question_id for question_id, _ in questions]
+        cache.remember_questions(survey_id, question_ids)
+        index = cls(
+            question_ids,
+            list(pairs),
+            fallback_pairs(questions),
+        )
+        # Последний вопрос с флажком ещё не дал ребра, но даст его,
+        # когда после него появится вопрос.
+        index.has_fallbacks = any(fallback for _, fallback in questions)
+        return index
+
+    @property
+    def question_ids(self):
+        return self._bits.keys()
+
+    def add_question(self, question_id):
+        if question_id not in self._bits:
+            self._bits[question_id] = 1 << len(self._bits)
+            self._successors[question_id] = set()
+            self._reach[question_id] = 0
+
+    def can_reach(self, source, target):
+        """Есть ли путь из ``source`` в ``target`` (вопрос достижим из себя)"""
+        if source == target:
+            return True
+        if source not in self._bits or target not in self._bits:
+            return False
+        if self._dirty:
+            self._recompute()
+        return bool(self._reach[source] & self._bits[target])
+
+    def would_create_cycle(self, source, target):
+        """Создаст ли цикл новая связь ``source`` -> ``target``"""
+        return self.can_reach(target, source)
+
+    def cycle_pairs(self, added, removed=()):
+        """Какие из добавляемых пар окажутся на цикле после изменения набора.
+
+        Пересчитывает компоненты сильной связности итогового графа за
+        O(V + E): связь лежит на цикле, если её концы в одной компоненте.
+        """
+        pairs = Counter(self._pairs)
+        pairs.subtract(removed)
+        pairs.update(added)
+        successors = {question_id: [] for question_id in self._bits}
+        for source, target in added:
+            successors.setdefault(source, [])
+            successors.setdefault(target, [])
+        for (source, target), count in pairs.items():
+            if count > 0:
+                successors[source].append(target)
+
+        component_of = {}
+        for number, component in enumerate(strongly_connected_components(successors)):
+            for question_id in component:
+                component_of[question_id] = number
+        return {
+            (source, target)
+            for source, target in added
+            if component_of[source] == component_of[target]
+        }
+
+    def add_edge(self, source, target):
+        self.add_question(source)
+        self.add_question(target)
+        self._pairs[(source, target)] += 1
+        if self._pairs[(source, target)] > 1:
+            return
+        self._successors[source].add(target)
+        if self._dirty:
+            return
+
+        # Всё, что достигало source (и сам source), теперь достигает target
+        # и всё, что достижимо из target.
+        source_bit = self._bits[source]
+        gained = self._reach[target] | self._bits[target]
+        for question_id, reach in self._reach.items():
+            if question_id == source or reach & source_bit:
+                self._reach[question_id] = reach | gained
+
+    def remove_edge(self, source, target):
+        if self._pairs[(source, target)] <= 0:
+            return
+        self._pairs[(source, target)] -= 1
+        if self._pairs[(source, target)] == 0:
+            del self._pairs[(source, target)]
+            self._successors[source].discard(target)
+            self._dirty = True
+
+    def _recompute(self):
+        reach = {}
+        # Компоненты идут в обратном топологическом порядке, поэтому
+        # преемники каждой компоненты уже посчитаны.
+        for component in strongly_connected_components(self._successors):
+            members = set(component)
+            mask = 0
+            for question_id in component:
+                for target in self._successors[question_id]:
+                    if target not in members:
+                        mask |= reach[target] | self._bits[target]
+            if len(component) > 1 or component[0] in self._successors[component[0]]:
+                for question_id in component:
+                    mask |= self._bits[question_id]
+            for question_id in component:
+                reach[question_id] = mask
+        self._reach = reach
+        self._dirty = False
+
+
+_indexes = {}
+_question_surveys = {}
+_generations = {}
+_epoch = 0
+_lock = threading.RLock()
+
+
+def _max_age():
+    return getattr(settings, "SURVEYS_REACHABILITY_MAX_AGE", 300)
+
+
+def _generation(survey_id):
+    return _epoch, _generations.get(survey_id, 0)
+
+
+def _store(survey_id, index, stamp):
+    _indexes[survey_id] = (index, time.monotonic(), stamp)
+    for question_id in index.question_ids:
+        _question_surveys[question_id] = survey_id
+
+
+def _forget(survey_id):
+    cached = _indexes.pop(survey_id, None)
+    if cached is not None:
+        for question_id in cached[0].question_ids:
+            if _question_surveys.get(question_id) == survey_id:
+                del _question_surveys[question_id]
+
+
+def _drop(survey_id):
+    _generations[survey_id] = _generations.get(survey_id, 0) + 1
+    _forget(survey_id)
+
+
+def get_reachability(survey_id):
+    """Возвращает индекс достижимости опроса, собирая его при необходимости"""
+    # Метка читается до сборки: изменение во время сборки сменит её,
+    # и следующая проверка соберёт индекс заново.
+    stamp = cache.survey_stamp(survey_id)
+    with _lock:
+        cached = _indexes.get(survey_id)
+        if (
+            cached is not None
+            and cached[2] == stamp
+            and time.monotonic() - cached[1] < _max_age()
+        ):
+            return cached[0]
+        generation = _generation(survey_id)
+
+    index = ReachabilityIndex.build(survey_id)
+    with _lock:
+        # Пока индекс собирался, связи могли измениться: такой индекс не кешируем.
+        if _generation(survey_id) == generation:
+            _forget(survey_id)
+            _store(survey_id, index, stamp)
+    return index
+
+
+def find_cycle_pairs(survey_id, added, removed=()):
+    """Возвращает добавляемые пары (источник, цель), которые замкнут цикл.
+
+    Одиночная новая связь проверяется одной битовой операцией, набор
+    связей или изменение существующих — пересчётом компонент.
+    """
+    index = get_reachability(survey_id)
+    with _lock:
+        if len(added) == 1 and not removed:
+            source, target = added[0]
+            return (
+                {(source, target)}
+                if index.would_create_cycle(source, target)
+                else set()
+            )
+        return index.cycle_pairs(added, removed)
+
+
+def question_added(question_id, survey_id, fallback_to_next=False):
+    """Добавляет сохранённый вопрос в индекс его опроса"""
+    with _lock:
+        previous = _question_surveys.get(question_id)
+        if previous is not None and previous != survey_id:
+            # Вопрос переехал в другой опрос вместе со связями.
+            _drop(previous)
+            _drop(survey_id)
+            return
+        cached = _indexes.get(survey_id)
+        if cached is None:
+            _generations[survey_id] = _generations.get(survey_id, 0) + 1
+            return
+        if fallback_to_next or cached[0].has_fallbacks:
+            # Порядок вопроса или его флажок могли сдвинуть переходы
+            # к следующему вопросу: индекс собирается заново.
+            _drop(survey_id)
+            return
+        cached[0].add_question(question_id)
+        _question_surveys[question_id] = survey_id
+
+
+def question_removed(survey_id):
+    """Сбрасывает индекс, если удаление вопроса сдвигает переходы по порядку"""
+    with _lock:
+        cached = _indexes.get(survey_id)
+        if cached is None:
+            _generations[survey_id] = _generations.get(survey_id, 0) + 1
+        elif cached[0].has_fallbacks:
+            _drop(survey_id)
+
+
+def edge_added(source, target):
+    """Учитывает новую связь в индексе опроса исходного вопроса"""
+    global _epoch
+    with _lock:
+        survey_id = _question_surveys.get(source)
+        if survey_id is None:
+            # Закешированного индекса с этим вопросом нет, но он может
+            # собираться прямо сейчас: не даём сохранить такие индексы.
+            _epoch += 1
+            return
+        _indexes[survey_id][0].add_edge(source, target)
+
+
+def edge_removed(source, target):
+    """Учитывает удалённую связь в индексе опроса исходного вопроса"""
+    global _epoch
+    with _lock:
+        survey_id = _question_surveys.get(source)
+        if survey_id is None:
+            _epoch += 1
+            return
+        _indexes[survey_id][0].remove_edge(source, target)
+
+
+def edge_changed(source):
+    """Сбрасывает индекс после изменения связи, прежние концы которой неизвестны"""
+    global _epoch
+    with _lock:
+        survey_id = _question_surveys.get(source)
+        if survey_id is None:
+            _epoch += 1
+        else:
+            _drop(survey_id)
+
+
+def invalidate_reachability(survey_id=None):
+    """Сбрасывает индекс опроса, а без аргумента — все индексы"""
+    global _epoch
+    with _lock:
+        if survey_id is None:
+            _epoch += 1
+            _indexes.clear()
+            _question_surveys.clear()
+        else:
+            _drop(survey_id)
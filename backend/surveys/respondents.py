@@ -0,0 +1,160 @@
+"""Сессии анонимных респондентов на подписанных токенах.
+
+Токен респондента самодостаточен: в нём подписаны опрос, версия, ключ
+сессии и текущий вопрос. Подпись — HMAC от ``SECRET_KEY`` через
+``django.core.signing`` (ключи из ``SECRET_KEY_FALLBACKS`` тоже
+принимаются), поэтому проверка токена и продолжение сессии не обращаются
+к базе данных, а для респондентов не заводятся пользователи и токены
+DRF. Токен выдаётся при начале сессии и обновляется на каждом шаге
+навигации; действует ``SURVEYS_RESPONDENT_TOKEN_MAX_AGE`` секунд с
+момента выдачи (по умолчанию неделя).
+
+Для опросов с условиями переходов токен хранит и ответы респондента:
+выбранные варианты и числовые ответы, по которым проверяются условия
+следующих шагов. Токены остальных опросов остаются короткими.
+"""
+
+import secrets
+from dataclasses import dataclass, replace
+
+from django.conf import settings
+from django.core import signing
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
+
+from surveys.flow_graph import aget_flow_graph, get_flow_graph
+from surveys.navigation import next_question_id, parse_step
+from surveys.versions import aget_version, get_version
+
+RESPONDENT_TOKEN_SALT = "surveys.respondent"
+
+
+@dataclass(frozen=True, slots=True)
+class RespondentSession:
+    """Сессия респондента из токена; ``question`` — None, если опрос пройден.
+
+    ``answers`` — выбранные варианты, ``values`` — пары «вопрос, число».
+    """
+
+    survey_id: int
+    version: int | None
+    session: str
+    question: int | None
+    answers: tuple[int, ...] = ()
+    values: tuple[tuple[int, float], ...] = ()
+
+
+def start_session(survey_id, version, question_id):
+    """Новая сессия с первым вопросом опроса"""
+    return RespondentSession(survey_id, version, secrets.token_urlsafe(16), question_id)
+
+
+def dump_token(respondent):
+    data = [
+        respondent.survey_id,
+        respondent.version,
+        respondent.session,
+        respondent.question,
+    ]
+    if respondent.answers or respondent.values:
+        data += [list(respondent.answers), [list(pair) for pair in respondent.values]]
+    return signing.dumps(data, salt=RESPONDENT_TOKEN_SALT)
+
+
+def load_token(token):
+    """Сессия из токена; неверная подпись или срок — ``signing.BadSignature``"""
+    data = signing.loads(
+        token,
+        salt=RESPONDENT_TOKEN_SALT,
+        max_age=getattr(settings, "SURVEYS_RESPONDENT_TOKEN_MAX_AGE", 7 * 24 * 3600),
+    )
+    try:
+        survey_id, version, session, question, *state = data
+        answers, values = state or ((), ())
+        return RespondentSession(
+            int(survey_id),
+            version,
+            str(session),
+            question,
+            tuple(int(answer_id) for answer_id in answers),
+            tuple((int(question_id), float(value)) for question_id, value in values),
+        )
+    except (TypeError, ValueError):
+        raise signing.BadSignature("Некорректное содержимое токена")
+
+
+def respondent_graph(survey_id, respondent):
+    """Граф, по которому идёт сессия: версии из токена или текущий"""
+    if respondent.version is None:
+        return get_flow_graph(survey_id)
+    version = get_version(survey_id, respondent.version)
+    if version is None:
+        raise NotFound(_("Версия опроса не найдена"))
+    return version.graph
+
+
+async def arespondent_graph(survey_id, respondent):
+    """Асинхронный ``respondent_graph``"""
+    if respondent.version is None:
+        return await aget_flow_graph(survey_id)
+    version = await aget_version(survey_id, respondent.version)
+    if version is None:
+        raise NotFound(_("Версия опроса не найдена"))
+    return version.graph
+
+
+def remember_step(graph, respondent, step):
+    """Сессия с ответами шага вместо прежних ответов на тот же вопрос"""
+    answers = tuple(
+        answer_id
+        for answer_id in respondent.answers
+        if graph.answer_question_id(answer_id) != step.question_id
+    )
+    values = tuple(pair for pair in respondent.values if pair[0] != step.question_id)
+    if step.value is not None:
+        values += ((step.question_id, step.value),)
+    return replace(respondent, answers=answers + tuple(step.answer_ids), values=values)
+
+
+def respondent_navigation(graph, respondent, query_params):
+    """Шаг навигации респондента с обновлённым токеном.
+
+    Без ``question`` возвращается текущий вопрос сессии, поэтому клиент
+    продолжает прерванную сессию по одному токену. Ответить можно только
+    на текущий вопрос сессии: пропустить ветку или продолжить пройденный
+    опрос с тем же токеном нельзя.
+    """
+    if "question" in query_params:
+        if not graph.question_ids:
+            raise NotFound(_("Опрос не найден"))
+        step = parse_step(query_params)
+        if respondent.question is None:
+            raise ValidationError({"question": [_("Опрос уже пройден")]})
+        if step.question_id != respondent.question:
+            raise ValidationError(
+                {"question": [_("Ответить можно только на текущий вопрос сессии")]}
+            )
+        answered = remember_step(graph, respondent, step)
+        position = next_question_id(
+            graph, step, answered.answers, dict(answered.values)
+        )
+        data = {
+            "question": graph.payloads.get(position),
+            "is_finished": position is None,
+        }
+        if graph.has_conditions:
+            respondent = answered
+    else:
+        if not graph.question_ids:
+            raise NotFound(_("Опрос не найден"))
+        position = respondent.question
+        if position is not None and position not in graph.payloads:
+            raise NotFound(_("Вопрос не найден"))
+        data = {
+            "question": graph.payloads.get(position),
+            "is_finished": position is None,
+        }
+    if respondent.version is not None:
+        data["version"] = respondent.version
+    data["token"] = dump_token(replace(respondent, question=position))
+    return data
@@ -0,0 +1,285 @@
+"""Приём ответов респондентов.
+
+Ответы проверяются по скомпилированному графу опроса без запросов к
+базе данных, а сохраняются фиксированным числом запросов независимо от
+количества вопросов: строки ответов вставляются пакетно.
+"""
+
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from surveys.constants import QUESTION_TYPE_TEXT
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Response, ResponseItem
+from surveys.navigation import selection_errors
+from surveys.statistics import StatsDelta, session_answers, session_values
+from surveys.versions import get_version
+
+RESPONSE_BATCH_SIZE = 500
+# Сколько сессий объединяется в одном условии удаления заменяемых ответов.
+REPLACE_CHUNK_SIZE = 100
+
+
+class SubmittedItem(NamedTuple):
+    """Ответ на один вопрос из присланной сессии"""
+
+    question_id: int
+    answer_ids: tuple[int, ...]
+    text: str
+
+
+class Submission(NamedTuple):
+    """Отправка ответов одной сессии"""
+
+    survey_id: int
+    session_key: str
+    items: tuple[SubmittedItem, ...]
+    is_complete: bool
+    # Номер опубликованной версии, по которой проверены ответы.
+    version: int | None = None
+
+
+def submission_graph(survey_id, version=None):
+    """Версия опроса (или None) и граф, по которому проверяются ответы.
+
+    Без номера версии используется текущий граф опроса; для неизвестной
+    версии граф пустой.
+    """
+    if version is None:
+        return None, get_flow_graph(survey_id)
+    published = get_version(survey_id, version)
+    if published is None:
+        return None, None
+    return published, published.graph
+
+
+def item_errors(graph, items):
+    """Проверяет ответы сессии по графу опроса.
+
+    Возвращает список словарей ошибок той же длины, что и ``items``.
+    """
+    errors = []
+    seen = set()
+    for item in items:
+        item_error = selection_errors(graph, item.question_id, item.answer_ids)
+        question = graph.questions.get(item.question_id)
+        if not item_error and question is not None:
+            if question.question_type == QUESTION_TYPE_TEXT:
+                if question.is_required and not item.text.strip():
+                    item_error = {"text": [_("Необходимо ввести ответ")]}
+            elif item.text:
+                item_error = {"text": [_("Вопрос не предполагает текстового ответа")]}
+        if not item_error and item.question_id in seen:
+            item_error = {"question": [_("Вопрос повторяется в одном запросе")]}
+        seen.add(item.question_id)
+        errors.append(item_error)
+    return errors
+
+
+def item_rows(response_id, items):
+    """Строки ответов сессии: по строке на выбранный вариант или текст"""
+    for item in items:
+        if item.answer_ids:
+            for answer_id in item.answer_ids:
+                yield (response_id, item.question_id, answer_id, "")
+        elif item.text:
+            yield (response_id, item.question_id, None, item.text)
+
+
+def insert_response_items(rows, now):
+    """Вставляет строки ``ResponseItem`` одним ``executemany``.
+
+    Построение экземпляров модели и подготовка каждого значения через
+    ORM обходятся дороже самой вставки, поэтому строки передаются
+    драйверу готовыми кортежами.
+    """
+    meta = ResponseItem._meta
+    quote = connection.ops.quote_name
+    columns = [
+        meta.get_field(name).column
+        for name in (
+            "response",
+            "question",
+            "answer",
+            "text",
+            "created_at",
+            "updated_at",
+        )
+    ]
+    sql = "INSERT INTO {table} ({columns}) VALUES ({values})".format(
+        table=quote(meta.db_table),
+        columns=", ".join(map(quote, columns)),
+        values=", ".join(["%s"] * len(columns)),
+    )
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+    params = [(*row, timestamp, timestamp) for row in rows]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+def save_response(survey_id, session_key, items, is_complete=False, version=None):
+    """Сохраняет проверенные ответы сессии.
+
+    Повторная отправка той же сессии заменяет ответы на присланные
+    вопросы и дополняет остальные, поэтому сессию можно отправлять
+    частями. Флаг завершения, однажды выставленный, не снимается.
+    Версия опроса закрепляется за сессией при первой отправке с ней.
+    """
+    submission = Submission(survey_id, session_key, tuple(items), is_complete, version)
+    try:
+        return save_responses([submission])[0]
+    except IntegrityError:
+        # Ту же новую сессию одновременно создал параллельный запрос.
+        return save_responses([submission])[0]
+
+
+def merge_submissions(submissions):
+    """Объединяет отправки одной сессии в порядке поступления.
+
+    Более поздний ответ на вопрос заменяет ранний, поэтому повторная
+    доставка той же отправки ничего не меняет.
+    """
+    merged = {}
+    for submission in submissions:
+        key = (submission.survey_id, submission.session_key)
+        items, is_complete, version = merged.get(key, ({}, False, None))
+        for item in submission.items:
+            items[item.question_id] = item
+        merged[key] = (
+            items,
+            is_complete or submission.is_complete,
+            submission.version if submission.version is not None else version,
+        )
+    return [
+        Submission(survey_id, session_key, tuple(items.values()), is_complete, version)
+        for (survey_id, session_key), (items, is_complete, version) in merged.items()
+    ]
+
+
+def save_responses(submissions):
+    """Сохраняет отправки многих сессий одной транзакцией.
+
+    Число запросов зависит от количества сессий лишь через размер
+    пакетов: поиск сессий, вставка новых, обновление существующих,
+    выборка и удаление заменяемых ответов, вставка строк ответов и
+    обновление счётчиков статистики.
+    """
+    submissions = merge_submissions(submissions)
+    if not submissions:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        responses = {
+            (response.survey_id, response.session_key): response
+            for response in Response.objects.filter(
+                survey_id__in={s.survey_id for s in submissions},
+                session_key__in={s.session_key for s in submissions},
+            )
+        }
+        created = []
+        updated = []
+        was_complete = {}
+        replaced = []
+        graphs = {}
+        for submission in submissions:
+            key = (submission.survey_id, submission.session_key)
+            published, graphs[key] = submission_graph(
+                submission.survey_id, submission.version
+            )
+            response = responses.get(key)
+            if response is None:
+                response = Response(
+                    survey_id=submission.survey_id,
+                    version_id=published and published.id,
+                    session_key=submission.session_key,
+                    is_complete=submission.is_complete,
+                    created_at=now,
+                    updated_at=now,
+                )
+                responses[key] = response
+                created.append(response)
+            else:
+                was_complete[response.pk] = response.is_complete
+                response.is_complete = response.is_complete or submission.is_complete
+                if response.version_id is None and published is not None:
+                    response.version_id = published.id
+                response.updated_at = now
+                updated.append(response)
+                replaced.append(
+                    Q(
+                        response_id=response.pk,
+                        question_id__in=[item.question_id for item in submission.items],
+                    )
+                )
+
+        Response.objects.bulk_create(created, batch_size=RESPONSE_BATCH_SIZE)
+        if updated:
+            Response.objects.bulk_update(
+                updated,
+                ["is_complete", "updated_at", "version"],
+                batch_size=RESPONSE_BATCH_SIZE,
+            )
+
+        # Для счётчиков нужны заменяемые ответы, а для завершаемых сессий —
+        # все вопросы, на которые они уже ответили.
+        previous = defaultdict(list)
+        for start in range(0, len(replaced), REPLACE_CHUNK_SIZE):
+            condition = Q()
+            for part in replaced[start : start + REPLACE_CHUNK_SIZE]:
+                condition |= part
+            stale = ResponseItem.objects.filter(condition)
+            stale_rows = stale.order_by("id").values_list(
+                "response_id", "question_id", "answer_id", "text"
+            )
+            for response_id, question_id, answer_id, text in stale_rows:
+                previous[response_id].append((question_id, answer_id, text))
+            stale.delete()
+        answered_before = defaultdict(set)
+        finishing = [r.pk for r in updated if r.is_complete and not was_complete[r.pk]]
+        if finishing:
+            for response_id, question_id in (
+                ResponseItem.objects.filter(response_id__in=finishing)
+                .values_list("response_id", "question_id")
+                .distinct()
+            ):
+                answered_before[response_id].add(question_id)
+            for response_id, rows in previous.items():
+                answered_before[response_id].update(q for q, _, _ in rows)
+
+        rows = []
+        delta = StatsDelta()
+        for submission in submissions:
+            key = (submission.survey_id, submission.session_key)
+            response = responses[key]
+            session_rows = list(item_rows(response.pk, submission.items))
+            rows.extend(session_rows)
+            graph = graphs[key] or get_flow_graph(submission.survey_id)
+            replaced_rows = previous.get(response.pk, ())
+            values = previous_values = None
+            if graph.has_conditions:
+                # Числовые условия проверяются по текстовым ответам записи.
+                values = session_values((q, t) for _, q, _, t in session_rows)
+                previous_values = session_values((q, t) for q, _, t in replaced_rows)
+            delta.add_session(
+                graph,
+                session_answers((q, a) for _, q, a, _ in session_rows),
+                previous=session_answers((q, a) for q, a, _ in replaced_rows),
+                created=response.pk not in was_complete,
+                was_complete=was_complete.get(response.pk, False),
+                is_complete=response.is_complete,
+                answered_before=answered_before.get(response.pk, ()),
+                values=values,
+                previous_values=previous_values,
+            )
+        insert_response_items(rows, now)
+        delta.apply()
+    return [
+        responses[(submission.survey_id, submission.session_key)]
+        for submission in submissions
+    ]
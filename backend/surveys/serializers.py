@@ -1,10 +1,38 @@
 from rest_framework import serializers
-from surveys.models import QuestionFlow
-from django.utils.translation import gettext_lazy as _
-from surveys.constants import FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.models import Answer, Question, QuestionFlow
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, QUESTION_FLOW_TYPES
+from surveys.validation import validate_flow_instances
+
+
+class QuestionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Question
+        fields = [
+            "id",
+            "survey",
+            "text",
+            "question_type",
+            "order",
+            "is_required",
+            "flow_resolution",
+            "fallback_to_next",
+        ]
+
+
+class AnswerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Answer
+        fields = ["id", "question", "text", "order"]
 
 
 class QuestionFlowSerializer(serializers.ModelSerializer):
+    # Поля, которые можно развернуть во вложенные объекты через ?expand=
+    expandable_fields = {
+        "source_question": QuestionSerializer,
+        "target_question": QuestionSerializer,
+        "source_answer": AnswerSerializer,
+    }
+
     class Meta:
         model = QuestionFlow
         fields = [
@@ -13,28 +41,93 @@ class QuestionFlowSerializer(serializers.ModelSerializer):
             "target_question",
             "relationship_type",
             "source_answer",
+            "priority",
+            "condition",
         ]
         read_only_fields = ["id"]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for field_name in self.context.get("expand", ()):
+            related = getattr(instance, field_name)
+            serializer_class = self.expandable_fields[field_name]
+            data[field_name] = serializer_class(related).data if related else None
+        return data
+
     def validate(self, data):
-        relationship_type = data.get("relationship_type")
-        source_answer = data.get("source_answer")
-        source_question = data.get("source_question")
-        target_question = data.get("target_question")
+        def value(field_name, default=None):
+            if field_name in data:
+                return data[field_name]
+            if self.instance is not None:
+                return getattr(self.instance, field_name)
+            return default
 
-        if source_question == target_question:
-            raise serializers.ValidationError(
-                _("Исходный и целевой вопросы не могут быть одинаковыми")
-            )
+        flow = QuestionFlow(
+            pk=self.instance.pk if self.instance is not None else None,
+            source_question=value("source_question"),
+            target_question=value("target_question"),
+            relationship_type=value("relationship_type", FLOW_TYPE_ANY_ANSWER),
+            source_answer=value("source_answer"),
+            condition=value("condition", ""),
+        )
+        errors = validate_flow_instances([flow])[0]
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return data
+
+
+class QuestionFlowBulkItemSerializer(serializers.Serializer):
+    """Элемент массовой операции: связи передаются идентификаторами.
+
+    Внешние ключи не проверяются по одному — это делает пакетная
+    проверка ``surveys.validation.validate_flows``.
+    """
+
+    id = serializers.IntegerField(required=False)
+    source_question = serializers.IntegerField()
+    target_question = serializers.IntegerField()
+    relationship_type = serializers.ChoiceField(
+        choices=QUESTION_FLOW_TYPES, default=FLOW_TYPE_ANY_ANSWER
+    )
+    source_answer = serializers.IntegerField(required=False, allow_null=True)
+    priority = serializers.IntegerField(min_value=0, default=0)
+    condition = serializers.CharField(
+        max_length=500, required=False, allow_blank=True, default=""
+    )
+
+
+class QuestionFlowBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
 
-        if relationship_type == FLOW_TYPE_SPECIFIC_ANSWER and not source_answer:
-            raise serializers.ValidationError(
-                _("Для типа связи 'конкретный ответ' требуется указать исходный ответ")
-            )
 
-        if source_answer and source_answer.question != source_question:
+class ResponseItemSerializer(serializers.Serializer):
+    """Ответ на вопрос: выбранные варианты или текст.
+
+    Принадлежность вопросов и ответов опросу проверяется по графу опроса
+    в ``surveys.responses.item_errors``.
+    """
+
+    question = serializers.IntegerField()
+    answers = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+    text = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class ResponseSubmissionSerializer(serializers.Serializer):
+    """Отправка ответов; респондент с токеном сессии ``session`` не передаёт"""
+
+    session = serializers.CharField(max_length=64, required=False)
+    is_complete = serializers.BooleanField(required=False, default=False)
+    version = serializers.IntegerField(
+        required=False, allow_null=True, min_value=1, default=None
+    )
+    items = ResponseItemSerializer(many=True, allow_empty=False, max_length=5000)
+
+    def validate(self, data):
+        if "session" not in data and self.context.get("respondent") is None:
             raise serializers.ValidationError(
-                _("Исходный ответ должен принадлежать исходному вопросу")
+                {"session": [self.fields["session"].error_messages["required"]]}
             )
-
         return data
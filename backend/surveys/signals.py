@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from surveys.flow_graph import invalidate_flow_graph, invalidate_question_graph
+from surveys.models import Answer, Question, QuestionFlow, Survey
+from surveys import reachability
+from surveys.authentication import forget_tokens
+from surveys.versions import forget_versions
+
+
+def _on_commit_too(function, *args):
+    """Вызывает функцию сразу и повторно после коммита транзакции"""
+    function(*args)
+    transaction.on_commit(lambda: function(*args))
+
+
+@receiver([post_save, post_delete], sender=Survey)
+def survey_changed(sender, instance, **kwargs):
+    _on_commit_too(invalidate_flow_graph, instance.pk)
+    if kwargs["signal"] is post_delete:
+        reachability.invalidate_reachability(instance.pk)
+        forget_versions(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    # Вопрос мог переехать из другого опроса: сбрасываем и прежний граф.
+    _on_commit_too(invalidate_question_graph, instance.pk)
+    _on_commit_too(invalidate_flow_graph, instance.survey_id)
+    if kwargs["signal"] is post_save:
+        reachability.question_added(
+            instance.pk, instance.survey_id, instance.fallback_to_next
+        )
+    else:
+        reachability.question_removed(instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    _on_commit_too(invalidate_question_graph, instance.question_id)
+
+
+@receiver([post_save, post_delete], sender=QuestionFlow)
+def question_flow_changed(sender, instance, **kwargs):
+    _on_commit_too(invalidate_question_graph, instance.source_question_id)
+
+    # Индекс достижимости обновляется сразу, чтобы следующая проверка
+    # в этой же транзакции видела новую связь.
+    if kwargs["signal"] is post_delete:
+        reachability.edge_removed(
+            instance.source_question_id, instance.target_question_id
+        )
+    elif kwargs["created"]:
+        reachability.edge_added(
+            instance.source_question_id, instance.target_question_id
+        )
+    else:
+        reachability.edge_changed(instance.source_question_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    _on_commit_too(lambda: forget_tokens(key=instance.key))
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    # Пользователя могли деактивировать: его токены проверяются заново.
+    _on_commit_too(lambda: forget_tokens(user_id=instance.pk))
@@ -0,0 +1,280 @@
+"""Отложенная запись ответов респондентов через локальную очередь.
+
+Когда задан ``SURVEYS_RESPONSE_SPOOL``, API не пишет ответы в основную
+базу данных, а добавляет отправку в файл очереди — отдельную базу SQLite
+в режиме WAL с ``synchronous=FULL``. Ответ клиенту уходит сразу после
+надёжной записи в очередь. Процесс ``manage.py flush_response_spool``
+забирает отправки большими пакетами и сохраняет их в основную базу.
+
+Доставка «хотя бы один раз»: отправки удаляются из очереди только после
+фиксации транзакции в основной базе. Повторное сохранение безопасно,
+так как ключ идемпотентности — сессия и вопрос: ответ на вопрос
+заменяется, а не дублируется.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import NamedTuple
+
+from django.conf import settings
+
+from surveys.models import Answer, Question, Survey
+from surveys.responses import (
+    SubmittedItem,
+    Submission,
+    merge_submissions,
+    save_responses,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id INTEGER NOT NULL,
+    session_key TEXT NOT NULL,
+    is_complete INTEGER NOT NULL,
+    items TEXT NOT NULL,
+    spooled_at REAL NOT NULL,
+    version INTEGER
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+class SpooledSubmission(NamedTuple):
+    """Отправка, ожидающая записи в основную базу"""
+
+    id: int
+    spooled_at: float
+    submission: Submission
+
+
+@dataclass(frozen=True, slots=True)
+class FlushStats:
+    """Итоги сброса одного пакета очереди"""
+
+    entries: int = 0
+    sessions: int = 0
+    items: int = 0
+    discarded_items: int = 0
+    duration: float = 0.0
+    # Сколько секунд ждала самая старая отправка пакета.
+    lag: float = 0.0
+
+
+class ResponseSpool:
+    """Очередь отправок в отдельном файле SQLite.
+
+    У каждого потока (и процесса) своё соединение, поэтому очередь можно
+    использовать из многопоточного сервера приложений.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(SCHEMA)
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(entries)")
+            }
+            if "version" not in columns:
+                # Очередь создана до появления версий опросов.
+                connection.execute("ALTER TABLE entries ADD COLUMN version INTEGER")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def append(self, submission):
+        """Надёжно добавляет отправку в очередь и возвращает её номер"""
+        items = [
+            [item.question_id, list(item.answer_ids), item.text]
+            for item in submission.items
+        ]
+        cursor = self._connection().execute(
+            "INSERT INTO entries (survey_id, session_key, is_complete, items, "
+            "spooled_at, version) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                submission.survey_id,
+                submission.session_key,
+                int(submission.is_complete),
+                json.dumps(items, ensure_ascii=False),
+                time.time(),
+                submission.version,
+            ),
+        )
+        return cursor.lastrowid
+
+    def pending(self, limit):
+        """Самые старые ``limit`` отправок в порядке поступления"""
+        rows = self._connection().execute(
+            "SELECT id, survey_id, session_key, is_complete, items, spooled_at, "
+            "version FROM entries ORDER BY id LIMIT ?",
+            (limit,),
+        )
+        return [
+            SpooledSubmission(
+                id=entry_id,
+                spooled_at=spooled_at,
+                submission=Submission(
+                    survey_id=survey_id,
+                    session_key=session_key,
+                    items=tuple(
+                        SubmittedItem(question_id, tuple(answer_ids), text)
+                        for question_id, answer_ids, text in json.loads(items)
+                    ),
+                    is_complete=bool(is_complete),
+                    version=version,
+                ),
+            )
+            for (
+                entry_id,
+                survey_id,
+                session_key,
+                is_complete,
+                items,
+                spooled_at,
+                version,
+            ) in rows
+        ]
+
+    def acknowledge(self, last_id):
+        """Удаляет из очереди отправки до ``last_id`` включительно"""
+        self._connection().execute("DELETE FROM entries WHERE id <= ?", (last_id,))
+
+    def record_flush(self, stats):
+        values = {f"last_{name}": value for name, value in asdict(stats).items()}
+        values["last_flush_at"] = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO metrics (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                values.items(),
+            )
+            for name, value in (
+                ("flushed_entries", stats.entries),
+                ("flushed_items", stats.items),
+            ):
+                connection.execute(
+                    "INSERT INTO metrics (name, value) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    (name, value),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def metrics(self):
+        """Размер очереди, отставание и показатели последнего сброса"""
+        connection = self._connection()
+        pending, oldest = connection.execute(
+            "SELECT COUNT(*), MIN(spooled_at) FROM entries"
+        ).fetchone()
+        result = dict(connection.execute("SELECT name, value FROM metrics"))
+        result["pending"] = pending
+        result["lag"] = time.time() - oldest if oldest is not None else 0.0
+        return result
+
+
+_spools = {}
+_lock = threading.Lock()
+
+
+def get_spool():
+    """Очередь из настроек или ``None``, если ответы пишутся сразу"""
+    path = getattr(settings, "SURVEYS_RESPONSE_SPOOL", None)
+    if not path:
+        return None
+    with _lock:
+        spool = _spools.get(str(path))
+        if spool is None:
+            spool = _spools[str(path)] = ResponseSpool(path)
+    return spool
+
+
+def _discard_stale(submissions):
+    """Отбрасывает ответы на вопросы и варианты, удалённые после постановки в очередь.
+
+    Иначе одна такая отправка нарушала бы внешние ключи и навсегда
+    блокировала бы очередь.
+    """
+    question_ids = set()
+    answer_ids = set()
+    for submission in submissions:
+        for item in submission.items:
+            question_ids.add(item.question_id)
+            answer_ids.update(item.answer_ids)
+    survey_ids = set(
+        Survey.objects.filter(pk__in={s.survey_id for s in submissions}).values_list(
+            "id", flat=True
+        )
+    )
+    question_surveys = dict(
+        Question.objects.filter(pk__in=question_ids).values_list("id", "survey_id")
+    )
+    existing_answers = set(
+        Answer.objects.filter(pk__in=answer_ids).values_list("id", flat=True)
+    )
+
+    result = []
+    discarded = 0
+    for submission in submissions:
+        if submission.survey_id not in survey_ids:
+            discarded += len(submission.items)
+            continue
+        items = []
+        for item in submission.items:
+            answers = tuple(a for a in item.answer_ids if a in existing_answers)
+            if question_surveys.get(item.question_id) != submission.survey_id or (
+                item.answer_ids and not answers
+            ):
+                discarded += 1
+                continue
+            items.append(item._replace(answer_ids=answers))
+        result.append(submission._replace(items=tuple(items)))
+    return result, discarded
+
+
+def flush_spool(spool, batch_size=500):
+    """Переносит в основную базу один пакет очереди"""
+    entries = spool.pending(batch_size)
+    if not entries:
+        return FlushStats()
+
+    started = time.perf_counter()
+    lag = time.time() - entries[0].spooled_at
+    submissions, discarded = _discard_stale(
+        merge_submissions(entry.submission for entry in entries)
+    )
+    responses = save_responses(submissions)
+    spool.acknowledge(entries[-1].id)
+
+    stats = FlushStats(
+        entries=len(entries),
+        sessions=len(responses),
+        items=sum(len(submission.items) for submission in submissions),
+        discarded_items=discarded,
+        duration=time.perf_counter() - started,
+        lag=lag,
+    )
+    spool.record_flush(stats)
+    if discarded:
+        logger.warning("Отброшено ответов на удалённые вопросы: %s", discarded)
+    return stats
@@ -1,35 +1,72 @@
 (function($) {
+    // Варианты ответа по вопросам. При открытии страницы загружаются
+    // разом для всего опроса, остальные вопросы догружаются при выборе.
+    var answerOptions = {};
+
+    function loadAnswerOptions(url, params) {
+        return $.ajax({
+            url: url,
+            type: "GET",
+            dataType: "json",
+            traditional: true,
+            data: params
+        }).then(function(responseData) {
+            $.extend(answerOptions, responseData.questions);
+        });
+    }
+
+    function renderAnswerOptions(sourceAnswerSelectElement, options) {
+        var selectedAnswerId = sourceAnswerSelectElement.value;
+        sourceAnswerSelectElement.innerHTML = "";
+        var defaultOption = document.createElement("option");
+        defaultOption.value = "";
+        defaultOption.textContent = "---------";
+        sourceAnswerSelectElement.appendChild(defaultOption);
+        options.forEach(function(answerOption) {
+            var newOption = document.createElement("option");
+            newOption.value = answerOption.id;
+            newOption.textContent = answerOption.text;
+            newOption.selected = String(answerOption.id) === selectedAnswerId;
+            sourceAnswerSelectElement.appendChild(newOption);
+        });
+    }
+
     $(document).ready(function() {
         var sourceQuestionSelectElement = document.getElementById("id_source_question");
-        if (sourceQuestionSelectElement) {
-            sourceQuestionSelectElement.addEventListener("change", function() {
-                var selectedSourceQuestionId = sourceQuestionSelectElement.value;
-                var fetchUrl = "/admin/surveys/questionflow/fetch-answers/";
-                $.ajax({
-                    url: fetchUrl,
-                    type: "GET",
-                    dataType: "json",
-                    data: {
-                        "source_question": selectedSourceQuestionId
-                    },
-                    success: function(responseData) {
-                        var sourceAnswerSelectElement = document.getElementById("id_source_answer");
-                        if (sourceAnswerSelectElement) {
-                            sourceAnswerSelectElement.innerHTML = "";
-                            var defaultOption = document.createElement("option");
-                            defaultOption.value = "";
-                            defaultOption.textContent = "---------";
-                            sourceAnswerSelectElement.appendChild(defaultOption);
-                            responseData.options.forEach(function(answerOption) {
-                                var newOption = document.createElement("option");
-                                newOption.value = answerOption.id;
-                                newOption.textContent = answerOption.text;
-                                sourceAnswerSelectElement.appendChild(newOption);
-                            });
-                        }
-                    }
+        var sourceAnswerSelectElement = document.getElementById("id_source_answer");
+        if (!sourceQuestionSelectElement || !sourceAnswerSelectElement) {
+            return;
+        }
+        var fetchUrl = sourceQuestionSelectElement.dataset.answerOptionsUrl;
+        var surveyId = sourceQuestionSelectElement.dataset.survey;
+        var prefetched = surveyId
+            ? loadAnswerOptions(fetchUrl, {"survey": surveyId})
+            : $.Deferred().resolve().promise();
+
+        // Автодополнение (select2) сообщает о выборе событием jQuery.
+        $(sourceQuestionSelectElement).on("change", function() {
+            var selectedSourceQuestionId = sourceQuestionSelectElement.value;
+            if (!selectedSourceQuestionId) {
+                renderAnswerOptions(sourceAnswerSelectElement, []);
+                return;
+            }
+            prefetched.always(function() {
+                if (answerOptions[selectedSourceQuestionId]) {
+                    renderAnswerOptions(
+                        sourceAnswerSelectElement,
+                        answerOptions[selectedSourceQuestionId]
+                    );
+                    return;
+                }
+                loadAnswerOptions(fetchUrl, {
+                    "questions": selectedSourceQuestionId
+                }).then(function() {
+                    renderAnswerOptions(
+                        sourceAnswerSelectElement,
+                        answerOptions[selectedSourceQuestionId] || []
+                    );
                 });
             });
-        }
+        });
     });
-})(django.jQuery); 
\ No newline at end of file
+})(django.jQuery);
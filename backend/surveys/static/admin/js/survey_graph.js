@@ -0,0 +1,160 @@
+(function() {
+    // Граф опроса на canvas по раскладке, вычисленной на сервере:
+    // слой — строка, позиция — место в строке. Колёсико мыши
+    // масштабирует, перетаскивание сдвигает. Подписи вопросов и ответов
+    // выводятся, только когда масштаб позволяет их прочитать.
+    var X_STEP = 220;
+    var Y_STEP = 90;
+    var NODE_WIDTH = 180;
+    var NODE_HEIGHT = 36;
+
+    var canvas = document.getElementById("survey-graph");
+    var statusElement = document.getElementById("survey-graph-status");
+    if (!canvas) {
+        return;
+    }
+    var context = canvas.getContext("2d");
+    var layout = null;
+    var xs = [];
+    var ys = [];
+    var view = {x: 0, y: 0, scale: 1};
+    var scheduled = false;
+
+    function truncate(text, width) {
+        if (context.measureText(text).width <= width) {
+            return text;
+        }
+        while (text.length > 1 && context.measureText(text + "…").width > width) {
+            text = text.slice(0, -1);
+        }
+        return text + "…";
+    }
+
+    function draw() {
+        scheduled = false;
+        var ratio = window.devicePixelRatio || 1;
+        canvas.width = canvas.clientWidth * ratio;
+        canvas.height = canvas.clientHeight * ratio;
+        context.setTransform(ratio, 0, 0, ratio, 0, 0);
+        context.clearRect(0, 0, canvas.clientWidth, canvas.clientHeight);
+        if (!layout) {
+            return;
+        }
+        context.translate(view.x, view.y);
+        context.scale(view.scale, view.scale);
+
+        // Видимая область в координатах графа: невидимое не рисуется.
+        var left = -view.x / view.scale - NODE_WIDTH;
+        var top = -view.y / view.scale - NODE_HEIGHT;
+        var right = left + canvas.clientWidth / view.scale + 2 * NODE_WIDTH;
+        var bottom = top + canvas.clientHeight / view.scale + 2 * NODE_HEIGHT;
+        function visible(index) {
+            return xs[index] >= left && xs[index] <= right && ys[index] >= top && ys[index] <= bottom;
+        }
+
+        var edges = layout.edges;
+        var showLabels = view.scale >= 0.6;
+        context.lineWidth = 1 / view.scale;
+        context.font = "12px sans-serif";
+        context.textAlign = "center";
+        context.textBaseline = "middle";
+        for (var e = 0; e < edges.source.length; e++) {
+            var source = edges.source[e];
+            var target = edges.target[e];
+            if (!visible(source) && !visible(target)) {
+                continue;
+            }
+            // Переходы назад (циклы) выделяются цветом.
+            context.strokeStyle = ys[target] <= ys[source] ? "#c0392b" : "#7f8c8d";
+            context.beginPath();
+            context.moveTo(xs[source], ys[source] + NODE_HEIGHT / 2);
+            context.lineTo(xs[target], ys[target] - NODE_HEIGHT / 2);
+            context.stroke();
+            if (showLabels && edges.label[e] !== null) {
+                context.fillStyle = "#2c3e50";
+                context.fillText(
+                    truncate(edges.label[e], NODE_WIDTH / 2),
+                    (xs[source] + xs[target]) / 2,
+                    (ys[source] + ys[target]) / 2
+                );
+            }
+        }
+
+        var nodes = layout.nodes;
+        for (var n = 0; n < nodes.id.length; n++) {
+            if (!visible(n)) {
+                continue;
+            }
+            context.fillStyle = "#ecf0f1";
+            context.strokeStyle = "#34495e";
+            context.fillRect(xs[n] - NODE_WIDTH / 2, ys[n] - NODE_HEIGHT / 2, NODE_WIDTH, NODE_HEIGHT);
+            context.strokeRect(xs[n] - NODE_WIDTH / 2, ys[n] - NODE_HEIGHT / 2, NODE_WIDTH, NODE_HEIGHT);
+            if (showLabels) {
+                context.fillStyle = "#2c3e50";
+                context.fillText(truncate(nodes.text[n], NODE_WIDTH - 12), xs[n], ys[n]);
+            }
+        }
+    }
+
+    function redraw() {
+        if (!scheduled) {
+            scheduled = true;
+            window.requestAnimationFrame(draw);
+        }
+    }
+
+    canvas.addEventListener("wheel", function(event) {
+        event.preventDefault();
+        var factor = event.deltaY < 0 ? 1.2 : 1 / 1.2;
+        var rect = canvas.getBoundingClientRect();
+        var pointerX = event.clientX - rect.left;
+        var pointerY = event.clientY - rect.top;
+        view.x = pointerX - (pointerX - view.x) * factor;
+        view.y = pointerY - (pointerY - view.y) * factor;
+        view.scale *= factor;
+        redraw();
+    }, {passive: false});
+
+    var drag = null;
+    canvas.addEventListener("mousedown", function(event) {
+        drag = {x: event.clientX - view.x, y: event.clientY - view.y};
+    });
+    window.addEventListener("mousemove", function(event) {
+        if (drag) {
+            view.x = event.clientX - drag.x;
+            view.y = event.clientY - drag.y;
+            redraw();
+        }
+    });
+    window.addEventListener("mouseup", function() {
+        drag = null;
+    });
+    window.addEventListener("resize", redraw);
+
+    fetch(canvas.dataset.layoutUrl, {credentials: "same-origin"})
+        .then(function(response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        })
+        .then(function(data) {
+            layout = data;
+            var widest = data.layers.reduce(function(a, b) { return Math.max(a, b); }, 1);
+            for (var n = 0; n < data.nodes.id.length; n++) {
+                var offset = (data.layers[data.nodes.layer[n]] - 1) / 2;
+                xs.push((data.nodes.position[n] - offset) * X_STEP);
+                ys.push(data.nodes.layer[n] * Y_STEP);
+            }
+            view.scale = Math.min(1, canvas.clientWidth / (widest * X_STEP));
+            view.x = canvas.clientWidth / 2;
+            view.y = NODE_HEIGHT * view.scale;
+            statusElement.textContent =
+                "Вопросов: " + data.nodes.id.length + ", связей: " + data.edges.source.length +
+                ", слоёв: " + data.layers.length;
+            redraw();
+        })
+        .catch(function() {
+            statusElement.textContent = "Не удалось загрузить граф";
+        });
+})();
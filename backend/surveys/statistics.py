@@ -0,0 +1,308 @@
+"""Предвычисленная статистика ответов.
+
+Счётчики по опросу, вопросам, вариантам ответов и связям хранятся в
+отдельных таблицах и увеличиваются пакетно при сохранении ответов, в той
+же транзакции. Чтение статистики — несколько выборок по ключу без
+агрегации сырых ответов. Команда ``rebuild_statistics`` пересчитывает
+счётчики опроса с нуля одним потоковым проходом по ответам.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from surveys.models import (
+    AnswerStat,
+    FlowStat,
+    QuestionStat,
+    Response,
+    ResponseItem,
+    SurveyStat,
+    SurveyVersion,
+)
+from surveys.navigation import parse_number
+from surveys.versions import get_version
+
+REBUILD_CHUNK_SIZE = 2000
+
+
+class StatsDelta:
+    """Накопленные изменения счётчиков для одной пакетной записи"""
+
+    def __init__(self):
+        self.surveys = defaultdict(lambda: [0, 0])
+        self.questions = defaultdict(lambda: [0, 0])
+        self.answers = Counter()
+        self.flows = Counter()
+
+    def add_session(
+        self,
+        graph,
+        answers,
+        *,
+        previous=None,
+        created=False,
+        was_complete=False,
+        is_complete=False,
+        answered_before=(),
+        values=None,
+        previous_values=None,
+    ):
+        """Учитывает сохранение ответов одной сессии.
+
+        ``answers`` и ``previous`` — новые и заменяемые ответы сессии:
+        вопрос -> выбранные варианты (пустой кортеж для текста).
+        ``answered_before`` — все вопросы, на которые сессия уже ответила;
+        нужны, только когда сессия завершается этой записью.
+        ``values`` и ``previous_values`` — числовые текстовые ответы тех же
+        записей (см. ``session_values``) для условий переходов.
+        """
+        survey = self.surveys[graph.survey_id]
+        if created:
+            survey[0] += 1
+        if is_complete and not was_complete:
+            survey[1] += 1
+            for question_id in set(answered_before) - answers.keys():
+                self.questions[question_id][1] += 1
+
+        # Условия переходов проверяются по всем ответам той же записи.
+        previous = previous or {}
+        history = _chosen(previous) if graph.has_conditions else ()
+        for question_id, answer_ids in previous.items():
+            self._count(
+                graph,
+                question_id,
+                answer_ids,
+                was_complete,
+                -1,
+                history,
+                previous_values,
+            )
+        history = _chosen(answers) if graph.has_conditions else ()
+        for question_id, answer_ids in answers.items():
+            self._count(graph, question_id, answer_ids, is_complete, 1, history, values)
+
+    def _count(self, graph, question_id, answer_ids, completed, sign, history, values):
+        question = self.questions[question_id]
+        question[0] += sign
+        if completed:
+            question[1] += sign
+        for answer_id in answer_ids:
+            self.answers[answer_id] += sign
+        edge = graph.resolve(question_id, answer_ids, history, values)
+        if edge is not None:
+            self.flows[edge.id] += sign
+
+    def apply(self):
+        """Прибавляет накопленные изменения к счётчикам в базе"""
+        _increment(SurveyStat, ("started", "completed"), self.surveys)
+        _increment(QuestionStat, ("reached", "completed"), self.questions)
+        _increment(AnswerStat, ("count",), _single(self.answers))
+        _increment(FlowStat, ("taken",), _single(self.flows))
+
+
+def _chosen(answers):
+    return [answer_id for answer_ids in answers.values() for answer_id in answer_ids]
+
+
+def _single(counter):
+    return {key: (value,) for key, value in counter.items()}
+
+
+def _increment(model, fields, deltas):
+    """Увеличивает счётчики одним ``executemany`` с ``ON CONFLICT``.
+
+    Отсутствующая строка создаётся со значением изменения, поэтому
+    заранее заводить строки статистики не нужно.
+    """
+    rows = [(key, *values) for key, values in deltas.items() if any(values)]
+    if not rows:
+        return
+    meta = model._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    pk = quote(meta.pk.column)
+    columns = [quote(meta.get_field(name).column) for name in fields]
+    sql = (
+        f"INSERT INTO {table} ({pk}, {', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * (len(columns) + 1))}) "
+        f"ON CONFLICT ({pk}) DO UPDATE SET "
+        + ", ".join(
+            f"{column} = {table}.{column} + EXCLUDED.{column}" for column in columns
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def session_answers(rows):
+    """Ответы сессии по вопросам из строк (вопрос, вариант) в порядке сохранения"""
+    answers = {}
+    for question_id, answer_id in rows:
+        selected = answers.setdefault(question_id, [])
+        if answer_id is not None:
+            selected.append(answer_id)
+    return {question_id: tuple(selected) for question_id, selected in answers.items()}
+
+
+def session_values(rows):
+    """Числовые ответы сессии из строк (вопрос, текст), как в навигации.
+
+    Текст, который не разбирается в конечное число, в условиях не участвует.
+    """
+    values = {}
+    for question_id, text in rows:
+        if text:
+            try:
+                values[question_id] = parse_number(text)
+            except ValueError:
+                continue
+    return values
+
+
+def rebuild_statistics(graph):
+    """Пересчитывает статистику опроса с нуля.
+
+    Ответы читаются потоком в порядке сессий, поэтому в памяти
+    держатся только счётчики и ответы одной сессии. Как и при приёме,
+    переходы сессии, закреплённой за версией, определяются по графу
+    этой версии, остальных — по текущему графу ``graph``. Ответы,
+    сохранённые во время пересчёта, могут быть учтены неточно.
+    """
+    survey_id = graph.survey_id
+    delta = StatsDelta()
+    totals = Response.objects.filter(survey_id=survey_id).aggregate(
+        started=Count("id"), completed=Count("id", filter=Q(is_complete=True))
+    )
+    delta.surveys[survey_id] = [totals["started"], totals["completed"]]
+
+    graphs = {None: graph}
+    versions = SurveyVersion.objects.filter(survey_id=survey_id).values_list(
+        "id", "number"
+    )
+    for version_id, number in versions:
+        version = get_version(survey_id, number)
+        if version is not None:
+            graphs[version_id] = version.graph
+
+    rows = (
+        ResponseItem.objects.filter(response__survey_id=survey_id)
+        .order_by("response_id", "id")
+        .values_list(
+            "response_id",
+            "response__is_complete",
+            "response__version_id",
+            "question_id",
+            "answer_id",
+            "text",
+        )
+        .iterator(chunk_size=REBUILD_CHUNK_SIZE)
+    )
+
+    def add_session(rows, is_complete, version_id):
+        session_graph = graphs.get(version_id, graph)
+        values = None
+        if session_graph.has_conditions:
+            values = session_values((q, text) for q, _, text in rows)
+        # Сессии уже посчитаны выше, поэтому завершение не учитываем повторно.
+        delta.add_session(
+            session_graph,
+            session_answers((q, a) for q, a, _ in rows),
+            was_complete=is_complete,
+            is_complete=is_complete,
+            values=values,
+        )
+
+    current = None
+    session = []
+    for response_id, is_complete, version_id, question_id, answer_id, text in rows:
+        if current is not None and current[0] != response_id:
+            add_session(session, *current[1:])
+            session = []
+        current = (response_id, is_complete, version_id)
+        session.append((question_id, answer_id, text))
+    if current is not None:
+        add_session(session, *current[1:])
+
+    # Счётчики связей сбрасываются и для связей, оставшихся только в версиях.
+    flow_ids = {edge.id for each in graphs.values() for edge in each.edges}
+    with transaction.atomic():
+        SurveyStat.objects.filter(survey_id=survey_id).delete()
+        QuestionStat.objects.filter(question__survey_id=survey_id).delete()
+        AnswerStat.objects.filter(answer__question__survey_id=survey_id).delete()
+        FlowStat.objects.filter(flow_id__in=flow_ids).delete()
+        delta.apply()
+    return delta
+
+
+def _share(count, total):
+    return round(count / total, 4) if total else None
+
+
+def survey_statistics(graph):
+    """Статистика опроса по структуре из графа: четыре выборки по ключу"""
+    started, completed = (
+        SurveyStat.objects.filter(survey_id=graph.survey_id)
+        .values_list("started", "completed")
+        .first()
+    ) or (0, 0)
+    questions = {
+        question_id: (reached, question_completed)
+        for question_id, reached, question_completed in QuestionStat.objects.filter(
+            question__survey_id=graph.survey_id
+        ).values_list("question_id", "reached", "completed")
+    }
+    answers = dict(
+        AnswerStat.objects.filter(
+            answer__question__survey_id=graph.survey_id
+        ).values_list("answer_id", "count")
+    )
+    flows = dict(
+        FlowStat.objects.filter(
+            flow__source_question__survey_id=graph.survey_id
+        ).values_list("flow_id", "taken")
+    )
+
+    edges = defaultdict(list)
+    for edge in graph.edges:
+        edges[edge.source_question_id].append(edge)
+
+    result = []
+    for question_id in graph.question_ids:
+        reached, question_completed = questions.get(question_id, (0, 0))
+        result.append(
+            {
+                "id": question_id,
+                "reached": reached,
+                "completed": question_completed,
+                "drop_off": reached - question_completed,
+                "drop_off_rate": _share(reached - question_completed, reached),
+                "answers": [
+                    {
+                        "id": answer.id,
+                        "count": answers.get(answer.id, 0),
+                        "share": _share(answers.get(answer.id, 0), reached),
+                    }
+                    for answer in graph.questions[question_id].answers
+                ],
+                "flows": [
+                    {
+                        "id": edge.id,
+                        "target_question": edge.target_question_id,
+                        "relationship_type": edge.relationship_type,
+                        "source_answer": edge.source_answer_id,
+                        "taken": flows.get(edge.id, 0),
+                        "share": _share(flows.get(edge.id, 0), reached),
+                    }
+                    for edge in edges[question_id]
+                ],
+            }
+        )
+    return {
+        "survey": graph.survey_id,
+        "started": started,
+        "completed": completed,
+        "completion_rate": _share(completed, started),
+        "questions": result,
+    }
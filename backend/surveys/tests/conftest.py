@@ -5,6 +5,29 @@ from django.contrib.auth.models import User
 
 from surveys.models import QuestionFlow, Survey, Question, Answer
 from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.authentication import forget_tokens
+from surveys.cache import get_cache, reset_cache_stats
+from surveys.flow_graph import invalidate_flow_graph
+from surveys.layout import clear_layouts
+from surveys.reachability import invalidate_reachability
+from surveys.versions import forget_versions
+
+
+@pytest.fixture(autouse=True)
+def clear_flow_graphs():
+    # Идентификаторы в тестовой базе повторяются, поэтому общий кеш
+    # очищается целиком, а не только сменой меток.
+    get_cache().clear()
+    reset_cache_stats()
+    invalidate_flow_graph()
+    invalidate_reachability()
+    forget_versions()
+    forget_tokens()
+    clear_layouts()
+    yield
+    invalidate_flow_graph()
+    invalidate_reachability()
+    forget_versions()
 
 
 @pytest.fixture
@@ -67,3 +90,31 @@ def question_flow(source_question, target_question):
         target_question=target_question,
         relationship_type=FLOW_TYPE_ANY_ANSWER,
     )
+
+
+@pytest.fixture
+def branching_survey(survey):
+    first = baker.make(Question, survey=survey, order=1)
+    yes = baker.make(Answer, question=first, order=1)
+    no = baker.make(Answer, question=first, order=2)
+    maybe = baker.make(Answer, question=first, order=3)
+    second = baker.make(Question, survey=survey, order=2)
+    third = baker.make(Question, survey=survey, order=3)
+    baker.make(
+        QuestionFlow,
+        source_question=first,
+        target_question=second,
+        relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+        source_answer=yes,
+    )
+    baker.make(
+        QuestionFlow,
+        source_question=first,
+        target_question=third,
+        relationship_type=FLOW_TYPE_ANY_ANSWER,
+    )
+    return {
+        "survey": survey,
+        "questions": (first, second, third),
+        "answers": (yes, no, maybe),
+    }
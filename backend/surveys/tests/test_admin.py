@@ -0,0 +1,317 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from django.db.models import F
+from model_bakery import baker
+
+from surveys.admin import SURVEY_FILTER_SIZE
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Answer, Question, QuestionFlow, Response, Survey
+
+
+def grow(questions, answers_per_question=2):
+    """Добавляет опрос с цепочкой вопросов, связями и ответами респондентов"""
+    survey = Survey.objects.create(title=f"Опрос на {questions} вопросов")
+    question_objs = Question.objects.bulk_create(
+        Question(survey=survey, text=f"Вопрос {i}", order=i) for i in range(questions)
+    )
+    answer_objs = Answer.objects.bulk_create(
+        Answer(question=question, text=f"Ответ {j}", order=j)
+        for question in question_objs
+        for j in range(answers_per_question)
+    )
+    QuestionFlow.objects.bulk_create(
+        QuestionFlow(
+            source_question=question,
+            target_question=question_objs[index + 1],
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=answer_objs[index * answers_per_question],
+        )
+        for index, question in enumerate(question_objs[:-1])
+    )
+    Response.objects.bulk_create(
+        Response(survey=survey, session_key=f"{survey.pk}-{i}") for i in range(10)
+    )
+    return survey, question_objs
+
+
+def count_queries(client, url, params=None):
+    # Первый запрос заполняет кеш типов содержимого Django.
+    client.get(url, params)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def add_flows(question, count):
+    targets = baker.make(Question, survey=question.survey, _quantity=count)
+    answers = baker.make(Answer, question=question, _quantity=count)
+    QuestionFlow.objects.bulk_create(
+        QuestionFlow(
+            source_question=question,
+            target_question=target,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=answer,
+        )
+        for target, answer in zip(targets, answers)
+    )
+
+
+@pytest.mark.django_db
+class TestAdminQueryCounts:
+    @pytest.mark.parametrize(
+        "name",
+        [
+            "admin:surveys_survey_changelist",
+            "admin:surveys_question_changelist",
+            "admin:surveys_answer_changelist",
+            "admin:surveys_questionflow_changelist",
+            "admin:surveys_response_changelist",
+        ],
+    )
+    def test_changelist(self, admin_client, name):
+        grow(10)
+        expected = count_queries(admin_client, reverse(name))
+        for _ in range(SURVEY_FILTER_SIZE):
+            grow(10)
+        grow(1000)
+        assert count_queries(admin_client, reverse(name)) == expected
+
+    def test_filtered_changelist(self, admin_client):
+        survey, _questions = grow(10)
+        url = reverse("admin:surveys_questionflow_changelist")
+        params = {"source_question__survey__id__exact": survey.pk}
+        expected = count_queries(admin_client, url, params)
+        grow(1000)
+        assert count_queries(admin_client, url, params) == expected
+
+    def test_question_change(self, admin_client):
+        _survey, questions = grow(10)
+        url = reverse("admin:surveys_question_change", args=[questions[0].pk])
+        expected = count_queries(admin_client, url)
+        add_flows(questions[0], 50)
+        grow(1000)
+        assert count_queries(admin_client, url) == expected
+
+    def test_question_flow_change(self, admin_client):
+        _survey, questions = grow(10)
+        flow = questions[0].source_relationships.get()
+        url = reverse("admin:surveys_questionflow_change", args=[flow.pk])
+        expected = count_queries(admin_client, url)
+        grow(1000)
+        assert count_queries(admin_client, url) == expected
+
+    @pytest.mark.parametrize(
+        "name", ["admin:surveys_question_add", "admin:surveys_answer_add"]
+    )
+    def test_add(self, admin_client, name):
+        grow(10)
+        expected = count_queries(admin_client, reverse(name))
+        grow(1000)
+        assert count_queries(admin_client, reverse(name)) == expected
+
+
+@pytest.mark.django_db
+class TestQuestionFlowInline:
+    def test_targets_are_not_listed(self, admin_client):
+        _survey, questions = grow(3)
+        other = baker.make(Question, text="Вопрос другого опроса")
+        response = admin_client.get(
+            reverse("admin:surveys_question_change", args=[questions[0].pk])
+        )
+        content = response.content.decode()
+        assert "Вопрос другого опроса" not in content
+        # Выбранная цель подписана без выпадающего списка всех вопросов.
+        assert questions[1].text in content
+        assert f'value="{other.pk}"' not in content
+
+    def test_save(self, admin_client):
+        _survey, questions = grow(3)
+        first, _second, third = questions
+        flow = first.source_relationships.get()
+        url = reverse("admin:surveys_question_change", args=[first.pk])
+        data = {
+            "survey": first.survey_id,
+            "text": first.text,
+            "question_type": first.question_type,
+            "order": first.order,
+            "is_required": "on",
+            "flow_resolution": first.flow_resolution,
+            "answers-TOTAL_FORMS": 0,
+            "answers-INITIAL_FORMS": 0,
+            "source_relationships-TOTAL_FORMS": 2,
+            "source_relationships-INITIAL_FORMS": 1,
+            "source_relationships-0-id": flow.pk,
+            "source_relationships-0-source_question": first.pk,
+            "source_relationships-0-relationship_type": flow.relationship_type,
+            "source_relationships-0-source_answer": flow.source_answer_id,
+            "source_relationships-0-target_question": flow.target_question_id,
+            "source_relationships-0-priority": 0,
+            "source_relationships-1-source_question": first.pk,
+            "source_relationships-1-relationship_type": FLOW_TYPE_ANY_ANSWER,
+            "source_relationships-1-target_question": third.pk,
+            "source_relationships-1-priority": 0,
+        }
+        response = admin_client.post(url, data)
+        assert response.status_code == 302
+        assert first.source_relationships.count() == 2
+
+        other = baker.make(Question)
+        data["source_relationships-INITIAL_FORMS"] = 2
+        data["source_relationships-1-id"] = first.source_relationships.get(
+            target_question=third
+        ).pk
+        data["source_relationships-1-target_question"] = other.pk
+        response = admin_client.post(url, data)
+        assert response.status_code == 200
+        assert first.source_relationships.filter(target_question=other).count() == 0
+
+    def test_autocomplete(self, admin_client):
+        _survey, questions = grow(3)
+        response = admin_client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "surveys",
+                "model_name": "questionflow",
+                "field_name": "target_question",
+                "term": "Вопрос 2",
+            },
+        )
+        assert [item["id"] for item in response.json()["results"]] == [
+            str(questions[2].pk)
+        ]
+
+
+    @pytest.mark.parametrize("page", ["question", "questionflow"])
+    def test_autocomplete_is_scoped_to_survey(self, admin_client, page):
+        _survey, questions = grow(3)
+        first = questions[0]
+        baker.make(Question, text="Вопрос из другого опроса")
+        if page == "question":
+            referer = reverse("admin:surveys_question_change", args=[first.pk])
+        else:
+            flow = first.source_relationships.get()
+            referer = reverse("admin:surveys_questionflow_change", args=[flow.pk])
+        response = admin_client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "surveys",
+                "model_name": "questionflow",
+                "field_name": "target_question",
+                "term": "Вопрос",
+            },
+            HTTP_REFERER=f"http://testserver{referer}",
+        )
+        assert {item["id"] for item in response.json()["results"]} == {
+            str(question.pk) for question in questions[1:]
+        }
+
+
+@pytest.mark.django_db
+class TestSurveyListFilter:
+    def test_recent_and_selected(self, admin_client):
+        oldest = baker.make(Survey, title="Самый старый опрос")
+        baker.make(Survey, _quantity=SURVEY_FILTER_SIZE)
+        url = reverse("admin:surveys_question_changelist")
+
+        content = admin_client.get(url).content.decode()
+        assert "Самый старый опрос" not in content
+
+        content = admin_client.get(url, {"survey__id__exact": oldest.pk}).content
+        assert "Самый старый опрос" in content.decode()
+
+
+@pytest.mark.django_db
+class TestAnswerOptions:
+    url = reverse_lazy("admin:answer_options")
+
+    def fetch(self, client, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url, params)
+        answer_queries = [
+            query for query in queries if Answer._meta.db_table in query["sql"]
+        ]
+        return response, len(answer_queries)
+
+    def test_grouped_and_ordered(self, admin_client):
+        _survey, (first, second, third) = grow(3)
+        first.answers.update(order=F("order") + 1)
+        late = baker.make(Answer, question=first, text="Первый", order=0)
+        response, queries = self.fetch(admin_client, questions=f"{first.pk},{third.pk}")
+        assert queries == 1
+        options = response.json()["questions"]
+        assert list(options) == [str(first.pk), str(third.pk)]
+        assert options[str(first.pk)] == [
+            {"id": late.pk, "text": "Первый"},
+            *(
+                {"id": answer.pk, "text": answer.text}
+                for answer in first.answers.order_by("order")
+                if answer != late
+            ),
+        ]
+
+    def test_cached(self, admin_client):
+        survey, questions = grow(5)
+        get_flow_graph(survey.pk)
+        self.fetch(admin_client, questions=questions[0].pk)
+        # Закешированный вопрос не читается, остальные — одним запросом.
+        assert self.fetch(admin_client, survey=survey.pk)[1] == 1
+        assert self.fetch(admin_client, survey=survey.pk)[1] == 0
+
+    def test_survey(self, admin_client):
+        survey, questions = grow(5)
+        response, _queries = self.fetch(admin_client, survey=survey.pk)
+        assert list(response.json()["questions"]) == [str(q.pk) for q in questions]
+
+    def test_etag(self, admin_client):
+        _survey, (first, _second, _third) = grow(3)
+        response = admin_client.get(self.url, {"questions": first.pk})
+        etag = response["ETag"]
+        assert response["Cache-Control"] == "private, no-cache"
+
+        response = admin_client.get(
+            self.url, {"questions": first.pk}, headers={"if-none-match": etag}
+        )
+        assert response.status_code == 304
+
+        answer = first.answers.first()
+        answer.text = "Новый текст"
+        answer.save()
+        response = admin_client.get(
+            self.url, {"questions": first.pk}, headers={"if-none-match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["questions"][str(first.pk)][0]["text"] == "Новый текст"
+
+        etag = response["ETag"]
+        first.answers.last().delete()
+        response = admin_client.get(
+            self.url, {"questions": first.pk}, headers={"if-none-match": etag}
+        )
+        assert response.status_code == 200
+        assert len(response.json()["questions"][str(first.pk)]) == 1
+
+    def test_unknown_question(self, admin_client):
+        response, _queries = self.fetch(admin_client, questions=999999)
+        assert response.json() == {"questions": {"999999": []}}
+
+    def test_bad_ids(self, admin_client):
+        response, _queries = self.fetch(admin_client, questions="x")
+        assert response.status_code == 400
+
+    def test_requires_staff(self, client, source_question):
+        response = client.get(self.url, {"questions": source_question.pk})
+        assert response.status_code == 302
+
+    def test_change_form_prefetches_survey(self, admin_client):
+        survey, questions = grow(3)
+        flow = questions[0].source_relationships.get()
+        response = admin_client.get(
+            reverse("admin:surveys_questionflow_change", args=[flow.pk])
+        )
+        content = response.content.decode()
+        assert f'data-survey="{survey.pk}"' in content
+        assert f'data-answer-options-url="{self.url}"' in content
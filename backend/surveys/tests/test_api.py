@@ -1,9 +1,11 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from model_bakery import baker
 
-from surveys.models import QuestionFlow, Question, Answer
+from surveys.models import QuestionFlow, Question, Answer, Survey
 from surveys.constants import (
     FLOW_TYPE_ANY_ANSWER,
     FLOW_TYPE_SPECIFIC_ANSWER,
@@ -23,7 +25,7 @@ class TestQuestionFlowAPI:
         url = reverse("questionflow-list")
         response = authenticated_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
+        assert len(response.data["results"]) == 1
 
     def test_retrieve_question_flow(self, authenticated_client, question_flow):
         url = reverse("questionflow-detail", kwargs={"pk": question_flow.id})
@@ -119,3 +121,97 @@ class TestQuestionFlowAPI:
         response = authenticated_client.delete(url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert QuestionFlow.objects.count() == 0
+
+
+def make_flows(survey, count):
+    questions = baker.make(Question, survey=survey, _quantity=count + 1)
+    answers = [baker.make(Answer, question=question) for question in questions]
+    return [
+        baker.make(
+            QuestionFlow,
+            source_question=questions[index],
+            target_question=questions[index + 1],
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=answers[index],
+        )
+        for index in range(count)
+    ]
+
+
+@pytest.mark.django_db
+class TestQuestionFlowListAPI:
+    def list_query_count(self, client, params):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse("questionflow-list"), params)
+        assert response.status_code == status.HTTP_200_OK
+        return len(context.captured_queries)
+
+    def test_cursor_pagination(self, authenticated_client, survey):
+        flows = make_flows(survey, 5)
+        url = reverse("questionflow-list")
+        response = authenticated_client.get(url, {"page_size": 2})
+        assert [f["id"] for f in response.data["results"]] == [
+            flows[0].id,
+            flows[1].id,
+        ]
+
+        response = authenticated_client.get(response.data["next"])
+        assert [f["id"] for f in response.data["results"]] == [
+            flows[2].id,
+            flows[3].id,
+        ]
+
+    def test_filters(self, authenticated_client, survey):
+        flows = make_flows(survey, 3)
+        other_flow = make_flows(baker.make(Survey), 1)[0]
+        url = reverse("questionflow-list")
+
+        response = authenticated_client.get(url, {"survey": survey.id})
+        assert {f["id"] for f in response.data["results"]} == {f.id for f in flows}
+
+        response = authenticated_client.get(
+            url, {"source_question": flows[1].source_question_id}
+        )
+        assert [f["id"] for f in response.data["results"]] == [flows[1].id]
+
+        response = authenticated_client.get(
+            url, {"target_question": other_flow.target_question_id}
+        )
+        assert [f["id"] for f in response.data["results"]] == [other_flow.id]
+
+        response = authenticated_client.get(
+            url, {"relationship_type": FLOW_TYPE_ANY_ANSWER}
+        )
+        assert response.data["results"] == []
+
+    def test_invalid_filters(self, authenticated_client):
+        url = reverse("questionflow-list")
+        for params in (
+            {"survey": "abc"},
+            {"relationship_type": "unknown"},
+            {"expand": "survey"},
+        ):
+            response = authenticated_client.get(url, params)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_expand(self, authenticated_client, survey):
+        flow = make_flows(survey, 1)[0]
+        url = reverse("questionflow-detail", kwargs={"pk": flow.id})
+        response = authenticated_client.get(
+            url, {"expand": "source_question,target_question,source_answer"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["source_question"]["id"] == flow.source_question_id
+        assert response.data["target_question"]["text"] == flow.target_question.text
+        assert response.data["source_answer"]["id"] == flow.source_answer_id
+
+    @pytest.mark.parametrize(
+        "params",
+        [{}, {"expand": "source_question,target_question,source_answer"}],
+    )
+    def test_query_count_is_constant(self, authenticated_client, survey, params):
+        make_flows(survey, 3)
+        small = self.list_query_count(authenticated_client, params)
+        make_flows(survey, 30)
+        large = self.list_query_count(authenticated_client, params)
+        assert small == large == 1
@@ -0,0 +1,306 @@
+import json
+from urllib.parse import urlencode
+
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.asgi import application
+from surveys.flow_graph import FlowGraph
+from surveys.models import Survey
+from surveys.respondents import dump_token, load_token, start_session
+from surveys.versions import publish_survey
+from surveys.views import SurveyAnswersView, SurveyNavigationView
+
+
+class ASGIResponse:
+    def __init__(self, start, body):
+        self.status_code = start["status"]
+        self.headers = {
+            name.decode().lower(): value.decode() for name, value in start["headers"]
+        }
+        self.content = body
+
+    def __getitem__(self, name):
+        return self.headers[name.lower()]
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ASGIClient:
+    """Запросы к ``core.asgi.application``, как от ASGI-сервера.
+
+    Синхронный код каждого запроса выполняется в отдельном потоке со своим
+    соединением, поэтому тестам нужны зафиксированные данные:
+    ``django_db(transaction=True)``.
+    """
+
+    def __init__(self, **headers):
+        self.headers = headers
+
+    def request(self, method, path, params=None, headers=None):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "query_string": urlencode(params or {}, doseq=True).encode(),
+            "headers": [
+                (b"host", b"testserver"),
+                *(
+                    (name.encode(), value.encode())
+                    for name, value in {**self.headers, **(headers or {})}.items()
+                ),
+            ],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        return async_to_sync(self._communicate)(scope)
+
+    async def _communicate(self, scope):
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output()
+        body = b""
+        while True:
+            message = await communicator.receive_output()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        await communicator.wait()
+        return ASGIResponse(start, body)
+
+    def get(self, path, params=None, headers=None):
+        return self.request("GET", path, params, headers)
+
+    def post(self, path, params=None, headers=None):
+        return self.request("POST", path, params, headers)
+
+
+@pytest.fixture
+def token():
+    return Token.objects.create(user=baker.make(User))
+
+
+@pytest.fixture
+def asgi_client(token):
+    return ASGIClient(authorization=f"Token {token.key}")
+
+
+def next_url(survey):
+    return reverse("survey-next", kwargs={"survey_id": survey.id})
+
+
+class TestReadRouter:
+    def scope(self, method, path):
+        return {"type": "http", "method": method, "path": path}
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "/api/surveys/1/next/",
+            "/api/surveys/1/bundle/",
+            "/api/surveys/1/questions/2/answers/",
+        ],
+    )
+    def test_reads_go_to_async_views(self, path):
+        assert application.is_read(self.scope("GET", path))
+        assert application.is_read(self.scope("HEAD", path))
+
+    @pytest.mark.parametrize(
+        "method, path",
+        [
+            ("POST", "/api/surveys/1/next/"),
+            ("GET", "/api/surveys/question-flow/"),
+            ("GET", "/api/surveys/1/statistics/"),
+            ("GET", "/admin/"),
+        ],
+    )
+    def test_other_requests_go_to_django(self, method, path):
+        assert not application.is_read(self.scope(method, path))
+
+    def test_websocket(self):
+        assert not application.is_read({"type": "websocket", "path": "/"})
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncRouting:
+    def test_wsgi_keeps_drf_views(self, authenticated_client, branching_survey):
+        response = authenticated_client.get(next_url(branching_survey["survey"]))
+        assert response.resolver_match.func.view_class is SurveyNavigationView
+
+    def test_editing_stays_on_drf(self, asgi_client):
+        response = asgi_client.get(reverse("questionflow-list"))
+        assert response.status_code == status.HTTP_200_OK
+        assert "results" in response.json()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncAuthentication:
+    def test_no_credentials(self, branching_survey):
+        response = ASGIClient().get(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response["WWW-Authenticate"] == "Token"
+        assert "detail" in response.json()
+
+    @pytest.mark.parametrize("header", ["Token", "Token a b", "Token unknown"])
+    def test_bad_token(self, branching_survey, header):
+        response = ASGIClient(authorization=header).get(
+            next_url(branching_survey["survey"])
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_inactive_user(self, token, asgi_client, branching_survey):
+        User.objects.filter(pk=token.user_id).update(is_active=False)
+        response = asgi_client.get(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncNavigation:
+    def test_first_question(self, asgi_client, branching_survey):
+        response = asgi_client.get(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["question"]["id"] == branching_survey["questions"][0].id
+        assert data["is_finished"] is False
+        assert "version" not in data
+
+    def test_matches_sync_view(
+        self, asgi_client, authenticated_client, branching_survey
+    ):
+        url = next_url(branching_survey["survey"])
+        params = {
+            "question": branching_survey["questions"][0].id,
+            "answers": branching_survey["answers"][0].id,
+        }
+        expected = authenticated_client.get(url, params).json()
+        assert asgi_client.get(url, params).json() == expected
+
+    def test_errors_use_drf_format(self, asgi_client, branching_survey):
+        url = next_url(branching_survey["survey"])
+        first = branching_survey["questions"][0]
+
+        response = asgi_client.get(url, {"question": "x"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == ["Идентификаторы должны быть целыми числами"]
+
+        response = asgi_client.get(url, {"question": first.id, "answers": 999999})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "answers" in response.json()
+
+    def test_unknown_survey(self, asgi_client):
+        response = asgi_client.get(reverse("survey-next", kwargs={"survey_id": 999999}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "Опрос не найден"}
+
+    def test_version(self, asgi_client, branching_survey):
+        survey = branching_survey["survey"]
+        publish_survey(survey.id)
+        response = asgi_client.get(next_url(survey))
+        assert response.json()["version"] == 1
+
+        response = asgi_client.get(next_url(survey), {"version": 2})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_warm_request_does_not_read_graph(
+        self, asgi_client, branching_survey, monkeypatch
+    ):
+        url = next_url(branching_survey["survey"])
+        params = {
+            "question": branching_survey["questions"][0].id,
+            "answers": branching_survey["answers"][0].id,
+        }
+        asgi_client.get(url, params)
+        monkeypatch.setattr(FlowGraph, "read", None)
+        response = asgi_client.get(url, params)
+        assert response.json()["question"]["id"] == branching_survey["questions"][1].id
+
+    def test_method_not_allowed(self, asgi_client, branching_survey):
+        response = asgi_client.post(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+    def test_respondent(self, branching_survey):
+        survey = branching_survey["survey"]
+        respondent = start_session(survey.id, None, branching_survey["questions"][0].id)
+        client = ASGIClient(authorization=f"Respondent {dump_token(respondent)}")
+        params = {
+            "question": branching_survey["questions"][0].id,
+            "answers": branching_survey["answers"][0].id,
+        }
+        data = client.get(next_url(survey), params).json()
+        assert data["question"]["id"] == branching_survey["questions"][1].id
+        assert load_token(data["token"]).session == respondent.session
+
+        response = client.get(next_url(baker.make(Survey)))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_respondent_bad_token(self, branching_survey):
+        client = ASGIClient(authorization="Respondent forged")
+        response = client.get(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response["WWW-Authenticate"] == "Token"
+
+    def test_respondent_can_not_read_bundle(self, branching_survey):
+        survey = branching_survey["survey"]
+        respondent = start_session(survey.id, None, None)
+        client = ASGIClient(authorization=f"Respondent {dump_token(respondent)}")
+        response = client.get(reverse("survey-bundle", kwargs={"survey_id": survey.id}))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncBundle:
+    def test_not_modified(self, asgi_client, branching_survey):
+        url = reverse(
+            "survey-bundle", kwargs={"survey_id": branching_survey["survey"].id}
+        )
+        response = asgi_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["questions"]) == 3
+
+        response = asgi_client.get(url, headers={"if-none-match": response["ETag"]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+
+    def test_unknown_survey(self, asgi_client):
+        url = reverse("survey-bundle", kwargs={"survey_id": 999999})
+        assert asgi_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSurveyAnswersAPI:
+    def url(self, survey, question):
+        return reverse(
+            "survey-answers",
+            kwargs={"survey_id": survey.id, "question_id": question.id},
+        )
+
+    def test_sync(self, authenticated_client, branching_survey):
+        first = branching_survey["questions"][0]
+        response = authenticated_client.get(self.url(branching_survey["survey"], first))
+        assert response.resolver_match.func.view_class is SurveyAnswersView
+        assert response.data["question"] == first.id
+        assert [answer["id"] for answer in response.data["answers"]] == [
+            answer.id for answer in branching_survey["answers"]
+        ]
+
+    def test_async_matches_sync(
+        self, asgi_client, authenticated_client, branching_survey
+    ):
+        url = self.url(branching_survey["survey"], branching_survey["questions"][0])
+        assert asgi_client.get(url).json() == authenticated_client.get(url).json()
+
+    def test_question_from_other_survey(self, asgi_client, branching_survey):
+        other = baker.make("surveys.Question")
+        response = asgi_client.get(self.url(branching_survey["survey"], other))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"detail": "Вопрос не найден"}
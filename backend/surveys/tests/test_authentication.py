@@ -0,0 +1,141 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+
+from surveys import authentication
+from surveys.authentication import (
+    AsyncTokenAuthentication,
+    CachedTokenAuthentication,
+    forget_tokens,
+)
+
+
+@pytest.fixture
+def token():
+    return Token.objects.create(user=baker.make(User))
+
+
+@pytest.fixture
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+def make_tokens(count):
+    return [
+        Token.objects.create(user=user) for user in baker.make(User, _quantity=count)
+    ]
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    def test_warm_navigation_does_not_query(
+        self, token_client, branching_survey, django_assert_num_queries
+    ):
+        url = reverse(
+            "survey-next", kwargs={"survey_id": branching_survey["survey"].id}
+        )
+        params = {
+            "question": branching_survey["questions"][0].id,
+            "answers": branching_survey["answers"][0].id,
+        }
+        with django_assert_num_queries(4):
+            token_client.get(url, params)
+        with django_assert_num_queries(0):
+            response = token_client.get(url, params)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_unknown_token_is_not_cached(self, django_assert_num_queries):
+        backend = CachedTokenAuthentication()
+        for _ in range(2):
+            with django_assert_num_queries(1), pytest.raises(AuthenticationFailed):
+                backend.authenticate_credentials("unknown")
+
+    def test_token_deletion(self, token, token_client, branching_survey):
+        url = reverse(
+            "survey-next", kwargs={"survey_id": branching_survey["survey"].id}
+        )
+        assert token_client.get(url).status_code == status.HTTP_200_OK
+        token.delete()
+        assert token_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_user_deactivation(self, token, token_client, branching_survey):
+        url = reverse(
+            "survey-next", kwargs={"survey_id": branching_survey["survey"].id}
+        )
+        assert token_client.get(url).status_code == status.HTTP_200_OK
+        token.user.is_active = False
+        token.user.save()
+        assert token_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_user_deletion(self, token, token_client, branching_survey):
+        url = reverse(
+            "survey-next", kwargs={"survey_id": branching_survey["survey"].id}
+        )
+        assert token_client.get(url).status_code == status.HTTP_200_OK
+        token.user.delete()
+        assert token_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_timeout(self, token, settings, django_assert_num_queries):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "TOKEN_CACHE_TIMEOUT": 0}
+        backend = CachedTokenAuthentication()
+        backend.authenticate_credentials(token.key)
+        with django_assert_num_queries(1):
+            backend.authenticate_credentials(token.key)
+
+    def test_expired_entry_is_reloaded(
+        self, token, monkeypatch, django_assert_num_queries
+    ):
+        backend = CachedTokenAuthentication()
+        backend.authenticate_credentials(token.key)
+        now = authentication.time.monotonic()
+        monkeypatch.setattr(authentication.time, "monotonic", lambda: now + 3600)
+        with django_assert_num_queries(1):
+            backend.authenticate_credentials(token.key)
+
+    def test_size_is_bounded(self, settings, django_assert_num_queries):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "TOKEN_CACHE_SIZE": 2}
+        backend = CachedTokenAuthentication()
+        first, second, third = make_tokens(3)
+        for token in (first, second, first, third):
+            backend.authenticate_credentials(token.key)
+        # Вытеснен давно не использованный второй токен.
+        with django_assert_num_queries(0):
+            backend.authenticate_credentials(first.key)
+            backend.authenticate_credentials(third.key)
+        with django_assert_num_queries(1):
+            backend.authenticate_credentials(second.key)
+
+    def test_token_read_before_reset_is_not_cached(
+        self, token, monkeypatch, django_assert_num_queries
+    ):
+        original = authentication.TokenAuthentication.authenticate_credentials
+
+        def reset_while_reading(self, key):
+            result = original(self, key)
+            forget_tokens()
+            return result
+
+        monkeypatch.setattr(
+            authentication.TokenAuthentication,
+            "authenticate_credentials",
+            reset_while_reading,
+        )
+        CachedTokenAuthentication().authenticate_credentials(token.key)
+        monkeypatch.undo()
+        with django_assert_num_queries(1):
+            CachedTokenAuthentication().authenticate_credentials(token.key)
+
+    def test_async_shares_cache(self, token, django_assert_num_queries):
+        CachedTokenAuthentication().authenticate_credentials(token.key)
+        backend = AsyncTokenAuthentication()
+        with django_assert_num_queries(0):
+            user, _ = async_to_sync(backend.aauthenticate_credentials)(token.key)
+        assert user.pk == token.user_id
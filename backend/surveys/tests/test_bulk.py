@@ -0,0 +1,219 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys import views
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Answer, Question, QuestionFlow
+from surveys.views import QuestionFlowViewSet
+
+
+@pytest.fixture
+def chain(survey):
+    questions = baker.make(Question, survey=survey, _quantity=20)
+    answers = [baker.make(Answer, question=question) for question in questions]
+    return questions, answers
+
+
+def chain_payload(questions, answers):
+    payload = []
+    for index in range(len(questions) - 1):
+        payload.append(
+            {
+                "source_question": questions[index].id,
+                "target_question": questions[index + 1].id,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+            }
+        )
+        payload.append(
+            {
+                "source_question": questions[index].id,
+                "target_question": questions[-1].id,
+                "relationship_type": FLOW_TYPE_SPECIFIC_ANSWER,
+                "source_answer": answers[index].id,
+            }
+        )
+    return payload
+
+
+@pytest.mark.django_db
+class TestQuestionFlowBulkAPI:
+    url = reverse("questionflow-bulk")
+
+    def test_unauthenticated(self, api_client):
+        response = api_client.post(self.url, [], format="json")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_bulk_create(self, authenticated_client, chain):
+        payload = chain_payload(*chain)
+        response = authenticated_client.post(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data) == len(payload)
+        assert all(item["id"] for item in response.data)
+        assert QuestionFlow.objects.count() == len(payload)
+
+    def test_bulk_create_priority(self, authenticated_client, chain):
+        payload = chain_payload(*chain)
+        payload[1]["priority"] = 5
+        response = authenticated_client.post(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [item["priority"] for item in response.data[:3]] == [0, 5, 0]
+        assert QuestionFlow.objects.get(pk=response.data[1]["id"]).priority == 5
+
+    def test_bulk_create_query_count_is_constant(
+        self, authenticated_client, chain, django_assert_max_num_queries
+    ):
+        payload = chain_payload(*chain)
+        # 3 запроса проверки, 2 на сборку индекса достижимости, вставка
+        # и точки сохранения транзакции
+        with django_assert_max_num_queries(8):
+            response = authenticated_client.post(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+
+    def test_bulk_create_invalidates_graph(self, authenticated_client, chain):
+        questions, answers = chain
+        survey_id = questions[0].survey_id
+        assert get_flow_graph(survey_id).next_question(questions[0].id) is None
+
+        authenticated_client.post(
+            self.url, chain_payload(questions, answers), format="json"
+        )
+        assert get_flow_graph(survey_id).next_question(questions[0].id) == (
+            questions[1].id
+        )
+
+    def test_errors_are_reported_per_item(self, authenticated_client, chain):
+        questions, answers = chain
+        payload = [
+            {
+                "source_question": questions[0].id,
+                "target_question": questions[1].id,
+            },
+            {
+                "source_question": questions[2].id,
+                "target_question": questions[2].id,
+            },
+            {
+                "source_question": questions[3].id,
+                "target_question": questions[4].id,
+                "relationship_type": FLOW_TYPE_SPECIFIC_ANSWER,
+                "source_answer": answers[5].id,
+            },
+            {
+                "source_question": questions[0].id,
+                "target_question": questions[1].id,
+            },
+            {
+                "source_question": questions[3].id,
+                "target_question": 999999,
+            },
+        ]
+        response = authenticated_client.post(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [error["index"] for error in response.data["errors"]] == [1, 2, 3, 4]
+        assert "source_answer" in response.data["errors"][1]["errors"]
+        assert "target_question" in response.data["errors"][3]["errors"]
+        assert QuestionFlow.objects.count() == 0
+
+    def test_duplicate_of_existing_flow(self, authenticated_client, question_flow):
+        payload = [
+            {
+                "source_question": question_flow.source_question_id,
+                "target_question": question_flow.target_question_id,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+            }
+        ]
+        response = authenticated_client.post(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["errors"][0]["index"] == 0
+
+    def test_invalid_item_format(self, authenticated_client):
+        response = authenticated_client.post(
+            self.url, [{"source_question": "abc"}], format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["errors"][0]["index"] == 0
+
+    def test_too_many_items_are_rejected_before_validation(
+        self, authenticated_client, chain, monkeypatch
+    ):
+        def serializer(*args, **kwargs):
+            raise AssertionError("набор не должен проверяться поэлементно")
+
+        monkeypatch.setattr(QuestionFlowViewSet, "bulk_max_items", 2)
+        monkeypatch.setattr(views, "QuestionFlowBulkItemSerializer", serializer)
+        response = authenticated_client.post(
+            self.url, chain_payload(*chain), format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not QuestionFlow.objects.exists()
+
+    def test_bulk_update(self, authenticated_client, question_flow, survey):
+        new_target = baker.make(Question, survey=survey)
+        payload = [
+            {
+                "id": question_flow.id,
+                "source_question": question_flow.source_question_id,
+                "target_question": new_target.id,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+            }
+        ]
+        response = authenticated_client.put(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        question_flow.refresh_from_db()
+        assert question_flow.target_question_id == new_target.id
+
+    def test_bulk_update_constraint_conflict(self, authenticated_client, survey):
+        source, first, second = baker.make(Question, survey=survey, _quantity=3)
+        flow_a = baker.make(
+            QuestionFlow,
+            source_question=source,
+            target_question=first,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+        flow_b = baker.make(
+            QuestionFlow,
+            source_question=source,
+            target_question=second,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+        payload = [
+            {
+                "id": flow_a.id,
+                "source_question": source.id,
+                "target_question": second.id,
+            },
+            {
+                "id": flow_b.id,
+                "source_question": source.id,
+                "target_question": first.id,
+            },
+        ]
+        response = authenticated_client.put(self.url, payload, format="json")
+        # Обмен целями проходит проверку набора, но построчный UPDATE
+        # нарушает ограничение уникальности: транзакция откатывается.
+        assert response.status_code == status.HTTP_409_CONFLICT
+        flow_a.refresh_from_db()
+        assert flow_a.target_question_id == first.id
+
+    def test_bulk_update_unknown_id(self, authenticated_client, question_flow):
+        payload = [
+            {
+                "id": 999999,
+                "source_question": question_flow.source_question_id,
+                "target_question": question_flow.target_question_id,
+            }
+        ]
+        response = authenticated_client.put(self.url, payload, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "id" in response.data["errors"][0]["errors"]
+
+    def test_bulk_delete(self, authenticated_client, chain):
+        authenticated_client.post(self.url, chain_payload(*chain), format="json")
+        ids = list(QuestionFlow.objects.values_list("id", flat=True)[:5])
+        response = authenticated_client.delete(self.url, {"ids": ids}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["deleted"] == 5
+        assert not QuestionFlow.objects.filter(pk__in=ids).exists()
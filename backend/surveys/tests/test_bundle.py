@@ -0,0 +1,85 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.models import Question, QuestionFlow
+
+
+@pytest.mark.django_db
+class TestSurveyBundleAPI:
+    def url(self, survey):
+        return reverse("survey-bundle", kwargs={"survey_id": survey.id})
+
+    def test_unauthenticated(self, api_client, survey):
+        response = api_client.get(self.url(survey))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_unknown_survey(self, authenticated_client):
+        url = reverse("survey-bundle", kwargs={"survey_id": 999999})
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_bundle_contents(self, authenticated_client, branching_survey):
+        survey = branching_survey["survey"]
+        first, second, third = branching_survey["questions"]
+        yes = branching_survey["answers"][0]
+        response = authenticated_client.get(self.url(survey))
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"]
+
+        data = response.json()
+        assert data["id"] == survey.id
+        assert [q["id"] for q in data["questions"]] == [first.id, second.id, third.id]
+        assert [a["id"] for a in data["questions"][0]["answers"]] == [
+            a.id for a in branching_survey["answers"]
+        ]
+        assert data["routing"] == {
+            str(first.id): {"any": third.id, "answers": {str(yes.id): second.id}}
+        }
+
+    def test_not_modified(
+        self, authenticated_client, branching_survey, django_assert_num_queries
+    ):
+        url = self.url(branching_survey["survey"])
+        etag = authenticated_client.get(url)["ETag"]
+        with django_assert_num_queries(1):
+            response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    def test_cached_body_is_reused(
+        self, authenticated_client, branching_survey, django_assert_num_queries
+    ):
+        url = self.url(branching_survey["survey"])
+        body = authenticated_client.get(url).content
+        with django_assert_num_queries(1):
+            assert authenticated_client.get(url).content == body
+
+    def test_etag_changes_on_update(self, authenticated_client, branching_survey):
+        url = self.url(branching_survey["survey"])
+        etag = authenticated_client.get(url)["ETag"]
+
+        second = branching_survey["questions"][1]
+        second.text = "Новый текст"
+        second.save()
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert response.json()["questions"][1]["text"] == "Новый текст"
+
+    def test_etag_changes_on_delete(self, authenticated_client, branching_survey):
+        url = self.url(branching_survey["survey"])
+        etag = authenticated_client.get(url)["ETag"]
+
+        QuestionFlow.objects.filter(
+            source_question=branching_survey["questions"][0]
+        ).first().delete()
+        assert authenticated_client.get(url)["ETag"] != etag
+
+    def test_etag_ignores_other_surveys(self, authenticated_client, branching_survey):
+        url = self.url(branching_survey["survey"])
+        etag = authenticated_client.get(url)["ETag"]
+
+        baker.make(Question)
+        assert authenticated_client.get(url)["ETag"] == etag
@@ -0,0 +1,75 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys import flow_graph
+from surveys.cache import cache_stats
+from surveys.flow_graph import get_flow_graph
+
+
+def other_process(monkeypatch):
+    """Сбрасывает графы в памяти процесса, оставляя общий кеш"""
+    monkeypatch.setattr(flow_graph, "_graphs", {})
+    monkeypatch.setattr(flow_graph, "_question_surveys", {})
+
+
+@pytest.mark.django_db
+class TestSurveyCache:
+    def test_graph_rows_are_shared(
+        self, branching_survey, monkeypatch, django_assert_num_queries
+    ):
+        survey = branching_survey["survey"]
+        built = get_flow_graph(survey.id)
+        other_process(monkeypatch)
+        with django_assert_num_queries(0):
+            graph = get_flow_graph(survey.id)
+        assert graph is not built
+        assert graph.routing_table() == built.routing_table()
+        assert cache_stats()["graph"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    def test_signals_bump_stamps(self, branching_survey, monkeypatch):
+        survey = branching_survey["survey"]
+        yes = branching_survey["answers"][0]
+        get_flow_graph(survey.id)
+        other_process(monkeypatch)
+
+        yes.text = "Новый текст"
+        yes.save()
+        other_process(monkeypatch)
+        graph = get_flow_graph(survey.id)
+        first = graph.questions[branching_survey["questions"][0].id]
+        assert first.answers[0].text == "Новый текст"
+
+    def test_deleted_flow_is_not_served(self, branching_survey, monkeypatch):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        get_flow_graph(survey.id)
+        first.source_relationships.all().delete()
+        other_process(monkeypatch)
+        assert get_flow_graph(survey.id).edges == ()
+
+    def test_any_backend(self, settings, branching_survey, monkeypatch):
+        settings.CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "off": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        }
+        settings.SURVEYS_CACHE = "off"
+        survey = branching_survey["survey"]
+        get_flow_graph(survey.id)
+        other_process(monkeypatch)
+        assert get_flow_graph(survey.id).question_ids
+        assert cache_stats()["graph"]["hits"] == 0
+
+
+@pytest.mark.django_db
+class TestCacheStatsAPI:
+    def test_requires_staff(self, authenticated_client):
+        response = authenticated_client.get(reverse("survey-cache"))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_stats(self, api_client, branching_survey, django_user_model):
+        api_client.force_authenticate(baker.make(django_user_model, is_staff=True))
+        get_flow_graph(branching_survey["survey"].id)
+        response = api_client.get(reverse("survey-cache"))
+        assert response.data["graph"]["misses"] == 1
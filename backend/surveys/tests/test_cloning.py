@@ -0,0 +1,254 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework import status
+
+from surveys.cloning import clone_survey, import_survey
+from surveys.constants import (
+    FLOW_RESOLUTION_FIRST_MATCH,
+    FLOW_TYPE_ANY_ANSWER,
+    FLOW_TYPE_SPECIFIC_ANSWER,
+)
+from surveys.export import export_records, iter_export
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Answer, Question, QuestionFlow, Survey
+
+
+def structure(survey_id):
+    """Структура опроса без идентификаторов, сравнимая между копиями"""
+    graph = get_flow_graph(survey_id)
+    position = {question_id: i for i, question_id in enumerate(graph.question_ids)}
+    answers = {
+        answer.id: (position[question_id], i)
+        for question_id in graph.question_ids
+        for i, answer in enumerate(graph.questions[question_id].answers)
+    }
+    return (
+        [
+            (
+                question.text,
+                question.question_type,
+                [answer.text for answer in question.answers],
+                question.flow_resolution,
+                question.fallback_to_next,
+            )
+            for question in map(graph.questions.get, graph.question_ids)
+        ],
+        sorted(
+            (
+                position[edge.source_question_id],
+                position[edge.target_question_id],
+                edge.relationship_type,
+                answers.get(edge.source_answer_id),
+                edge.priority,
+            )
+            for edge in graph.edges
+        ),
+    )
+
+
+@pytest.fixture
+def large_survey(survey):
+    questions = Question.objects.bulk_create(
+        Question(survey=survey, text=f"Вопрос {number}", order=number)
+        for number in range(300)
+    )
+    answers = Answer.objects.bulk_create(
+        Answer(question=question, text=f"Ответ {number}", order=number)
+        for question in questions
+        for number in range(2)
+    )
+    QuestionFlow.objects.bulk_create(
+        QuestionFlow(
+            source_question=question,
+            target_question=questions[number + 1],
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=answers[number * 2],
+        )
+        for number, question in enumerate(questions[:-1])
+    )
+    return survey
+
+
+@pytest.mark.django_db
+class TestCloneSurvey:
+    def test_clone(self, branching_survey):
+        survey = branching_survey["survey"]
+        result = clone_survey(survey.id)
+
+        copy = result.survey
+        assert copy.pk != survey.pk
+        assert copy.title.endswith(" (копия)")
+        assert survey.title.startswith(copy.title.removesuffix(" (копия)"))
+        assert structure(copy.pk) == structure(survey.id)
+        first = branching_survey["questions"][0]
+        assert Question.objects.get(pk=result.questions[first.id]).survey_id == copy.pk
+        assert len(result.flows) == 2
+
+    def test_clone_keeps_routing(self, branching_survey):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        first.flow_resolution = FLOW_RESOLUTION_FIRST_MATCH
+        first.fallback_to_next = True
+        first.save()
+        QuestionFlow.objects.filter(source_question=first).update(priority=3)
+        result = clone_survey(survey.id)
+        assert structure(result.survey.pk) == structure(survey.id)
+
+    def test_query_count_does_not_depend_on_size(
+        self, large_survey, django_assert_max_num_queries
+    ):
+        # Четыре выборки исходного опроса, создание опроса, пакетные
+        # вставки (на SQLite по ограничению числа параметров) и точки
+        # сохранения транзакции.
+        with django_assert_max_num_queries(20):
+            result = clone_survey(large_survey.id, title="Копия")
+        assert result.survey.title == "Копия"
+        assert len(result.answers) == 600
+        assert structure(result.survey.pk) == structure(large_survey.id)
+
+    def test_unknown_survey(self):
+        with pytest.raises(Survey.DoesNotExist):
+            clone_survey(999999)
+
+    def test_api(self, authenticated_client, branching_survey):
+        survey = branching_survey["survey"]
+        url = reverse("survey-clone", kwargs={"survey_id": survey.id})
+        response = authenticated_client.post(url, {"title": "Новый"}, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["title"] == "Новый"
+        assert (response.data["questions"], response.data["flows"]) == (3, 2)
+
+        graph = get_flow_graph(response.data["id"])
+        assert len(graph.question_ids) == 3
+
+    def test_api_unknown_survey(self, authenticated_client):
+        url = reverse("survey-clone", kwargs={"survey_id": 999999})
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestImportSurvey:
+    def test_roundtrip_jsonl(self, branching_survey, tmp_path):
+        survey = branching_survey["survey"]
+        path = tmp_path / "survey.jsonl"
+        path.write_text("".join(iter_export(survey.id, "jsonl")), encoding="utf-8")
+        call_command("import_survey", str(path), stdout=StringIO())
+
+        copy = Survey.objects.exclude(pk=survey.pk).get()
+        assert copy.title == survey.title
+        assert structure(copy.pk) == structure(survey.id)
+
+    def test_roundtrip_csv(self, branching_survey, tmp_path):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        first.fallback_to_next = True
+        first.save()
+        QuestionFlow.objects.filter(source_question=first).update(priority=2)
+        path = tmp_path / "survey.csv"
+        path.write_text("".join(iter_export(survey.id, "csv")), encoding="utf-8")
+        call_command(
+            "import_survey",
+            str(path),
+            "--title",
+            "Из CSV",
+            stdout=StringIO(),
+        )
+
+        copy = Survey.objects.get(title="Из CSV")
+        assert structure(copy.pk) == structure(survey.id)
+
+    def test_rejects_broken_references(self, branching_survey):
+        records = list(export_records(branching_survey["survey"].id, ("structure",)))
+        for record in records:
+            if record["record"] == "answer":
+                record["question_id"] = 999999
+        with pytest.raises(ValidationError) as error:
+            import_survey(records)
+        assert "вопрос 999999 не найден" in " ".join(error.value.messages)
+        assert Survey.objects.count() == 1
+
+    def test_rejects_cycles(self):
+        records = [
+            {"record": "survey", "title": "Опрос"},
+            {"record": "question", "id": 1, "text": "A", "question_type": "single"},
+            {"record": "question", "id": 2, "text": "B", "question_type": "single"},
+        ] + [
+            {
+                "record": "flow",
+                "question_id": source,
+                "target_question_id": target,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+            }
+            for source, target in ((1, 2), (2, 1))
+        ]
+        with pytest.raises(ValidationError) as error:
+            import_survey(records)
+        assert "цикл" in " ".join(error.value.messages)
+
+    def test_rejects_fallback_cycles(self):
+        records = [
+            {"record": "survey", "title": "Опрос"},
+            {
+                "record": "question",
+                "id": 1,
+                "text": "A",
+                "question_type": "single",
+                "order": 1,
+                "fallback_to_next": True,
+            },
+            {
+                "record": "question",
+                "id": 2,
+                "text": "B",
+                "question_type": "single",
+                "order": 2,
+            },
+            {
+                "record": "flow",
+                "question_id": 2,
+                "target_question_id": 1,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+            },
+        ]
+        with pytest.raises(ValidationError) as error:
+            import_survey(records)
+        assert "цикл" in " ".join(error.value.messages)
+
+    def test_rejects_long_values(self):
+        records = [
+            {"record": "survey", "title": "О" * 300},
+            {"record": "question", "id": 1, "text": "A", "question_type": "single"},
+            {"record": "question", "id": 2, "text": "B", "question_type": "single"},
+            {
+                "record": "flow",
+                "question_id": 1,
+                "target_question_id": 2,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+                "condition": " or ".join(["Q1"] * 200),
+            },
+        ]
+        with pytest.raises(ValidationError) as error:
+            import_survey(records)
+        messages = error.value.messages
+        assert any("длиннее 255" in message for message in messages)
+        assert any("длиннее 500" in message for message in messages)
+        assert not Survey.objects.exists()
+
+    def test_title_replaces_long_title(self):
+        records = [
+            {"record": "survey", "title": "О" * 300},
+            {"record": "question", "id": 1, "text": "A", "question_type": "single"},
+        ]
+        assert import_survey(records, title="Опрос").survey.title == "Опрос"
+
+    def test_command_reports_errors(self, tmp_path):
+        path = tmp_path / "broken.jsonl"
+        path.write_text(json.dumps({"record": "question"}) + "\n", encoding="utf-8")
+        with pytest.raises(CommandError):
+            call_command("import_survey", str(path))
@@ -0,0 +1,352 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.cloning import clone_survey
+from surveys.conditions import (
+    MAX_CONDITION_DEPTH,
+    ConditionError,
+    compile_condition,
+    condition_references,
+    parse_condition,
+    rename_references,
+)
+from surveys.constants import (
+    FLOW_TYPE_ANY_ANSWER,
+    FLOW_TYPE_SPECIFIC_ANSWER,
+    QUESTION_TYPE_MULTIPLE,
+    QUESTION_TYPE_TEXT,
+)
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Answer, Question, QuestionFlow
+from surveys.respondents import load_token
+from surveys.versions import publish_survey
+
+BITS = {1: 1, 2: 2, 3: 4, 4: 8}
+MASKS = {10: 3, 20: 12}
+
+
+def check(text, answers=(), values=None):
+    predicate = compile_condition(parse_condition(text), BITS, MASKS)
+    mask = 0
+    for answer_id in answers:
+        mask |= BITS.get(answer_id, 0)
+    return predicate(mask, values or {})
+
+
+class TestParseCondition:
+    def test_precedence(self):
+        assert parse_condition("A1 or A2 and not A3") == (
+            "or",
+            (("answer", 1), ("and", (("answer", 2), ("not", ("answer", 3))))),
+        )
+
+    def test_comparison(self):
+        assert parse_condition("q5 >= -1.5") == ("compare", 5, ">=", -1.5)
+
+    def test_references(self):
+        tree = parse_condition("(A1 or Q2) and not (A3 or Q4 < 10)")
+        assert condition_references(tree) == ({1, 3}, {2, 4})
+
+    @pytest.mark.parametrize(
+        "text", ["", "A1 and", "(A1", "A1 A2", "B1", "A1 xor A2", "Q1 > A2", "A1 $"]
+    )
+    def test_errors(self, text):
+        with pytest.raises(ConditionError):
+            parse_condition(text)
+
+    def test_nesting_limit(self):
+        depth = MAX_CONDITION_DEPTH
+        assert parse_condition("(" * depth + "A1" + ")" * depth) == ("answer", 1)
+        for text in ["(" * 240 + "A1" + ")" * 240, "not " * 120 + "A1"]:
+            with pytest.raises(ConditionError):
+                parse_condition(text)
+
+    def test_rename_references(self):
+        assert rename_references("A1 and not Q2 > 3", {1: 7}, {2: 9}) == (
+            "A7 and not Q9 > 3"
+        )
+
+
+class TestCompileCondition:
+    @pytest.mark.parametrize(
+        "text, answers, expected",
+        [
+            ("A1", [1], True),
+            ("A1", [2], False),
+            ("A1 and not A3", [1], True),
+            ("A1 and not A3", [1, 3], False),
+            ("A1 and A2", [1], False),
+            ("A1 or A3", [3], True),
+            ("not (A1 or A2)", [4], True),
+            ("A1 and not A1", [1], False),
+            ("Q10", [2], True),
+            ("Q20", [1, 2], False),
+            ("A9", [1, 2, 3, 4], False),
+            ("not A9", [], True),
+        ],
+    )
+    def test_answers(self, text, answers, expected):
+        assert check(text, answers) is expected
+
+    def test_numbers(self):
+        assert check("Q30 >= 18", values={30: 18.0})
+        assert not check("Q30 >= 18", values={30: 17.5})
+        assert not check("Q30 >= 18")
+        assert check("Q30", values={30: 0.0})
+        assert check("A1 and Q30 != 3", [1], {30: 4.0})
+        assert not check("A1 and Q30 != 3", [1], {30: 3.0})
+        assert check("A9 or Q30 < 0", values={30: -1.0})
+
+
+@pytest.fixture
+def conditional_survey(survey):
+    """Q1 (несколько ответов) -> Q2 (текст) -> Q3 с условными переходами"""
+    first = baker.make(
+        Question, survey=survey, question_type=QUESTION_TYPE_MULTIPLE, order=1
+    )
+    red, green = (baker.make(Answer, question=first, order=order) for order in (1, 2))
+    age = baker.make(
+        Question,
+        survey=survey,
+        question_type=QUESTION_TYPE_TEXT,
+        is_required=False,
+        order=2,
+    )
+    adults, children, rest = (
+        baker.make(Question, survey=survey, order=order) for order in (3, 4, 5)
+    )
+    baker.make(
+        QuestionFlow,
+        source_question=first,
+        target_question=age,
+        relationship_type=FLOW_TYPE_ANY_ANSWER,
+    )
+    baker.make(
+        QuestionFlow,
+        source_question=age,
+        target_question=adults,
+        relationship_type=FLOW_TYPE_ANY_ANSWER,
+        condition=f"A{red.id} and not A{green.id} and Q{age.id} >= 18",
+    )
+    baker.make(
+        QuestionFlow,
+        source_question=age,
+        target_question=children,
+        relationship_type=FLOW_TYPE_ANY_ANSWER,
+        condition=f"Q{age.id} < 18",
+        priority=1,
+    )
+    baker.make(
+        QuestionFlow,
+        source_question=age,
+        target_question=rest,
+        relationship_type=FLOW_TYPE_ANY_ANSWER,
+        priority=2,
+    )
+    return {
+        "survey": survey,
+        "questions": (first, age, adults, children, rest),
+        "answers": (red, green),
+    }
+
+
+@pytest.mark.django_db
+class TestConditionalGraph:
+    def test_next_question(self, conditional_survey):
+        first, age, adults, children, rest = conditional_survey["questions"]
+        red, green = conditional_survey["answers"]
+        graph = get_flow_graph(conditional_survey["survey"].id)
+        assert graph.has_conditions
+        assert graph.next_question(age.id, (), [red.id], {age.id: 30}) == adults.id
+        assert graph.next_question(age.id, (), [red.id, green.id], {age.id: 30}) == (
+            rest.id
+        )
+        assert graph.next_question(age.id, (), [red.id], {age.id: 7}) == children.id
+        assert graph.next_question(age.id) == rest.id
+
+    def test_conditional_answer_edge(self, conditional_survey):
+        first, _age, adults, children, _rest = conditional_survey["questions"]
+        red, green = conditional_survey["answers"]
+        baker.make(
+            QuestionFlow,
+            source_question=first,
+            target_question=adults,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=red,
+            condition=f"A{green.id}",
+        )
+        baker.make(
+            QuestionFlow,
+            source_question=first,
+            target_question=children,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=red,
+            priority=1,
+        )
+        graph = get_flow_graph(conditional_survey["survey"].id)
+        assert graph.next_question(first.id, [red.id, green.id]) == adults.id
+        assert graph.next_question(first.id, [red.id]) == children.id
+
+    def test_routing_table_marks_conditional_questions(self, conditional_survey):
+        first, age, *_ = conditional_survey["questions"]
+        table = get_flow_graph(conditional_survey["survey"].id).routing_table()
+        assert table[age.id]["conditional"] is True
+        assert "conditional" not in table[first.id]
+
+    def test_version_keeps_conditions(self, conditional_survey):
+        _first, age, adults, _children, _rest = conditional_survey["questions"]
+        red, _green = conditional_survey["answers"]
+        graph = publish_survey(conditional_survey["survey"].id).graph
+        assert graph.next_question(age.id, (), [red.id], {age.id: 30}) == adults.id
+
+    def test_clone_renames_references(self, conditional_survey):
+        survey = conditional_survey["survey"]
+        _first, age, adults, _children, _rest = conditional_survey["questions"]
+        red, _green = conditional_survey["answers"]
+        result = clone_survey(survey.id)
+
+        graph = get_flow_graph(result.survey.pk)
+        new_age = result.questions[age.id]
+        assert (
+            graph.next_question(new_age, (), [result.answers[red.id]], {new_age: 30})
+            == result.questions[adults.id]
+        )
+
+    def test_invalid_stored_condition_never_matches(self, conditional_survey):
+        _first, age, _adults, children, rest = conditional_survey["questions"]
+        QuestionFlow.objects.filter(target_question=children).update(condition="(")
+        graph = get_flow_graph(conditional_survey["survey"].id)
+        assert graph.next_question(age.id, (), (), {age.id: 7}) == rest.id
+
+
+@pytest.mark.django_db
+class TestConditionValidation:
+    url = reverse("questionflow-list")
+
+    def post(self, client, source, target, condition):
+        return client.post(
+            self.url,
+            {
+                "source_question": source.id,
+                "target_question": target.id,
+                "relationship_type": FLOW_TYPE_ANY_ANSWER,
+                "condition": condition,
+            },
+            format="json",
+        )
+
+    def test_valid(self, authenticated_client, source_question, target_question):
+        answer = baker.make(Answer, question=source_question)
+        response = self.post(
+            authenticated_client,
+            source_question,
+            target_question,
+            f"A{answer.id} and Q{target_question.id} > 1",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["condition"] == (
+            f"A{answer.id} and Q{target_question.id} > 1"
+        )
+
+    def test_syntax(self, authenticated_client, source_question, target_question):
+        response = self.post(
+            authenticated_client, source_question, target_question, "A1 and"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "condition" in response.data
+
+    def test_deep_nesting(self, authenticated_client, source_question, target_question):
+        response = self.post(
+            authenticated_client,
+            source_question,
+            target_question,
+            "(" * 240 + "A1" + ")" * 240,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "condition" in response.data
+
+    def test_other_survey(self, authenticated_client, source_question, target_question):
+        other = baker.make(Answer)
+        response = self.post(
+            authenticated_client, source_question, target_question, f"A{other.id}"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["condition"] == [
+            f"Ответ {other.id} из условия не найден в опросе"
+        ]
+
+
+@pytest.mark.django_db
+class TestConditionalNavigation:
+    def url(self, survey):
+        return reverse("survey-next", kwargs={"survey_id": survey.id})
+
+    def test_history_and_value(self, authenticated_client, conditional_survey):
+        _first, age, adults, _children, rest = conditional_survey["questions"]
+        red, _green = conditional_survey["answers"]
+        url = self.url(conditional_survey["survey"])
+        response = authenticated_client.get(
+            url, {"question": age.id, "history": red.id, "value": "42"}
+        )
+        assert response.data["question"]["id"] == adults.id
+
+        response = authenticated_client.get(
+            url, {"question": age.id, "history": red.id, "values": f"{age.id}:42"}
+        )
+        assert response.data["question"]["id"] == adults.id
+
+        response = authenticated_client.get(url, {"question": age.id, "value": "42"})
+        assert response.data["question"]["id"] == rest.id
+
+    @pytest.mark.parametrize(
+        "params, field",
+        [
+            ({"value": "abc"}, "value"),
+            ({"value": "nan"}, "value"),
+            ({"values": "1"}, "values"),
+        ],
+    )
+    def test_bad_values(self, authenticated_client, conditional_survey, params, field):
+        age = conditional_survey["questions"][1]
+        response = authenticated_client.get(
+            self.url(conditional_survey["survey"]), {"question": age.id, **params}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert field in response.data
+
+    def test_respondent_token_keeps_answers(self, api_client, conditional_survey):
+        survey = conditional_survey["survey"]
+        first, age, adults, _children, _rest = conditional_survey["questions"]
+        red, _green = conditional_survey["answers"]
+        token = api_client.post(
+            reverse("survey-sessions", kwargs={"survey_id": survey.id})
+        ).data["token"]
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Respondent {token}")
+        response = api_client.get(
+            self.url(survey), {"question": first.id, "answers": red.id}
+        )
+        token = response.data["token"]
+        assert load_token(token).answers == (red.id,)
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Respondent {token}")
+        response = api_client.get(self.url(survey), {"question": age.id, "value": "30"})
+        assert response.data["question"]["id"] == adults.id
+        assert load_token(response.data["token"]).values == ((age.id, 30.0),)
+
+    def test_unconditional_survey_keeps_short_tokens(
+        self, api_client, branching_survey
+    ):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        token = api_client.post(
+            reverse("survey-sessions", kwargs={"survey_id": survey.id})
+        ).data["token"]
+        api_client.credentials(HTTP_AUTHORIZATION=f"Respondent {token}")
+        response = api_client.get(
+            self.url(survey),
+            {"question": first.id, "answers": branching_survey["answers"][0].id},
+        )
+        assert load_token(response.data["token"]).answers == ()
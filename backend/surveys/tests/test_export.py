@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework import status
+
+from surveys import export
+from surveys.export import COLUMNS, iter_export
+from surveys.responses import SubmittedItem, save_response
+
+
+@pytest.fixture
+def answered_survey(branching_survey):
+    survey = branching_survey["survey"]
+    first = branching_survey["questions"][0]
+    yes = branching_survey["answers"][0]
+    for number in range(3):
+        save_response(
+            survey.id, f"s{number}", [SubmittedItem(first.id, (yes.id,), "")], True
+        )
+    return branching_survey
+
+
+def records(content):
+    return [json.loads(line) for line in content.splitlines()]
+
+
+@pytest.mark.django_db
+class TestExport:
+    def test_jsonl(self, answered_survey):
+        survey = answered_survey["survey"]
+        rows = records("".join(iter_export(survey.id, "jsonl")))
+        kinds = [row["record"] for row in rows]
+        assert kinds == (
+            ["survey"]
+            + ["question"] * 3
+            + ["answer"] * 3
+            + ["flow"] * 2
+            + ["response"] * 3
+            + ["response_item"] * 3
+        )
+        assert rows[0]["title"] == survey.title
+        assert rows[-1]["answer_id"] == answered_survey["answers"][0].id
+
+    def test_csv(self, answered_survey):
+        survey = answered_survey["survey"]
+        content = "".join(iter_export(survey.id, "csv", parts=("responses",)))
+        rows = list(csv.DictReader(io.StringIO(content)))
+        assert tuple(rows[0]) == COLUMNS
+        assert [row["record"] for row in rows] == ["response"] * 3 + [
+            "response_item"
+        ] * 3
+        assert rows[0]["is_complete"] == "true"
+        assert rows[0]["answer_id"] == ""
+
+    def test_output_is_chunked(self, answered_survey, monkeypatch):
+        monkeypatch.setattr(export, "EXPORT_BUFFER_SIZE", 1)
+        monkeypatch.setattr(export, "EXPORT_CHUNK_SIZE", 2)
+        chunks = list(iter_export(answered_survey["survey"].id, "jsonl"))
+        assert len(chunks) == 15
+
+    def test_api_streams(self, authenticated_client, answered_survey):
+        survey = answered_survey["survey"]
+        url = reverse("survey-export", kwargs={"survey_id": survey.id})
+        response = authenticated_client.get(url, {"output": "jsonl"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response["Content-Type"].startswith("application/x-ndjson")
+        assert "survey-" in response["Content-Disposition"]
+        content = b"".join(response.streaming_content).decode()
+        assert len(records(content)) == 15
+
+    def test_api_include(self, authenticated_client, answered_survey):
+        survey = answered_survey["survey"]
+        url = reverse("survey-export", kwargs={"survey_id": survey.id})
+        response = authenticated_client.get(url, {"include": "structure"})
+        content = b"".join(response.streaming_content).decode()
+        assert "response_item" not in content
+
+    @pytest.mark.parametrize(
+        "params", [{"output": "xml"}, {"include": "structure,secrets"}]
+    )
+    def test_api_rejects_bad_params(self, authenticated_client, survey, params):
+        url = reverse("survey-export", kwargs={"survey_id": survey.id})
+        response = authenticated_client.get(url, params)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_api_unknown_survey(self, authenticated_client):
+        url = reverse("survey-export", kwargs={"survey_id": 999999})
+        assert authenticated_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_command(self, answered_survey, tmp_path):
+        survey = answered_survey["survey"]
+        output = tmp_path / "export.jsonl"
+        call_command(
+            "export_survey",
+            survey.id,
+            "--format",
+            "jsonl",
+            "--include",
+            "responses",
+            "--output",
+            str(output),
+        )
+        assert len(records(output.read_text(encoding="utf-8"))) == 6
+
+    def test_command_unknown_survey(self):
+        with pytest.raises(CommandError):
+            call_command("export_survey", 999999)
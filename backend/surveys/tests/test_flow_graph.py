@@ -0,0 +1,254 @@
+import pytest
+from model_bakery import baker
+
+from surveys.constants import (
+    FLOW_RESOLUTION_FIRST_MATCH,
+    FLOW_RESOLUTION_LOWEST_ORDER,
+    FLOW_TYPE_ANY_ANSWER,
+    FLOW_TYPE_SPECIFIC_ANSWER,
+    QUESTION_TYPE_MULTIPLE,
+)
+from surveys.flow_graph import FlowGraph, get_flow_graph
+from surveys.graph_analysis import adjacency
+from surveys.models import Answer, Question, QuestionFlow
+from surveys.versions import publish_survey
+
+
+@pytest.fixture
+def multiple_choice(survey):
+    """Вопрос с тремя ответами, каждый из которых ведёт к своему вопросу"""
+    question = baker.make(
+        Question, survey=survey, question_type=QUESTION_TYPE_MULTIPLE, order=1
+    )
+    answers = [
+        baker.make(Answer, question=question, order=order) for order in (1, 2, 3)
+    ]
+    targets = [baker.make(Question, survey=survey, order=order) for order in (4, 3, 2)]
+    flows = [
+        baker.make(
+            QuestionFlow,
+            source_question=question,
+            target_question=target,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=answer,
+            priority=priority,
+        )
+        for answer, target, priority in zip(answers, targets, (2, 0, 1))
+    ]
+    return {
+        "question": question,
+        "answers": answers,
+        "targets": targets,
+        "flows": flows,
+    }
+
+
+@pytest.mark.django_db
+class TestFlowGraph:
+    def test_build_uses_three_queries(
+        self, branching_survey, django_assert_num_queries
+    ):
+        with django_assert_num_queries(3):
+            FlowGraph.build(branching_survey["survey"].id)
+
+    def test_questions_and_answers_are_ordered(self, branching_survey):
+        graph = FlowGraph.build(branching_survey["survey"].id)
+        first, second, third = branching_survey["questions"]
+        assert graph.question_ids == (first.id, second.id, third.id)
+        assert graph.first_question_id == first.id
+        assert [a.id for a in graph.questions[first.id].answers] == [
+            a.id for a in branching_survey["answers"]
+        ]
+
+    def test_specific_answer_edge_wins(self, branching_survey):
+        graph = FlowGraph.build(branching_survey["survey"].id)
+        first, second, _ = branching_survey["questions"]
+        yes, _, _ = branching_survey["answers"]
+        assert graph.next_question(first.id, [yes.id]) == second.id
+
+    def test_any_answer_edge_is_fallback(self, branching_survey):
+        graph = FlowGraph.build(branching_survey["survey"].id)
+        first, _, third = branching_survey["questions"]
+        _, no, _ = branching_survey["answers"]
+        assert graph.next_question(first.id, [no.id]) == third.id
+        assert graph.next_question(first.id) == third.id
+
+    def test_no_outgoing_edges_ends_survey(self, branching_survey):
+        graph = FlowGraph.build(branching_survey["survey"].id)
+        _, second, _ = branching_survey["questions"]
+        assert graph.next_question(second.id) is None
+
+    def test_answer_of_other_question_is_ignored(self, branching_survey):
+        graph = FlowGraph.build(branching_survey["survey"].id)
+        _, second, third = branching_survey["questions"]
+        yes, _, _ = branching_survey["answers"]
+        assert graph.next_question(second.id, [yes.id]) is None
+
+    def test_graph_is_immutable(self, branching_survey):
+        graph = FlowGraph.build(branching_survey["survey"].id)
+        with pytest.raises(AttributeError):
+            graph.survey_id = 0
+
+
+@pytest.mark.django_db
+class TestMultiAnswerRouting:
+    def resolve(self, multiple_choice, *indices):
+        graph = get_flow_graph(multiple_choice["question"].survey_id)
+        answers = multiple_choice["answers"]
+        return graph.next_question(
+            multiple_choice["question"].id, [answers[i].id for i in indices]
+        )
+
+    def set_resolution(self, multiple_choice, resolution):
+        question = multiple_choice["question"]
+        question.flow_resolution = resolution
+        question.save()
+
+    def test_priority(self, multiple_choice):
+        targets = multiple_choice["targets"]
+        assert self.resolve(multiple_choice, 0, 1, 2) == targets[1].id
+        assert self.resolve(multiple_choice, 2, 0) == targets[2].id
+        assert self.resolve(multiple_choice, 0) == targets[0].id
+
+    def test_order_of_answer_ids_does_not_matter(self, multiple_choice):
+        assert self.resolve(multiple_choice, 0, 2) == self.resolve(
+            multiple_choice, 2, 0
+        )
+
+    def test_equal_priority_prefers_lowest_order_target(self, multiple_choice):
+        QuestionFlow.objects.update(priority=0)
+        targets = multiple_choice["targets"]
+        assert self.resolve(multiple_choice, 0, 1, 2) == targets[2].id
+
+    def test_first_match(self, multiple_choice):
+        self.set_resolution(multiple_choice, FLOW_RESOLUTION_FIRST_MATCH)
+        targets = multiple_choice["targets"]
+        assert self.resolve(multiple_choice, 2, 1) == targets[1].id
+        assert self.resolve(multiple_choice, 2, 0) == targets[0].id
+
+    def test_lowest_order_target(self, multiple_choice):
+        self.set_resolution(multiple_choice, FLOW_RESOLUTION_LOWEST_ORDER)
+        targets = multiple_choice["targets"]
+        assert self.resolve(multiple_choice, 0, 1, 2) == targets[2].id
+        assert self.resolve(multiple_choice, 0, 1) == targets[1].id
+
+    def test_one_answer_with_several_flows(self, multiple_choice):
+        question = multiple_choice["question"]
+        first_answer = multiple_choice["answers"][0]
+        urgent = baker.make(Question, survey=question.survey, order=10)
+        baker.make(
+            QuestionFlow,
+            source_question=question,
+            target_question=urgent,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=first_answer,
+        )
+        assert self.resolve(multiple_choice, 0) == urgent.id
+
+    def test_any_answer_fallback(self, multiple_choice):
+        question = multiple_choice["question"]
+        other = baker.make(Answer, question=question, order=4)
+        target = multiple_choice["targets"][0]
+        baker.make(
+            QuestionFlow,
+            source_question=question,
+            target_question=target,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+        graph = get_flow_graph(question.survey_id)
+        assert graph.next_question(question.id, [other.id]) == target.id
+
+    def test_fallback_to_next_question(self, multiple_choice):
+        question = multiple_choice["question"]
+        other = baker.make(Answer, question=question, order=4)
+        graph = get_flow_graph(question.survey_id)
+        assert graph.next_question(question.id, [other.id]) is None
+
+        question.fallback_to_next = True
+        question.save()
+        graph = get_flow_graph(question.survey_id)
+        # Следующий по порядку вопрос — цель с порядком 2.
+        following = multiple_choice["targets"][2]
+        assert graph.next_question(question.id, [other.id]) == following.id
+        assert graph.resolve(question.id, [other.id]) is None
+        assert following.id in adjacency(graph)[question.id]
+
+        last = multiple_choice["targets"][0]
+        last.fallback_to_next = True
+        last.save()
+        assert get_flow_graph(question.survey_id).next_question(last.id) is None
+
+    def test_resolution_does_not_query(
+        self, multiple_choice, django_assert_num_queries
+    ):
+        self.resolve(multiple_choice, 0)
+        with django_assert_num_queries(0):
+            self.resolve(multiple_choice, 0, 1, 2)
+
+    def test_routing_table(self, multiple_choice):
+        question = multiple_choice["question"]
+        answers = multiple_choice["answers"]
+        entry = get_flow_graph(question.survey_id).routing_table()[question.id]
+        assert entry["order"] == [answers[1].id, answers[2].id, answers[0].id]
+
+    def test_version_keeps_routing(self, multiple_choice):
+        question = multiple_choice["question"]
+        question.flow_resolution = FLOW_RESOLUTION_FIRST_MATCH
+        question.fallback_to_next = True
+        question.save()
+        live = get_flow_graph(question.survey_id)
+        graph = publish_survey(question.survey_id).graph
+        assert graph.routing_table() == live.routing_table()
+        assert graph.questions[question.id] == live.questions[question.id]
+
+
+@pytest.mark.django_db
+class TestFlowGraphCache:
+    def test_resolution_does_not_query(
+        self, branching_survey, django_assert_num_queries
+    ):
+        survey_id = branching_survey["survey"].id
+        first, second, _ = branching_survey["questions"]
+        yes, _, _ = branching_survey["answers"]
+        get_flow_graph(survey_id)
+        with django_assert_num_queries(0):
+            assert get_flow_graph(survey_id).next_question(first.id, [yes.id]) == (
+                second.id
+            )
+
+    def test_flow_change_invalidates_graph(self, branching_survey):
+        survey_id = branching_survey["survey"].id
+        first, second, third = branching_survey["questions"]
+        graph = get_flow_graph(survey_id)
+        assert graph.next_question(second.id) is None
+
+        baker.make(
+            QuestionFlow,
+            source_question=second,
+            target_question=third,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+        assert get_flow_graph(survey_id) is not graph
+        assert get_flow_graph(survey_id).next_question(second.id) == third.id
+
+    def test_answer_delete_invalidates_graph(self, branching_survey):
+        survey_id = branching_survey["survey"].id
+        first, _, third = branching_survey["questions"]
+        yes, _, _ = branching_survey["answers"]
+        get_flow_graph(survey_id)
+
+        yes.delete()
+        graph = get_flow_graph(survey_id)
+        assert len(graph.questions[first.id].answers) == 2
+        assert graph.next_question(first.id, [yes.id]) == third.id
+
+    def test_question_change_invalidates_graph(self, branching_survey):
+        survey_id = branching_survey["survey"].id
+        _, second, _ = branching_survey["questions"]
+        get_flow_graph(survey_id)
+
+        second.text = "Обновлённый текст"
+        second.save()
+        assert get_flow_graph(survey_id).questions[second.id].text == (
+            "Обновлённый текст"
+        )
@@ -0,0 +1,120 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, QUESTION_TYPE_SINGLE
+from surveys.flow_graph import FlowEdge, FlowGraph, QuestionNode
+from surveys.graph_analysis import analyze
+from surveys.models import Question, QuestionFlow
+
+
+def make_graph(question_count, pairs):
+    questions = [
+        QuestionNode(
+            id=number,
+            text=str(number),
+            question_type=QUESTION_TYPE_SINGLE,
+            order=number,
+            is_required=True,
+            answers=(),
+        )
+        for number in range(1, question_count + 1)
+    ]
+    edges = [
+        FlowEdge(
+            id=index,
+            source_question_id=source,
+            target_question_id=target,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+            source_answer_id=None,
+        )
+        for index, (source, target) in enumerate(pairs, start=1)
+    ]
+    return FlowGraph(1, questions, edges)
+
+
+class TestAnalyze:
+    def test_acyclic_graph(self):
+        result = analyze(make_graph(5, [(1, 2), (1, 3), (2, 4), (3, 4)]))
+        assert result.cycles == []
+        assert result.unreachable == [5]
+        assert result.dead_ends == [4, 5]
+        assert result.longest_path == [1, 2, 4]
+
+    def test_cycles(self):
+        result = analyze(make_graph(5, [(1, 2), (2, 3), (3, 2), (3, 4), (4, 4)]))
+        assert result.cycles == [[2, 3], [4]]
+        assert result.has_cycles
+        assert result.dead_ends == [5]
+
+    def test_empty_graph(self):
+        result = analyze(make_graph(0, []))
+        assert result.first_question_id is None
+        assert result.longest_path == []
+
+    def test_long_chain_without_recursion_limit(self):
+        count = 50_000
+        pairs = [(number, number + 1) for number in range(1, count)]
+        pairs.append((count, 1))
+        result = analyze(make_graph(count, pairs))
+        assert len(result.cycles) == 1
+        assert len(result.cycles[0]) == count
+        assert result.unreachable == []
+
+    def test_long_acyclic_path(self):
+        count = 20_000
+        pairs = [(number, number + 1) for number in range(1, count)]
+        result = analyze(make_graph(count, pairs))
+        assert len(result.longest_path) == count
+
+
+@pytest.fixture
+def cyclic_survey(survey):
+    first, second, third = (
+        baker.make(Question, survey=survey, order=order) for order in range(3)
+    )
+    for source, target in ((first, second), (second, first)):
+        baker.make(
+            QuestionFlow,
+            source_question=source,
+            target_question=target,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+    return survey, (first, second, third)
+
+
+@pytest.mark.django_db
+class TestSurveyAnalysis:
+    def test_api(self, authenticated_client, cyclic_survey):
+        survey, (first, second, third) = cyclic_survey
+        url = reverse("survey-analysis", kwargs={"survey_id": survey.id})
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["cycles"] == [[first.id, second.id]]
+        assert response.data["unreachable"] == [third.id]
+
+    def test_api_unknown_survey(self, authenticated_client):
+        url = reverse("survey-analysis", kwargs={"survey_id": 999999})
+        assert authenticated_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_command(self, cyclic_survey):
+        survey, (first, second, _) = cyclic_survey
+        out = StringIO()
+        call_command("analyze_survey", survey.id, "--json", stdout=out)
+        assert json.loads(out.getvalue())["cycles"] == [[first.id, second.id]]
+
+    def test_command_fail_on_cycles(self, cyclic_survey):
+        survey, _ = cyclic_survey
+        with pytest.raises(CommandError):
+            call_command(
+                "analyze_survey", survey.id, "--fail-on-cycles", stdout=StringIO()
+            )
+
+    def test_command_unknown_survey(self):
+        with pytest.raises(CommandError):
+            call_command("analyze_survey", 999999)
@@ -0,0 +1,76 @@
+import re
+
+import pytest
+from django.db import connection
+
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.flow_graph import FlowGraph
+from surveys.models import Answer, Question, QuestionFlow, ResponseItem
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="разбирается план запроса SQLite"
+)
+
+
+def plan(queryset):
+    return queryset.explain()
+
+
+def full_scans(queryset):
+    """Таблицы, которые план читает целиком, без индекса"""
+    return re.findall(r"\bSCAN (\w+)(?!\w| USING)", plan(queryset))
+
+
+HOT_QUERIES = {
+    "questions of survey": (
+        lambda: Question.objects.filter(survey_id=1).order_by("order", "id"),
+        "question_survey_order",
+    ),
+    "answers of question": (
+        lambda: Answer.objects.filter(question_id=1).order_by("order", "id"),
+        "answer_question_order",
+    ),
+    "answers of survey": (
+        lambda: Answer.objects.filter(question__survey_id=1).order_by("order", "id"),
+        "answer_question_order",
+    ),
+    "flows leaving question": (
+        lambda: QuestionFlow.objects.filter(source_question_id=1),
+        "flow_source_type_answer",
+    ),
+    "flow for question and answer": (
+        lambda: QuestionFlow.objects.filter(
+            source_question_id=1,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer_id=2,
+        ),
+        "flow_source_type_answer",
+    ),
+    "any-answer flow of question": (
+        lambda: QuestionFlow.objects.filter(
+            source_question_id=1, relationship_type=FLOW_TYPE_ANY_ANSWER
+        ),
+        "flow_source_type_answer",
+    ),
+    "flows entering question": (
+        lambda: QuestionFlow.objects.filter(target_question_id=1),
+        "flow_target_source",
+    ),
+    "flows of survey": (
+        lambda: FlowGraph.edge_rows(1),
+        "flow_source_type_answer",
+    ),
+    "items of response": (
+        lambda: ResponseItem.objects.filter(response_id=1),
+        "response_item_question",
+    ),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(name):
+    make_queryset, index = HOT_QUERIES[name]
+    queryset = make_queryset()
+    assert index in plan(queryset), plan(queryset)
+    assert full_scans(queryset) == [], plan(queryset)
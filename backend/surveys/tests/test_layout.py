@@ -0,0 +1,188 @@
+import json
+
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys import layout
+from surveys.constants import FLOW_TYPE_ANY_ANSWER
+from surveys.flow_graph import AnswerNode, FlowEdge, FlowGraph, QuestionNode
+from surveys.layout import compute_layout
+from surveys.models import Question, QuestionFlow
+from surveys.versions import publish_survey
+
+
+def make_graph(count, pairs):
+    questions = [
+        QuestionNode(
+            id=number,
+            text=f"Вопрос {number}",
+            question_type="single",
+            order=number,
+            is_required=True,
+            answers=(AnswerNode(id=number * 10, text=f"Ответ {number}", order=1),),
+        )
+        for number in range(1, count + 1)
+    ]
+    edges = [
+        FlowEdge(
+            id=index,
+            source_question_id=source,
+            target_question_id=target,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+            source_answer_id=None,
+        )
+        for index, (source, target) in enumerate(pairs)
+    ]
+    return FlowGraph(1, questions, edges)
+
+
+def node_layers(data):
+    return dict(zip(data["nodes"]["id"], data["nodes"]["layer"]))
+
+
+class TestComputeLayout:
+    def test_longest_path_layers(self):
+        data = compute_layout(make_graph(4, [(1, 2), (2, 3), (1, 3), (3, 4)]))
+        assert node_layers(data) == {1: 0, 2: 1, 3: 2, 4: 3}
+        assert data["layers"] == [1, 1, 1, 1]
+
+    def test_cycle_takes_consecutive_layers(self):
+        data = compute_layout(make_graph(4, [(1, 2), (2, 3), (3, 2), (3, 4)]))
+        assert node_layers(data) == {1: 0, 2: 1, 3: 2, 4: 3}
+
+    def test_edges_point_down_outside_cycles(self):
+        pairs = [(1, 3), (2, 3), (3, 4), (3, 5), (1, 5)]
+        data = compute_layout(make_graph(5, pairs))
+        layers = data["nodes"]["layer"]
+        for source, target in zip(data["edges"]["source"], data["edges"]["target"]):
+            assert layers[target] > layers[source]
+
+    def test_barycenter_removes_crossing(self):
+        # 1 -> 4, 2 -> 3: без упорядочивания рёбра слоёв пересекаются.
+        data = compute_layout(make_graph(4, [(1, 4), (2, 3)]))
+        position = dict(zip(data["nodes"]["id"], data["nodes"]["position"]))
+        assert (position[1] < position[2]) == (position[4] < position[3])
+
+    def test_columnar_format(self):
+        data = compute_layout(make_graph(3, [(1, 2), (2, 3)]))
+        ids = data["nodes"]["id"]
+        assert [
+            (ids[source], ids[target])
+            for source, target in zip(data["edges"]["source"], data["edges"]["target"])
+        ] == [(1, 2), (2, 3)]
+        assert data["edges"]["label"] == [None, None]
+        assert len({len(column) for column in data["nodes"].values()}) == 1
+
+
+@pytest.mark.django_db
+class TestSurveyLayoutAPI:
+    def url(self, survey):
+        return reverse("survey-layout", kwargs={"survey_id": survey.id})
+
+    def test_layout(self, authenticated_client, branching_survey):
+        first, second, third = branching_survey["questions"]
+        yes = branching_survey["answers"][0]
+        response = authenticated_client.get(self.url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_200_OK
+        data = json.loads(response.content)
+        assert data["version"] is None
+        assert node_layers(data) == {first.id: 0, second.id: 1, third.id: 1}
+        ids = data["nodes"]["id"]
+        labels = {
+            ids[target]: (answer, label)
+            for target, answer, label in zip(
+                data["edges"]["target"], data["edges"]["answer"], data["edges"]["label"]
+            )
+        }
+        assert labels == {second.id: (yes.id, yes.text), third.id: (None, None)}
+
+    def test_unauthenticated(self, api_client, branching_survey):
+        response = api_client.get(self.url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_not_modified(self, authenticated_client, branching_survey):
+        url = self.url(branching_survey["survey"])
+        etag = authenticated_client.get(url)["ETag"]
+        response = authenticated_client.get(url, headers={"if-none-match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_computed_once_per_structure(
+        self, authenticated_client, branching_survey, monkeypatch
+    ):
+        calls = []
+        compute = layout.compute_layout
+        monkeypatch.setattr(
+            layout, "compute_layout", lambda graph: calls.append(1) or compute(graph)
+        )
+        survey = branching_survey["survey"]
+        authenticated_client.get(self.url(survey))
+        authenticated_client.get(self.url(survey))
+        assert len(calls) == 1
+
+        second, third = branching_survey["questions"][1:]
+        baker.make(
+            QuestionFlow,
+            source_question=second,
+            target_question=third,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+        data = json.loads(authenticated_client.get(self.url(survey)).content)
+        assert len(calls) == 2
+        assert node_layers(data)[third.id] == 2
+
+    def test_version(self, authenticated_client, branching_survey):
+        survey = branching_survey["survey"]
+        publish_survey(survey.id)
+        baker.make(Question, survey=survey, order=4)
+
+        response = authenticated_client.get(self.url(survey), {"version": 1})
+        data = json.loads(response.content)
+        assert data["version"] == 1
+        assert len(data["nodes"]["id"]) == 3
+
+        response = authenticated_client.get(self.url(survey), {"version": 2})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_unknown_survey(self, authenticated_client):
+        response = authenticated_client.get(
+            reverse("survey-layout", kwargs={"survey_id": 999999})
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestAdminGraphPage:
+    def test_page(self, admin_client, branching_survey):
+        survey = branching_survey["survey"]
+        change = admin_client.get(
+            reverse("admin:surveys_survey_change", args=[survey.pk])
+        )
+        graph_url = reverse("admin:surveys_survey_graph", args=[survey.pk])
+        assert graph_url in change.content.decode()
+
+        page = admin_client.get(graph_url)
+        assert page.status_code == 200
+        layout_url = reverse("admin:surveys_survey_graph_layout", args=[survey.pk])
+        assert f'data-layout-url="{layout_url}"' in page.content.decode()
+
+        response = admin_client.get(layout_url)
+        assert len(json.loads(response.content)["nodes"]["id"]) == 3
+
+    def test_unknown_survey(self, admin_client):
+        response = admin_client.get(
+            reverse("admin:surveys_survey_graph", args=[999999])
+        )
+        assert response.status_code == 404
+        response = admin_client.get(
+            reverse("admin:surveys_survey_graph_layout", args=[999999])
+        )
+        assert response.status_code == 404
+
+    def test_requires_staff(self, client, branching_survey):
+        survey = branching_survey["survey"]
+        response = client.get(
+            reverse("admin:surveys_survey_graph_layout", args=[survey.pk])
+        )
+        assert response.status_code == 302
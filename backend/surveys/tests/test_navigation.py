@@ -0,0 +1,138 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.constants import (
+    FLOW_TYPE_SPECIFIC_ANSWER,
+    QUESTION_TYPE_MULTIPLE,
+    QUESTION_TYPE_TEXT,
+)
+from surveys.models import Answer, Question, QuestionFlow
+
+
+@pytest.mark.django_db
+class TestSurveyNavigationAPI:
+    def url(self, survey):
+        return reverse("survey-next", kwargs={"survey_id": survey.id})
+
+    def test_unauthenticated(self, api_client, branching_survey):
+        response = api_client.get(self.url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_unknown_survey(self, authenticated_client):
+        url = reverse("survey-next", kwargs={"survey_id": 999999})
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_first_question_with_ordered_answers(
+        self, authenticated_client, branching_survey
+    ):
+        response = authenticated_client.get(self.url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_200_OK
+        first = branching_survey["questions"][0]
+        assert response.data["question"]["id"] == first.id
+        assert [a["id"] for a in response.data["question"]["answers"]] == [
+            a.id for a in branching_survey["answers"]
+        ]
+        assert response.data["is_finished"] is False
+
+    def test_specific_answer(self, authenticated_client, branching_survey):
+        first, second, _ = branching_survey["questions"]
+        yes = branching_survey["answers"][0]
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]),
+            {"question": first.id, "answers": yes.id},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["question"]["id"] == second.id
+
+    def test_any_answer(self, authenticated_client, branching_survey):
+        first, _, third = branching_survey["questions"]
+        no = branching_survey["answers"][1]
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]),
+            {"question": first.id, "answers": no.id},
+        )
+        assert response.data["question"]["id"] == third.id
+
+    def test_finished(self, authenticated_client, branching_survey):
+        third = branching_survey["questions"][2]
+        third.is_required = False
+        third.save()
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]), {"question": third.id}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"question": None, "is_finished": True}
+
+    def test_multiple_answers(self, authenticated_client, survey):
+        question = baker.make(
+            Question, survey=survey, question_type=QUESTION_TYPE_MULTIPLE, order=1
+        )
+        first, second = baker.make(Answer, question=question, _quantity=2)
+        target = baker.make(Question, survey=survey, order=2)
+        baker.make(
+            QuestionFlow,
+            source_question=question,
+            target_question=target,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=second,
+        )
+        response = authenticated_client.get(
+            self.url(survey),
+            {"question": question.id, "answers": f"{first.id},{second.id}"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["question"]["id"] == target.id
+
+    def test_single_choice_rejects_several_answers(
+        self, authenticated_client, branching_survey
+    ):
+        first = branching_survey["questions"][0]
+        yes, no, _ = branching_survey["answers"]
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]),
+            {"question": first.id, "answers": [yes.id, no.id]},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_foreign_answer_rejected(self, authenticated_client, branching_survey):
+        second = branching_survey["questions"][1]
+        yes = branching_survey["answers"][0]
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]),
+            {"question": second.id, "answers": yes.id},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_required_answer_missing(self, authenticated_client, branching_survey):
+        first = branching_survey["questions"][0]
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]), {"question": first.id}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_text_question_rejects_answers(self, authenticated_client, survey):
+        question = baker.make(Question, survey=survey, question_type=QUESTION_TYPE_TEXT)
+        other = baker.make(Answer, question=question)
+        response = authenticated_client.get(
+            self.url(survey), {"question": question.id, "answers": other.id}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_invalid_ids(self, authenticated_client, branching_survey):
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]), {"question": "abc"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_warm_request_does_not_query_routing(
+        self, authenticated_client, branching_survey, django_assert_num_queries
+    ):
+        url = self.url(branching_survey["survey"])
+        first = branching_survey["questions"][0]
+        yes = branching_survey["answers"][0]
+        authenticated_client.get(url)
+        with django_assert_num_queries(0):
+            authenticated_client.get(url, {"question": first.id, "answers": yes.id})
@@ -0,0 +1,191 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.cache import bump_questions
+from surveys.constants import FLOW_TYPE_ANY_ANSWER
+from surveys.models import Question, QuestionFlow
+from surveys.reachability import ReachabilityIndex, fallback_pairs, get_reachability
+
+
+class TestReachabilityIndex:
+    def test_transitive_reachability(self):
+        index = ReachabilityIndex([1, 2, 3, 4], [(1, 2), (2, 3)])
+        assert index.can_reach(1, 3)
+        assert not index.can_reach(3, 1)
+        assert not index.can_reach(1, 4)
+        assert index.would_create_cycle(3, 1)
+        assert not index.would_create_cycle(1, 4)
+
+    def test_add_edge_updates_closure(self):
+        index = ReachabilityIndex([1, 2, 3, 4], [(1, 2), (3, 4)])
+        index.add_edge(2, 3)
+        assert index.can_reach(1, 4)
+        assert index.would_create_cycle(4, 1)
+
+    def test_remove_edge(self):
+        index = ReachabilityIndex([1, 2, 3], [(1, 2), (2, 3), (1, 3)])
+        index.remove_edge(2, 3)
+        assert index.can_reach(1, 3)
+        assert not index.can_reach(2, 3)
+
+    def test_parallel_edges_are_counted(self):
+        # Связи «любой ответ» и «конкретный ответ» дают одну и ту же пару.
+        index = ReachabilityIndex([1, 2], [(1, 2), (1, 2)])
+        index.remove_edge(1, 2)
+        assert index.can_reach(1, 2)
+        index.remove_edge(1, 2)
+        assert not index.can_reach(1, 2)
+
+    def test_cycle_pairs(self):
+        index = ReachabilityIndex([1, 2, 3], [(1, 2)])
+        assert index.cycle_pairs([(2, 3), (3, 1)]) == {(2, 3), (3, 1)}
+        assert index.cycle_pairs([(2, 3)]) == set()
+        assert index.cycle_pairs([(2, 1)], removed=[(1, 2)]) == set()
+
+    def test_fallbacks(self):
+        pairs = fallback_pairs([(1, True), (2, False), (3, True)])
+        assert pairs == [(1, 2)]
+        index = ReachabilityIndex([1, 2, 3], [], pairs)
+        assert index.would_create_cycle(2, 1)
+        # Связь с той же парой не убирает переход по порядку.
+        index.add_edge(1, 2)
+        index.remove_edge(1, 2)
+        assert index.can_reach(1, 2)
+
+    def test_long_chain(self):
+        count = 20_000
+        index = ReachabilityIndex(
+            range(count), [(number, number + 1) for number in range(count - 1)]
+        )
+        assert index.would_create_cycle(count - 1, 0)
+        assert not index.would_create_cycle(0, count - 1)
+
+
+@pytest.fixture
+def chain(survey):
+    questions = baker.make(Question, survey=survey, _quantity=3)
+    for source, target in zip(questions, questions[1:]):
+        baker.make(
+            QuestionFlow,
+            source_question=source,
+            target_question=target,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+    return questions
+
+
+def flow_data(source, target):
+    return {
+        "source_question": source.id,
+        "target_question": target.id,
+        "relationship_type": FLOW_TYPE_ANY_ANSWER,
+    }
+
+
+@pytest.mark.django_db
+class TestCycleValidation:
+    def test_api_rejects_cycle(self, authenticated_client, chain):
+        response = authenticated_client.post(
+            reverse("questionflow-list"), flow_data(chain[-1], chain[0]), format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "non_field_errors" in response.data
+
+    def test_index_follows_saved_flows(self, authenticated_client, chain):
+        first, second, third = chain
+        get_reachability(first.survey_id)
+        fourth = baker.make(Question, survey=first.survey)
+        response = authenticated_client.post(
+            reverse("questionflow-list"), flow_data(third, fourth), format="json"
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert get_reachability(first.survey_id).can_reach(first.id, fourth.id)
+
+        QuestionFlow.objects.filter(source_question=second).delete()
+        response = authenticated_client.post(
+            reverse("questionflow-list"), flow_data(third, first), format="json"
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+    def test_update_can_reverse_flow(self, authenticated_client, chain):
+        first, second, _ = chain
+        flow = QuestionFlow.objects.get(source_question=first)
+        response = authenticated_client.patch(
+            reverse("questionflow-detail", args=[flow.id]),
+            {"source_question": second.id, "target_question": first.id},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_bulk_rejects_cycle_within_batch(self, authenticated_client, survey):
+        first, second = baker.make(Question, survey=survey, _quantity=2)
+        response = authenticated_client.post(
+            reverse("questionflow-bulk"),
+            [flow_data(first, second), flow_data(second, first)],
+            format="json",
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not QuestionFlow.objects.exists()
+
+    def test_rejects_other_survey(self, authenticated_client, source_question):
+        other = baker.make(Question)
+        response = authenticated_client.post(
+            reverse("questionflow-list"),
+            flow_data(source_question, other),
+            format="json",
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "target_question" in response.data
+
+    def test_change_in_other_process(self, chain):
+        first, _second, third = chain
+        get_reachability(first.survey_id)
+        # Другой процесс сохраняет связь: его сигналы меняют только метку
+        # опроса в общем кеше, а не индекс этого процесса.
+        QuestionFlow.objects.bulk_create(
+            [
+                QuestionFlow(
+                    source_question=third,
+                    target_question=first,
+                    relationship_type=FLOW_TYPE_ANY_ANSWER,
+                )
+            ]
+        )
+        bump_questions([third.id])
+        assert get_reachability(first.survey_id).can_reach(third.id, first.id)
+
+    def test_single_check_is_cached(self, chain, django_assert_num_queries):
+        index = get_reachability(chain[0].survey_id)
+        with django_assert_num_queries(0):
+            assert get_reachability(chain[0].survey_id) is index
+
+    def test_fallback_closes_cycle(self, authenticated_client, survey):
+        first = baker.make(Question, survey=survey, order=1, fallback_to_next=True)
+        second = baker.make(Question, survey=survey, order=2)
+        response = authenticated_client.post(
+            reverse("questionflow-list"), flow_data(second, first), format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "non_field_errors" in response.data
+
+    def test_fallback_changes_reset_index(self, authenticated_client, survey):
+        first = baker.make(Question, survey=survey, order=1)
+        second = baker.make(Question, survey=survey, order=2)
+        assert not get_reachability(survey.id).can_reach(first.id, second.id)
+
+        first.fallback_to_next = True
+        first.save()
+        assert get_reachability(survey.id).can_reach(first.id, second.id)
+
+        third = baker.make(Question, survey=survey, order=0)
+        first.order = 3
+        first.save()
+        index = get_reachability(survey.id)
+        assert not index.can_reach(first.id, second.id)
+        assert not index.can_reach(third.id, first.id)
+        response = authenticated_client.post(
+            reverse("questionflow-list"), flow_data(second, first), format="json"
+        )
+        assert response.status_code == status.HTTP_201_CREATED
@@ -0,0 +1,259 @@
+import pytest
+from django.core import signing
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from surveys.models import Question, Response, Survey
+from surveys.respondents import (
+    RESPONDENT_TOKEN_SALT,
+    dump_token,
+    load_token,
+    start_session,
+)
+from surveys.versions import publish_survey
+
+
+def sessions_url(survey):
+    return reverse("survey-sessions", kwargs={"survey_id": survey.id})
+
+
+def next_url(survey):
+    return reverse("survey-next", kwargs={"survey_id": survey.id})
+
+
+def respondent_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Respondent {token}")
+    return client
+
+
+@pytest.fixture
+def started(api_client, branching_survey):
+    response = api_client.post(sessions_url(branching_survey["survey"]))
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.data
+
+
+class TestRespondentToken:
+    def test_round_trip(self):
+        respondent = start_session(1, 2, 3)
+        assert load_token(dump_token(respondent)) == respondent
+
+    def test_sessions_are_unique(self):
+        assert start_session(1, None, 3).session != start_session(1, None, 3).session
+
+    def test_tampered(self):
+        token = dump_token(start_session(1, None, 3))
+        with pytest.raises(signing.BadSignature):
+            load_token(token[:-1] + ("A" if token[-1] != "A" else "B"))
+
+    def test_expired(self, settings):
+        settings.SURVEYS_RESPONDENT_TOKEN_MAX_AGE = -1
+        with pytest.raises(signing.SignatureExpired):
+            load_token(dump_token(start_session(1, None, 3)))
+
+    def test_bad_content(self):
+        token = signing.dumps(["x"], salt=RESPONDENT_TOKEN_SALT)
+        with pytest.raises(signing.BadSignature):
+            load_token(token)
+
+
+@pytest.mark.django_db
+class TestSurveySessionAPI:
+    def test_start(self, started, branching_survey):
+        assert started["question"]["id"] == branching_survey["questions"][0].id
+        assert started["is_finished"] is False
+        assert "version" not in started
+        respondent = load_token(started["token"])
+        assert respondent.survey_id == branching_survey["survey"].id
+        assert respondent.session == started["session"]
+
+    def test_start_does_not_write(
+        self, api_client, branching_survey, django_assert_num_queries
+    ):
+        url = sessions_url(branching_survey["survey"])
+        api_client.post(url)
+        with django_assert_num_queries(1):
+            # Только проверка последней версии: граф уже в кеше.
+            api_client.post(url)
+
+    def test_pins_latest_version(self, api_client, branching_survey):
+        survey = branching_survey["survey"]
+        publish_survey(survey.id)
+        response = api_client.post(sessions_url(survey))
+        assert response.data["version"] == 1
+        assert load_token(response.data["token"]).version == 1
+
+    def test_empty_survey(self, api_client):
+        response = api_client.post(sessions_url(baker.make(Survey)))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestRespondentNavigation:
+    def test_step(self, started, branching_survey):
+        first, second, _third = branching_survey["questions"]
+        client = respondent_client(started["token"])
+        response = client.get(
+            next_url(branching_survey["survey"]),
+            {"question": first.id, "answers": branching_survey["answers"][0].id},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["question"]["id"] == second.id
+        respondent = load_token(response.data["token"])
+        assert respondent.question == second.id
+        assert respondent.session == started["session"]
+
+    def test_resume(self, started, branching_survey):
+        first, second, _third = branching_survey["questions"]
+        url = next_url(branching_survey["survey"])
+        token = (
+            respondent_client(started["token"])
+            .get(
+                url,
+                {"question": first.id, "answers": branching_survey["answers"][0].id},
+            )
+            .data["token"]
+        )
+
+        response = respondent_client(token).get(url)
+        assert response.data["question"]["id"] == second.id
+        assert response.data["is_finished"] is False
+
+    def test_finished(self, api_client, branching_survey):
+        survey = branching_survey["survey"]
+        third = branching_survey["questions"][2]
+        third.is_required = False
+        third.save()
+        url = next_url(survey)
+        token = (
+            respondent_client(dump_token(start_session(survey.id, None, third.id)))
+            .get(url, {"question": third.id})
+            .data["token"]
+        )
+        assert load_token(token).question is None
+
+        response = respondent_client(token).get(url)
+        assert response.data == {"question": None, "is_finished": True, "token": token}
+
+        response = respondent_client(token).get(url, {"question": third.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "question" in response.data
+
+    def test_only_current_question(self, started, branching_survey):
+        first, second, third = branching_survey["questions"]
+        client = respondent_client(started["token"])
+        for question in (second, third):
+            response = client.get(
+                next_url(branching_survey["survey"]), {"question": question.id}
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert "question" in response.data
+
+        response = client.get(
+            next_url(branching_survey["survey"]),
+            {"question": first.id, "answers": branching_survey["answers"][0].id},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_uses_pinned_version(self, api_client, branching_survey):
+        survey = branching_survey["survey"]
+        publish_survey(survey.id)
+        token = api_client.post(sessions_url(survey)).data["token"]
+        baker.make(Question, survey=survey, order=0)
+
+        response = respondent_client(token).get(next_url(survey))
+        assert response.data["question"]["id"] == branching_survey["questions"][0].id
+        assert response.data["version"] == 1
+
+    def test_other_survey(self, started, survey):
+        other = baker.make(Survey)
+        response = respondent_client(started["token"]).get(next_url(other))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.parametrize("header", ["Respondent", "Respondent a b"])
+    def test_bad_header(self, branching_survey, header):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=header)
+        response = client.get(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_forged_token(self, branching_survey):
+        token = signing.dumps(
+            [branching_survey["survey"].id, None, "forged", None], salt="other"
+        )
+        response = respondent_client(token).get(next_url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response["WWW-Authenticate"] == "Token"
+
+    def test_expired_token(self, started, branching_survey, settings):
+        settings.SURVEYS_RESPONDENT_TOKEN_MAX_AGE = -1
+        response = respondent_client(started["token"]).get(
+            next_url(branching_survey["survey"])
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_warm_step_does_not_query(
+        self, started, branching_survey, django_assert_num_queries
+    ):
+        client = respondent_client(started["token"])
+        url = next_url(branching_survey["survey"])
+        client.get(url)
+        with django_assert_num_queries(0):
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_editing_is_not_allowed(self, started):
+        client = respondent_client(started["token"])
+        response = client.get(reverse("questionflow-list"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestRespondentResponses:
+    def url(self, survey):
+        return reverse("survey-responses", kwargs={"survey_id": survey.id})
+
+    def items(self, branching_survey):
+        first = branching_survey["questions"][0]
+        return [{"question": first.id, "answers": [branching_survey["answers"][0].id]}]
+
+    def test_session_from_token(self, started, branching_survey):
+        survey = branching_survey["survey"]
+        response = respondent_client(started["token"]).post(
+            self.url(survey),
+            {"session": "spoofed", "items": self.items(branching_survey)},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["session"] == started["session"]
+        assert Response.objects.get().session_key == started["session"]
+
+    def test_version_from_token(self, api_client, branching_survey):
+        survey = branching_survey["survey"]
+        publish_survey(survey.id)
+        token = api_client.post(sessions_url(survey)).data["token"]
+        publish_survey(survey.id)
+
+        response = respondent_client(token).post(
+            self.url(survey), {"items": self.items(branching_survey)}, format="json"
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Response.objects.get().version.number == 1
+
+    def test_other_survey(self, started):
+        response = respondent_client(started["token"]).post(
+            self.url(baker.make(Survey)), {"items": []}, format="json"
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_editor_needs_session(self, authenticated_client, branching_survey):
+        response = authenticated_client.post(
+            self.url(branching_survey["survey"]),
+            {"items": self.items(branching_survey)},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "session" in response.data
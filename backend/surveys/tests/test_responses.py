@@ -0,0 +1,174 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.constants import QUESTION_TYPE_MULTIPLE, QUESTION_TYPE_TEXT
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Answer, Question, Response, ResponseItem
+
+
+@pytest.fixture
+def questionnaire(survey):
+    single = baker.make(Question, survey=survey, order=1)
+    single_answers = baker.make(Answer, question=single, _quantity=2)
+    multiple = baker.make(
+        Question, survey=survey, order=2, question_type=QUESTION_TYPE_MULTIPLE
+    )
+    multiple_answers = baker.make(Answer, question=multiple, _quantity=3)
+    text = baker.make(
+        Question, survey=survey, order=3, question_type=QUESTION_TYPE_TEXT
+    )
+    return {
+        "survey": survey,
+        "questions": (single, multiple, text),
+        "single_answers": single_answers,
+        "multiple_answers": multiple_answers,
+    }
+
+
+def submission(questionnaire, session="session-1", **extra):
+    single, multiple, text = questionnaire["questions"]
+    return {
+        "session": session,
+        "items": [
+            {"question": single.id, "answers": [questionnaire["single_answers"][0].id]},
+            {
+                "question": multiple.id,
+                "answers": [a.id for a in questionnaire["multiple_answers"][:2]],
+            },
+            {"question": text.id, "text": "Свободный ответ"},
+        ],
+        **extra,
+    }
+
+
+@pytest.mark.django_db
+class TestSurveyResponseAPI:
+    def url(self, survey):
+        return reverse("survey-responses", kwargs={"survey_id": survey.id})
+
+    def test_unauthenticated(self, api_client, survey):
+        response = api_client.post(self.url(survey), {}, format="json")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_full_session(self, authenticated_client, questionnaire):
+        survey = questionnaire["survey"]
+        response = authenticated_client.post(
+            self.url(survey),
+            submission(questionnaire, is_complete=True),
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["is_complete"]
+
+        stored = Response.objects.get(pk=response.data["id"])
+        assert stored.survey_id == survey.id
+        assert stored.items.count() == 4
+        assert stored.items.get(answer__isnull=True).text == "Свободный ответ"
+
+    def test_partial_sessions_are_merged(self, authenticated_client, questionnaire):
+        survey = questionnaire["survey"]
+        single, multiple, _ = questionnaire["questions"]
+        url = self.url(survey)
+        authenticated_client.post(url, submission(questionnaire), format="json")
+
+        second_answer = questionnaire["single_answers"][1]
+        response = authenticated_client.post(
+            url,
+            {
+                "session": "session-1",
+                "is_complete": True,
+                "items": [{"question": single.id, "answers": [second_answer.id]}],
+            },
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Response.objects.count() == 1
+        stored = Response.objects.get()
+        assert stored.is_complete
+        assert list(
+            stored.items.filter(question=single).values_list("answer_id", flat=True)
+        ) == [second_answer.id]
+        assert stored.items.filter(question=multiple).count() == 2
+
+    def test_errors_are_reported_per_item(self, authenticated_client, questionnaire):
+        survey = questionnaire["survey"]
+        single, multiple, text = questionnaire["questions"]
+        response = authenticated_client.post(
+            self.url(survey),
+            {
+                "session": "session-1",
+                "items": [
+                    {
+                        "question": single.id,
+                        "answers": [a.id for a in questionnaire["single_answers"]],
+                    },
+                    {
+                        "question": multiple.id,
+                        "answers": [questionnaire["single_answers"][0].id],
+                    },
+                    {"question": text.id, "text": ""},
+                    {
+                        "question": single.id,
+                        "answers": [questionnaire["single_answers"][0].id],
+                        "text": "текст",
+                    },
+                    {"question": baker.make(Question).id},
+                ],
+            },
+            format="json",
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.data["items"]
+        assert "answers" in errors[0]
+        assert "answers" in errors[1]
+        assert "text" in errors[2]
+        assert "text" in errors[3]
+        assert "question" in errors[4]
+        assert not ResponseItem.objects.exists()
+
+    def test_duplicate_question(self, authenticated_client, questionnaire):
+        survey = questionnaire["survey"]
+        text = questionnaire["questions"][2]
+        response = authenticated_client.post(
+            self.url(survey),
+            {
+                "session": "session-1",
+                "items": [
+                    {"question": text.id, "text": "первый"},
+                    {"question": text.id, "text": "второй"},
+                ],
+            },
+            format="json",
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["items"][0] == {}
+        assert "question" in response.data["items"][1]
+
+    def test_unknown_survey(self, authenticated_client, questionnaire):
+        url = reverse("survey-responses", kwargs={"survey_id": 999999})
+        response = authenticated_client.post(
+            url, submission(questionnaire), format="json"
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_query_count_does_not_depend_on_size(
+        self, authenticated_client, survey, django_assert_max_num_queries
+    ):
+        questions = baker.make(
+            Question, survey=survey, question_type=QUESTION_TYPE_TEXT, _quantity=100
+        )
+        get_flow_graph(survey.id)
+        payload = {
+            "session": "session-1",
+            "items": [{"question": q.id, "text": "ответ"} for q in questions],
+        }
+        # Поиск и создание сессии, пакетная вставка ответов, счётчики
+        # статистики и точки сохранения.
+        with django_assert_max_num_queries(7):
+            response = authenticated_client.post(
+                self.url(survey), payload, format="json"
+            )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert ResponseItem.objects.count() == len(questions)
@@ -0,0 +1,171 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.constants import QUESTION_TYPE_TEXT
+from surveys.flow_graph import get_flow_graph
+from surveys.models import Answer, Question, Response, ResponseItem
+from surveys.responses import Submission, SubmittedItem
+from surveys.spool import ResponseSpool, flush_spool
+
+
+@pytest.fixture
+def spool(settings, tmp_path):
+    settings.SURVEYS_RESPONSE_SPOOL = tmp_path / "spool.sqlite3"
+    return ResponseSpool(settings.SURVEYS_RESPONSE_SPOOL)
+
+
+@pytest.fixture
+def questions(survey):
+    choice = baker.make(Question, survey=survey, order=1)
+    answers = baker.make(Answer, question=choice, _quantity=2)
+    text = baker.make(
+        Question, survey=survey, order=2, question_type=QUESTION_TYPE_TEXT
+    )
+    return choice, answers, text
+
+
+def submission(survey, session, items, is_complete=False):
+    return Submission(survey.id, session, tuple(items), is_complete)
+
+
+@pytest.mark.django_db
+class TestResponseSpool:
+    def test_roundtrip(self, spool, survey, questions):
+        choice, answers, text = questions
+        item = SubmittedItem(choice.id, (answers[0].id,), "")
+        spool.append(submission(survey, "s1", [item], is_complete=True))
+
+        [entry] = spool.pending(10)
+        assert entry.submission == submission(survey, "s1", [item], is_complete=True)
+        spool.acknowledge(entry.id)
+        assert spool.pending(10) == []
+
+    def test_flush_merges_sessions(self, spool, survey, questions):
+        choice, answers, text = questions
+        spool.append(
+            submission(
+                survey,
+                "s1",
+                [
+                    SubmittedItem(choice.id, (answers[0].id,), ""),
+                    SubmittedItem(text.id, (), "первый"),
+                ],
+            )
+        )
+        spool.append(
+            submission(
+                survey,
+                "s1",
+                [SubmittedItem(choice.id, (answers[1].id,), "")],
+                is_complete=True,
+            )
+        )
+        spool.append(submission(survey, "s2", [SubmittedItem(text.id, (), "другой")]))
+
+        stats = flush_spool(spool)
+        assert (stats.entries, stats.sessions, stats.items) == (3, 2, 3)
+        assert spool.pending(10) == []
+
+        first = Response.objects.get(session_key="s1")
+        assert first.is_complete
+        assert set(first.items.values_list("answer_id", "text")) == {
+            (answers[1].id, ""),
+            (None, "первый"),
+        }
+        assert Response.objects.get(session_key="s2").items.count() == 1
+
+    def test_redelivery_is_idempotent(self, spool, survey, questions):
+        choice, answers, _ = questions
+        entry = submission(
+            survey, "s1", [SubmittedItem(choice.id, (answers[0].id,), "")]
+        )
+        spool.append(entry)
+        flush_spool(spool)
+        # Сохранение прошло, но подтверждение потерялось: отправка пришла снова.
+        spool.append(entry)
+        flush_spool(spool)
+        assert Response.objects.count() == 1
+        assert ResponseItem.objects.count() == 1
+
+    def test_stale_items_are_discarded(self, spool, survey, questions):
+        choice, answers, text = questions
+        spool.append(
+            submission(
+                survey,
+                "s1",
+                [
+                    SubmittedItem(choice.id, (answers[0].id,), ""),
+                    SubmittedItem(text.id, (), "ответ"),
+                ],
+            )
+        )
+        choice.delete()
+        stats = flush_spool(spool)
+        assert stats.discarded_items == 1
+        assert list(ResponseItem.objects.values_list("question_id", flat=True)) == [
+            text.id
+        ]
+
+    def test_metrics(self, spool, survey, questions):
+        _, _, text = questions
+        spool.append(submission(survey, "s1", [SubmittedItem(text.id, (), "ответ")]))
+        assert spool.metrics()["pending"] == 1
+
+        flush_spool(spool)
+        metrics = spool.metrics()
+        assert metrics["pending"] == 0
+        assert metrics["last_entries"] == 1
+        assert metrics["flushed_items"] == 1
+
+    def test_flush_query_count_does_not_depend_on_batch(
+        self, spool, survey, questions, django_assert_max_num_queries
+    ):
+        _, _, text = questions
+        for number in range(100):
+            spool.append(
+                submission(survey, f"s{number}", [SubmittedItem(text.id, (), "ответ")])
+            )
+        get_flow_graph(survey.id)
+        # Проверки устаревших ответов, поиск и вставка сессий, вставка
+        # ответов, счётчики статистики и точки сохранения транзакции.
+        with django_assert_max_num_queries(10):
+            flush_spool(spool)
+        assert Response.objects.count() == 100
+
+
+@pytest.mark.django_db
+class TestSpooledResponseAPI:
+    def test_submission_is_spooled(
+        self, authenticated_client, spool, survey, questions
+    ):
+        _, _, text = questions
+        url = reverse("survey-responses", kwargs={"survey_id": survey.id})
+        response = authenticated_client.post(
+            url,
+            {"session": "s1", "items": [{"question": text.id, "text": "ответ"}]},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert not Response.objects.exists()
+
+        call_command("flush_response_spool", "--once", stdout=StringIO())
+        assert Response.objects.get().items.get().text == "ответ"
+
+    def test_metrics_endpoint(self, api_client, spool, django_user_model):
+        api_client.force_authenticate(baker.make(django_user_model, is_staff=True))
+        response = api_client.get(reverse("response-spool"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["pending"] == 0
+
+    def test_metrics_endpoint_requires_staff(self, authenticated_client, spool):
+        response = authenticated_client.get(reverse("response-spool"))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_command_without_spool(self):
+        with pytest.raises(CommandError):
+            call_command("flush_response_spool", "--once")
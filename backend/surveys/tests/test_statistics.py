@@ -0,0 +1,204 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.constants import (
+    FLOW_TYPE_ANY_ANSWER,
+    FLOW_TYPE_SPECIFIC_ANSWER,
+    QUESTION_TYPE_MULTIPLE,
+    QUESTION_TYPE_TEXT,
+)
+from surveys.flow_graph import get_flow_graph
+from surveys.models import (
+    AnswerStat,
+    FlowStat,
+    Question,
+    QuestionFlow,
+    QuestionStat,
+    SurveyStat,
+)
+from surveys.responses import Submission, SubmittedItem, save_response, save_responses
+from surveys.statistics import rebuild_statistics, survey_statistics
+from surveys.versions import publish_survey
+
+
+def snapshot(survey):
+    return (
+        set(SurveyStat.objects.filter(survey=survey).values_list()),
+        set(QuestionStat.objects.exclude(reached=0, completed=0).values_list()),
+        set(AnswerStat.objects.exclude(count=0).values_list()),
+        set(FlowStat.objects.exclude(taken=0).values_list()),
+    )
+
+
+def choose(question, *answers):
+    return SubmittedItem(question.id, tuple(answer.id for answer in answers), "")
+
+
+@pytest.mark.django_db
+class TestIncrementalStatistics:
+    def test_counts(self, branching_survey):
+        survey = branching_survey["survey"]
+        first, second, third = branching_survey["questions"]
+        yes, no, _ = branching_survey["answers"]
+
+        save_response(survey.id, "a", [choose(first, yes)], is_complete=True)
+        save_response(survey.id, "b", [choose(first, no)])
+        save_response(survey.id, "c", [choose(first, no)])
+
+        data = survey_statistics(get_flow_graph(survey.id))
+        assert (data["started"], data["completed"]) == (3, 1)
+        first_stats = data["questions"][0]
+        assert first_stats["reached"] == 3
+        assert first_stats["drop_off"] == 2
+        assert {a["id"]: a["count"] for a in first_stats["answers"]}[no.id] == 2
+        taken = {
+            flow["target_question"]: flow["taken"] for flow in first_stats["flows"]
+        }
+        assert taken == {second.id: 1, third.id: 2}
+
+    def test_resubmission_and_completion(self, survey):
+        single = baker.make(Question, survey=survey, order=1)
+        single_answers = baker.make("surveys.Answer", question=single, _quantity=2)
+        multiple = baker.make(
+            Question, survey=survey, order=2, question_type=QUESTION_TYPE_MULTIPLE
+        )
+        multiple_answers = baker.make("surveys.Answer", question=multiple, _quantity=3)
+        text = baker.make(
+            Question, survey=survey, order=3, question_type=QUESTION_TYPE_TEXT
+        )
+
+        save_response(survey.id, "a", [choose(single, single_answers[0])])
+        save_response(
+            survey.id, "a", [choose(multiple, *multiple_answers[:2])], is_complete=False
+        )
+        save_response(survey.id, "a", [choose(single, single_answers[1])])
+        save_responses(
+            [
+                Submission(
+                    survey.id,
+                    "a",
+                    (
+                        choose(multiple, multiple_answers[2]),
+                        SubmittedItem(text.id, (), "текст"),
+                    ),
+                    True,
+                ),
+                Submission(survey.id, "b", (choose(single, single_answers[0]),), False),
+                Submission(survey.id, "b", (choose(single, single_answers[1]),), True),
+            ]
+        )
+        save_response(survey.id, "a", [choose(single, single_answers[0])])
+
+        incremental = snapshot(survey)
+        rebuild_statistics(get_flow_graph(survey.id))
+        assert snapshot(survey) == incremental
+
+        data = survey_statistics(get_flow_graph(survey.id))
+        assert (data["started"], data["completed"]) == (2, 2)
+        counts = {
+            answer["id"]: answer["count"]
+            for question in data["questions"]
+            for answer in question["answers"]
+        }
+        assert counts[single_answers[0].id] == 1
+        assert counts[single_answers[1].id] == 1
+        assert counts[multiple_answers[0].id] == 0
+        assert counts[multiple_answers[2].id] == 1
+        assert [q["completed"] for q in data["questions"]] == [2, 1, 1]
+
+    def test_numeric_conditions(self, survey):
+        age = baker.make(
+            Question, survey=survey, order=1, question_type=QUESTION_TYPE_TEXT
+        )
+        adults, rest = baker.make(Question, survey=survey, _quantity=2)
+        adult_flow = baker.make(
+            QuestionFlow,
+            source_question=age,
+            target_question=adults,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+            condition=f"Q{age.id} >= 18",
+        )
+        rest_flow = baker.make(
+            QuestionFlow,
+            source_question=age,
+            target_question=rest,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+            priority=1,
+        )
+
+        for session, text in (("a", "42"), ("b", "7"), ("c", "много")):
+            save_response(survey.id, session, [SubmittedItem(age.id, (), text)])
+        save_response(survey.id, "b", [SubmittedItem(age.id, (), "18")])
+
+        taken = dict(FlowStat.objects.values_list("flow_id", "taken"))
+        assert taken == {adult_flow.id: 2, rest_flow.id: 1}
+        incremental = snapshot(survey)
+        rebuild_statistics(get_flow_graph(survey.id))
+        assert snapshot(survey) == incremental
+
+    def test_rebuild_uses_session_versions(self, branching_survey):
+        survey = branching_survey["survey"]
+        first, second, _third = branching_survey["questions"]
+        yes, no, _maybe = branching_survey["answers"]
+        publish_survey(survey.id)
+        save_response(survey.id, "a", [choose(first, yes)], version=1)
+        save_response(survey.id, "b", [choose(first, no)], version=1)
+
+        # В новой версии ответ «нет» ведёт по другой связи.
+        baker.make(
+            QuestionFlow,
+            source_question=first,
+            target_question=second,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=no,
+        )
+        publish_survey(survey.id)
+        incremental = snapshot(survey)
+        rebuild_statistics(get_flow_graph(survey.id))
+        assert snapshot(survey) == incremental
+
+    def test_rebuild_backfills(self, branching_survey):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        yes = branching_survey["answers"][0]
+        save_response(survey.id, "a", [choose(first, yes)], is_complete=True)
+        expected = snapshot(survey)
+
+        for model in (SurveyStat, QuestionStat, AnswerStat, FlowStat):
+            model.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_statistics", survey.id, stdout=out)
+        assert snapshot(survey) == expected
+        assert "сессий 1" in out.getvalue()
+
+    def test_rebuild_unknown_survey(self):
+        with pytest.raises(CommandError):
+            call_command("rebuild_statistics", 999999)
+
+
+@pytest.mark.django_db
+class TestSurveyStatisticsAPI:
+    def test_read(
+        self, authenticated_client, branching_survey, django_assert_num_queries
+    ):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        save_response(survey.id, "a", [choose(first, branching_survey["answers"][0])])
+        get_flow_graph(survey.id)
+
+        url = reverse("survey-statistics", kwargs={"survey_id": survey.id})
+        with django_assert_num_queries(4):
+            response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["started"] == 1
+        assert response.data["questions"][0]["reached"] == 1
+        assert response.data["questions"][1]["reached"] == 0
+
+    def test_unknown_survey(self, authenticated_client):
+        url = reverse("survey-statistics", kwargs={"survey_id": 999999})
+        assert authenticated_client.get(url).status_code == status.HTTP_404_NOT_FOUND
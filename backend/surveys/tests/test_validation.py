@@ -0,0 +1,184 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.forms import inlineformset_factory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.inlines import QuestionFlowInlineFormSet
+from surveys.models import Answer, Question, QuestionFlow
+from surveys.reachability import get_reachability
+from surveys.validation import FlowCandidate, validate_flows
+
+
+def candidate(source, target, answer=None, pk=None):
+    return FlowCandidate(
+        pk=pk,
+        source_question_id=source.id,
+        target_question_id=target.id,
+        relationship_type=FLOW_TYPE_SPECIFIC_ANSWER if answer else FLOW_TYPE_ANY_ANSWER,
+        source_answer_id=answer.id if answer else None,
+    )
+
+
+@pytest.mark.django_db
+class TestValidateFlows:
+    def test_valid_batch(self, source_question, target_question, source_answer):
+        errors = validate_flows(
+            [
+                candidate(source_question, target_question),
+                candidate(source_question, target_question, source_answer),
+            ]
+        )
+        assert errors == [{}, {}]
+
+    def test_errors(
+        self, source_question, target_question, source_answer, question_flow
+    ):
+        foreign_answer = baker.make(Answer, question=target_question)
+        errors = validate_flows(
+            [
+                candidate(source_question, target_question),
+                candidate(source_question, source_question),
+                candidate(source_question, target_question, foreign_answer),
+                candidate(source_question, target_question, source_answer),
+                candidate(source_question, target_question, source_answer),
+            ]
+        )
+        assert "non_field_errors" in errors[0]
+        assert "non_field_errors" in errors[1]
+        assert "source_answer" in errors[2]
+        assert errors[3] == {}
+        assert "non_field_errors" in errors[4]
+
+    def test_updated_flow_is_not_its_own_duplicate(self, question_flow):
+        errors = validate_flows(
+            [
+                candidate(
+                    question_flow.source_question,
+                    question_flow.target_question,
+                    pk=question_flow.pk,
+                )
+            ]
+        )
+        assert errors == [{}]
+
+    def test_query_count_is_constant(self, survey, django_assert_num_queries):
+        questions = baker.make(Question, survey=survey, _quantity=30)
+        candidates = [
+            candidate(questions[index], questions[index + 1])
+            for index in range(len(questions) - 1)
+        ]
+        # Вопросы, дубликаты и двумя запросами — индекс достижимости.
+        with django_assert_num_queries(4):
+            validate_flows(candidates)
+        with django_assert_num_queries(2):
+            validate_flows(candidates)
+
+
+@pytest.mark.django_db
+class TestQuestionFlowClean:
+    def test_clean_uses_one_query(
+        self, source_question, target_question, source_answer, django_assert_num_queries
+    ):
+        flow = QuestionFlow(
+            source_question=source_question,
+            target_question=target_question,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=source_answer,
+        )
+        get_reachability(source_question.survey_id)
+        with django_assert_num_queries(1):
+            flow.clean()
+
+    def test_clean_rejects_duplicate(self, question_flow):
+        flow = QuestionFlow(
+            source_question=question_flow.source_question,
+            target_question=question_flow.target_question,
+            relationship_type=FLOW_TYPE_ANY_ANSWER,
+        )
+        with pytest.raises(ValidationError):
+            flow.full_clean()
+
+    def test_clean_rejects_foreign_answer(self, source_question, target_question):
+        flow = QuestionFlow(
+            source_question=source_question,
+            target_question=target_question,
+            relationship_type=FLOW_TYPE_SPECIFIC_ANSWER,
+            source_answer=baker.make(Answer, question=target_question),
+        )
+        with pytest.raises(ValidationError):
+            flow.full_clean()
+
+    def test_api_rejects_duplicate(
+        self, authenticated_client, question_flow, question_flow_data
+    ):
+        response = authenticated_client.post(
+            reverse("questionflow-list"), question_flow_data, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestQuestionFlowInlineFormSet:
+    FormSet = inlineformset_factory(
+        Question,
+        QuestionFlow,
+        formset=QuestionFlowInlineFormSet,
+        fk_name="source_question",
+        fields=("relationship_type", "source_answer", "target_question"),
+        extra=0,
+    )
+
+    def make_formset(self, source, rows):
+        data = {
+            "source_relationships-TOTAL_FORMS": str(len(rows)),
+            "source_relationships-INITIAL_FORMS": "0",
+        }
+        for index, (target, answer) in enumerate(rows):
+            prefix = f"source_relationships-{index}"
+            data[f"{prefix}-target_question"] = str(target.id)
+            data[f"{prefix}-relationship_type"] = (
+                FLOW_TYPE_SPECIFIC_ANSWER if answer else FLOW_TYPE_ANY_ANSWER
+            )
+            data[f"{prefix}-source_answer"] = str(answer.id) if answer else ""
+        return self.FormSet(data, instance=source)
+
+    def validation_queries(self, source, rows):
+        formset = self.make_formset(source, rows)
+        with CaptureQueriesContext(connection) as context:
+            formset.is_valid()
+        return len(context.captured_queries)
+
+    def test_duplicates_within_batch(self, source_question, target_question):
+        formset = self.make_formset(
+            source_question, [(target_question, None), (target_question, None)]
+        )
+        assert not formset.is_valid()
+
+    def test_duplicate_of_existing_flow(self, question_flow, target_question):
+        formset = self.make_formset(
+            question_flow.source_question, [(target_question, None)]
+        )
+        assert not formset.is_valid()
+
+    def test_valid(self, source_question, target_question, source_answer):
+        formset = self.make_formset(
+            source_question,
+            [(target_question, None), (target_question, source_answer)],
+        )
+        assert formset.is_valid(), formset.errors
+
+    def test_no_per_row_validation_queries(self, survey, source_question):
+        targets = baker.make(Question, survey=survey, _quantity=20)
+        get_reachability(survey.id)
+        small = self.validation_queries(
+            source_question, [(t, None) for t in targets[:5]]
+        )
+        large = self.validation_queries(source_question, [(t, None) for t in targets])
+        # Остаются только поиск выбранного вопроса полем формы и проверка
+        # внешнего ключа моделью; clean() и ограничения строк не запрашивают.
+        assert large - small == 2 * (len(targets) - 5)
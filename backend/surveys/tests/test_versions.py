@@ -0,0 +1,200 @@
+import json
+import zlib
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework import status
+
+from surveys.flow_graph import FlowGraph
+from surveys.models import QuestionFlow, Response, SurveyVersion
+from surveys.responses import Submission, SubmittedItem
+from surveys.spool import ResponseSpool
+from surveys.versions import (
+    forget_versions,
+    get_version,
+    load_snapshot,
+    publish_survey,
+)
+
+
+@pytest.mark.django_db
+class TestPublishSurvey:
+    def test_snapshot_roundtrip(self, branching_survey):
+        survey = branching_survey["survey"]
+        published = publish_survey(survey.id)
+        assert published.number == 1
+        assert publish_survey(survey.id).number == 2
+
+        forget_versions()
+        loaded = get_version(survey.id, 1)
+        live = FlowGraph.build(survey.id)
+        assert loaded.id == published.id
+        assert loaded.title == survey.title
+        assert loaded.graph.question_ids == live.question_ids
+        assert dict(loaded.graph.payloads) == dict(live.payloads)
+        assert loaded.graph.routing_table() == live.routing_table()
+
+    def test_snapshot_without_routing_fields(self, branching_survey):
+        survey = branching_survey["survey"]
+        published = publish_survey(survey.id)
+        data = json.loads(zlib.decompress(SurveyVersion.objects.get().snapshot))
+        # Так выглядели снимки до стратегий перехода и приоритетов связей.
+        data["questions"] = [question[:6] for question in data["questions"]]
+        data["edges"] = [edge[:5] for edge in data["edges"]]
+        old = zlib.compress(json.dumps(data).encode())
+
+        loaded = load_snapshot(published.id, survey.id, 1, old)
+        assert loaded.graph.routing_table() == published.graph.routing_table()
+
+    def test_version_is_immutable(self, branching_survey):
+        published = publish_survey(branching_survey["survey"].id)
+        version = SurveyVersion.objects.get(pk=published.id)
+        with pytest.raises(ValueError):
+            version.save()
+
+    def test_empty_survey(self, survey):
+        with pytest.raises(ValidationError):
+            publish_survey(survey.id)
+
+    def test_retry_inside_outer_transaction(self, branching_survey, monkeypatch):
+        survey = branching_survey["survey"]
+        create = SurveyVersion.objects.create
+        calls = []
+
+        def racing_create(**fields):
+            # Первая попытка проигрывает гонку: тот же номер уже занят.
+            calls.append(fields["number"])
+            if len(calls) == 1:
+                create(**fields)
+            return create(**fields)
+
+        monkeypatch.setattr(SurveyVersion.objects, "create", racing_create)
+        with transaction.atomic():
+            published = publish_survey(survey.id)
+            assert SurveyVersion.objects.filter(survey=survey).count() == 1
+        assert calls == [1, 1]
+        assert published.number == 1
+
+
+@pytest.mark.django_db
+class TestVersionedNavigation:
+    def url(self, survey):
+        return reverse("survey-next", kwargs={"survey_id": survey.id})
+
+    def test_version_ignores_later_edits(
+        self, authenticated_client, branching_survey, django_assert_num_queries
+    ):
+        survey = branching_survey["survey"]
+        first, second, third = branching_survey["questions"]
+        yes = branching_survey["answers"][0]
+        publish_survey(survey.id)
+        QuestionFlow.objects.filter(source_answer=yes).delete()
+
+        response = authenticated_client.get(self.url(survey))
+        assert response.data["version"] == 1
+        assert response.data["question"]["id"] == first.id
+
+        params = {"question": first.id, "answers": yes.id, "version": 1}
+        with django_assert_num_queries(0):
+            response = authenticated_client.get(self.url(survey), params)
+        assert response.data["question"]["id"] == second.id
+
+        live = authenticated_client.get(
+            self.url(survey), {"question": first.id, "answers": yes.id}
+        )
+        assert live.data["question"]["id"] == third.id
+        assert "version" not in live.data
+
+    def test_unpublished_survey_uses_live_graph(
+        self, authenticated_client, branching_survey
+    ):
+        response = authenticated_client.get(self.url(branching_survey["survey"]))
+        assert response.status_code == status.HTTP_200_OK
+        assert "version" not in response.data
+
+    def test_unknown_version(self, authenticated_client, branching_survey):
+        response = authenticated_client.get(
+            self.url(branching_survey["survey"]), {"version": 5}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestVersionedResponses:
+    def test_session_is_pinned(self, authenticated_client, branching_survey):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        yes = branching_survey["answers"][0]
+        published = publish_survey(survey.id)
+
+        url = reverse("survey-responses", kwargs={"survey_id": survey.id})
+        response = authenticated_client.post(
+            url,
+            {
+                "session": "s1",
+                "version": 1,
+                "items": [{"question": first.id, "answers": [yes.id]}],
+            },
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Response.objects.get().version_id == published.id
+
+    def test_unknown_version(self, authenticated_client, branching_survey):
+        survey = branching_survey["survey"]
+        first = branching_survey["questions"][0]
+        url = reverse("survey-responses", kwargs={"survey_id": survey.id})
+        response = authenticated_client.post(
+            url,
+            {"session": "s1", "version": 3, "items": [{"question": first.id}]},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_spool_keeps_version(self, tmp_path, branching_survey):
+        spool = ResponseSpool(tmp_path / "spool.sqlite3")
+        first = branching_survey["questions"][0]
+        submission = Submission(
+            branching_survey["survey"].id,
+            "s1",
+            (SubmittedItem(first.id, (), ""),),
+            False,
+            2,
+        )
+        spool.append(submission)
+        assert spool.pending(1)[0].submission == submission
+
+
+@pytest.mark.django_db
+class TestPublishAPI:
+    def test_publish(self, authenticated_client, branching_survey):
+        url = reverse(
+            "survey-publish", kwargs={"survey_id": branching_survey["survey"].id}
+        )
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert (response.data["version"], response.data["questions"]) == (1, 3)
+
+    def test_empty_survey(self, authenticated_client, survey):
+        url = reverse("survey-publish", kwargs={"survey_id": survey.id})
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unknown_survey(self, authenticated_client):
+        url = reverse("survey-publish", kwargs={"survey_id": 999999})
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_admin_action(self, client, branching_survey, django_user_model):
+        client.force_login(
+            baker.make(django_user_model, is_staff=True, is_superuser=True)
+        )
+        survey = branching_survey["survey"]
+        client.post(
+            reverse("admin:surveys_survey_changelist"),
+            {"action": "publish", "_selected_action": [survey.id]},
+        )
+        assert survey.versions.count() == 1
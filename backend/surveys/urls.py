@@ -1,11 +1,83 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from surveys.views import QuestionFlowViewSet
+from surveys.views import (
+    QuestionFlowViewSet,
+    ResponseSpoolView,
+    SurveyCacheView,
+    SurveyAnalysisView,
+    SurveyAnswersView,
+    SurveyBundleView,
+    SurveyCloneView,
+    SurveyExportView,
+    SurveyLayoutView,
+    SurveyNavigationView,
+    SurveyPublishView,
+    SurveyResponseView,
+    SurveySessionView,
+    SurveyStatisticsView,
+)
 
 router = DefaultRouter()
 router.register(r"question-flow", QuestionFlowViewSet, basename="questionflow")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("responses/spool/", ResponseSpoolView.as_view(), name="response-spool"),
+    path("cache/", SurveyCacheView.as_view(), name="survey-cache"),
+    path(
+        "<int:survey_id>/next/",
+        SurveyNavigationView.as_view(),
+        name="survey-next",
+    ),
+    path(
+        "<int:survey_id>/bundle/",
+        SurveyBundleView.as_view(),
+        name="survey-bundle",
+    ),
+    path(
+        "<int:survey_id>/questions/<int:question_id>/answers/",
+        SurveyAnswersView.as_view(),
+        name="survey-answers",
+    ),
+    path(
+        "<int:survey_id>/analysis/",
+        SurveyAnalysisView.as_view(),
+        name="survey-analysis",
+    ),
+    path(
+        "<int:survey_id>/layout/",
+        SurveyLayoutView.as_view(),
+        name="survey-layout",
+    ),
+    path(
+        "<int:survey_id>/sessions/",
+        SurveySessionView.as_view(),
+        name="survey-sessions",
+    ),
+    path(
+        "<int:survey_id>/responses/",
+        SurveyResponseView.as_view(),
+        name="survey-responses",
+    ),
+    path(
+        "<int:survey_id>/statistics/",
+        SurveyStatisticsView.as_view(),
+        name="survey-statistics",
+    ),
+    path(
+        "<int:survey_id>/export/",
+        SurveyExportView.as_view(),
+        name="survey-export",
+    ),
+    path(
+        "<int:survey_id>/clone/",
+        SurveyCloneView.as_view(),
+        name="survey-clone",
+    ),
+    path(
+        "<int:survey_id>/publish/",
+        SurveyPublishView.as_view(),
+        name="survey-publish",
+    ),
 ]
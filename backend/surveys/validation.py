@@ -0,0 +1,293 @@
+"""Пакетная проверка связей между вопросами.
+
+Вместо нескольких запросов на каждую связь весь набор проверяется
+фиксированным числом запросов: существование вопросов, принадлежность
+ответов исходному вопросу и дубликаты — как с уже сохранёнными связями
+(ограничения ``unique_question_flow`` и ``unique_any_answer_flow``),
+так и внутри самого набора. Связи, замыкающие цикл, отсекаются по
+индексу достижимости опроса (см. ``surveys.reachability``). Условия
+связей разбираются, а упомянутые в них вопросы и ответы загружаются
+теми же запросами.
+"""
+
+from typing import NamedTuple
+
+from django.utils.translation import gettext_lazy as _
+
+from surveys.conditions import ConditionError, condition_references, parse_condition
+from surveys.constants import FLOW_TYPE_ANY_ANSWER, FLOW_TYPE_SPECIFIC_ANSWER
+from surveys.models import Answer, Question, QuestionFlow
+from surveys.reachability import find_cycle_pairs
+
+
+class FlowCandidate(NamedTuple):
+    """Связь, которую собираются сохранить; ``pk`` задан при изменении"""
+
+    pk: int | None
+    source_question_id: int
+    target_question_id: int
+    relationship_type: str
+    source_answer_id: int | None
+    condition: str = ""
+
+
+def flow_key(flow):
+    """Ключ уникальности связи в терминах ограничений модели"""
+    if flow.relationship_type == FLOW_TYPE_ANY_ANSWER:
+        return (flow.source_question_id, flow.target_question_id, FLOW_TYPE_ANY_ANSWER)
+    return (
+        flow.source_question_id,
+        flow.target_question_id,
+        flow.relationship_type,
+        flow.source_answer_id,
+    )
+
+
+def validate_flows(
+    candidates, *, question_surveys=None, answer_questions=None, ignored_pks=()
+):
+    """Проверяет набор связей фиксированным числом запросов.
+
+    ``question_surveys`` (вопрос -> опрос) и ``answer_questions``
+    (ответ -> вопрос) передаются,
+    когда эти данные уже загружены, например формой: тогда соответствующие
+    запросы не выполняются. ``ignored_pks`` — связи, которые удаляются
+    в той же операции и не должны считаться дубликатами.
+
+    Возвращает список словарей ошибок той же длины, что и ``candidates``;
+    пустой словарь означает, что связь корректна.
+    """
+    errors = [{} for _ in candidates]
+
+    def add_error(index, field, message):
+        errors[index].setdefault(field, []).append(message)
+
+    question_ids = set()
+    answer_ids = set()
+    references = {}
+    for index, flow in enumerate(candidates):
+        question_ids.update((flow.source_question_id, flow.target_question_id))
+        if flow.source_answer_id is not None:
+            answer_ids.add(flow.source_answer_id)
+        if flow.condition:
+            try:
+                references[index] = condition_references(
+                    parse_condition(flow.condition)
+                )
+            except ConditionError as error:
+                add_error(index, "condition", str(error))
+    for referenced_answers, referenced_questions in references.values():
+        answer_ids.update(referenced_answers)
+        question_ids.update(referenced_questions)
+    question_ids.discard(None)
+
+    if question_surveys is not None:
+        question_surveys = dict(question_surveys)
+    else:
+        question_surveys = dict(
+            Question.objects.filter(pk__in=question_ids).values_list("id", "survey_id")
+        )
+    answer_questions = dict(answer_questions or {})
+    missing_answers = answer_ids - answer_questions.keys()
+    if missing_answers:
+        answer_questions.update(
+            Answer.objects.filter(pk__in=missing_answers).values_list(
+                "id", "question_id"
+            )
+        )
+
+    if references:
+        # Вопросы условий и вопросы их ответов нужны для проверки опроса.
+        missing_questions = {
+            answer_questions.get(answer_id)
+            for referenced_answers, _questions in references.values()
+            for answer_id in referenced_answers
+        }
+        for _answers, referenced_questions in references.values():
+            missing_questions.update(referenced_questions)
+        missing_questions -= question_surveys.keys()
+        missing_questions.discard(None)
+        if missing_questions:
+            question_surveys.update(
+                Question.objects.filter(pk__in=missing_questions).values_list(
+                    "id", "survey_id"
+                )
+            )
+
+    updated_pks = {flow.pk for flow in candidates if flow.pk is not None}
+    updated_pks.update(ignored_pks)
+    existing_keys = {
+        flow_key(flow)
+        for flow in QuestionFlow.objects.filter(
+            source_question_id__in={f.source_question_id for f in candidates},
+            target_question_id__in={f.target_question_id for f in candidates},
+        )
+        .exclude(pk__in=updated_pks)
+        .values_list(
+            "pk",
+            "source_question_id",
+            "target_question_id",
+            "relationship_type",
+            "source_answer_id",
+            named=True,
+        )
+    }
+
+    batch_keys = set()
+    for index, flow in enumerate(candidates):
+        for field in ("source_question", "target_question"):
+            question_id = getattr(flow, f"{field}_id")
+            if question_id is not None and question_id not in question_surveys:
+                add_error(index, field, _("Вопрос не найден"))
+
+        source_survey = question_surveys.get(flow.source_question_id)
+        target_survey = question_surveys.get(flow.target_question_id)
+        if (
+            None not in (source_survey, target_survey)
+            and source_survey != target_survey
+        ):
+            add_error(
+                index,
+                "target_question",
+                _("Целевой вопрос должен принадлежать тому же опросу"),
+            )
+
+        if flow.source_question_id == flow.target_question_id:
+            add_error(
+                index,
+                "non_field_errors",
+                _("Исходный и целевой вопросы не могут совпадать"),
+            )
+
+        if flow.source_answer_id is not None:
+            answer_question_id = answer_questions.get(flow.source_answer_id)
+            if answer_question_id is None:
+                add_error(index, "source_answer", _("Ответ не найден"))
+            elif answer_question_id != flow.source_question_id:
+                add_error(
+                    index,
+                    "source_answer",
+                    _("Выбранный ответ должен принадлежать исходному вопросу"),
+                )
+        elif flow.relationship_type == FLOW_TYPE_SPECIFIC_ANSWER:
+            add_error(
+                index,
+                "source_answer",
+                _("Для связи по конкретному ответу необходимо указать ответ"),
+            )
+
+        if index in references and source_survey is not None:
+            referenced_answers, referenced_questions = references[index]
+            for answer_id in sorted(referenced_answers):
+                question_id = answer_questions.get(answer_id)
+                if question_surveys.get(question_id) != source_survey:
+                    add_error(
+                        index,
+                        "condition",
+                        _("Ответ {id} из условия не найден в опросе").format(
+                            id=answer_id
+                        ),
+                    )
+            for question_id in sorted(referenced_questions):
+                if question_surveys.get(question_id) != source_survey:
+                    add_error(
+                        index,
+                        "condition",
+                        _("Вопрос {id} из условия не найден в опросе").format(
+                            id=question_id
+                        ),
+                    )
+
+        key = flow_key(flow)
+        if None in key[:2]:
+            # Без вопросов уникальность проверить нельзя; об отсутствующем
+            # вопросе сообщит проверка обязательного поля.
+            continue
+        if key in existing_keys:
+            add_error(index, "non_field_errors", _("Такая связь уже существует"))
+        elif key in batch_keys:
+            add_error(index, "non_field_errors", _("Связь повторяется в одном запросе"))
+        batch_keys.add(key)
+
+    _check_cycles(candidates, errors, question_surveys, updated_pks)
+    return errors
+
+
+def _check_cycles(candidates, errors, question_surveys, replaced_pks):
+    """Отмечает связи, которые вместе с остальным набором замкнут цикл.
+
+    Изменяемые и удаляемые связи сначала убираются из графа, поэтому
+    перестановка связей внутри одного набора циклом не считается.
+    """
+    added = {}
+    for index, flow in enumerate(candidates):
+        survey_id = question_surveys.get(flow.source_question_id)
+        if not errors[index] and survey_id is not None and flow.target_question_id:
+            pair = (flow.source_question_id, flow.target_question_id)
+            added.setdefault(survey_id, []).append((index, pair))
+    if not added:
+        return
+
+    removed = {}
+    if replaced_pks:
+        for source, target in QuestionFlow.objects.filter(
+            pk__in=replaced_pks
+        ).values_list("source_question_id", "target_question_id"):
+            survey_id = question_surveys.get(source)
+            if survey_id is not None:
+                removed.setdefault(survey_id, []).append((source, target))
+
+    for survey_id, items in added.items():
+        cycle_pairs = find_cycle_pairs(
+            survey_id, [pair for _, pair in items], removed.get(survey_id, ())
+        )
+        for index, pair in items:
+            if pair in cycle_pairs:
+                errors[index].setdefault("non_field_errors", []).append(
+                    _("Связь создаёт цикл в опросе")
+                )
+
+
+def validate_flow_instances(flows, ignored_pks=()):
+    """Проверяет несохранённые экземпляры ``QuestionFlow``.
+
+    Уже загруженные связанные объекты используются вместо запросов,
+    поэтому для экземпляров из форм обычно выполняется один запрос
+    (не считая первой сборки индекса достижимости опроса).
+    """
+    question_surveys = {}
+    answer_questions = {}
+    for flow in flows:
+        for field in ("source_question", "target_question"):
+            if QuestionFlow._meta.get_field(field).is_cached(flow):
+                question = getattr(flow, field)
+                if question is not None:
+                    question_surveys[question.pk] = question.survey_id
+        if QuestionFlow._meta.get_field("source_answer").is_cached(flow) and (
+            flow.source_answer is not None
+        ):
+            answer_questions[flow.source_answer_id] = flow.source_answer.question_id
+
+    candidates = [
+        FlowCandidate(
+            pk=flow.pk,
+            source_question_id=flow.source_question_id,
+            target_question_id=flow.target_question_id,
+            relationship_type=flow.relationship_type,
+            source_answer_id=flow.source_answer_id,
+            condition=flow.condition,
+        )
+        for flow in flows
+    ]
+    questions_loaded = all(
+        question_id in question_surveys
+        for flow in candidates
+        for question_id in (flow.source_question_id, flow.target_question_id)
+        if question_id is not None
+    )
+    return validate_flows(
+        candidates,
+        question_surveys=question_surveys if questions_loaded else None,
+        answer_questions=answer_questions,
+        ignored_pks=ignored_pks,
+    )
@@ -0,0 +1,224 @@
+"""Опубликованные версии опросов.
+
+Публикация замораживает текущую структуру опроса в неизменяемый снимок:
+сжатый компактный JSON с вопросами, вариантами ответов и связями. Сессии
+респондентов закрепляются за версией, а навигация по версии собирает
+граф из снимка. Снимок никогда не меняется, поэтому граф версии
+кешируется в памяти процесса по номеру версии без сброса по сигналам.
+"""
+
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils.translation import gettext_lazy as _
+
+from surveys.flow_graph import AnswerNode, FlowEdge, FlowGraph, QuestionNode
+from surveys.models import Survey, SurveyVersion
+
+SNAPSHOT_FORMAT = 1
+# Сколько графов версий держать в памяти процесса.
+VERSION_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True, slots=True)
+class PublishedVersion:
+    """Версия опроса с графом, собранным из снимка"""
+
+    id: int
+    survey_id: int
+    number: int
+    title: str
+    description: str
+    graph: FlowGraph
+
+
+def dump_snapshot(survey, graph):
+    """Сериализует структуру опроса в сжатый снимок"""
+    data = {
+        "format": SNAPSHOT_FORMAT,
+        "title": survey.title,
+        "description": survey.description,
+        "questions": [
+            [
+                question.id,
+                question.text,
+                question.question_type,
+                question.order,
+                question.is_required,
+                [[answer.id, answer.text, answer.order] for answer in question.answers],
+                question.flow_resolution,
+                question.fallback_to_next,
+            ]
+            for question in map(graph.questions.get, graph.question_ids)
+        ],
+        "edges": [
+            [
+                edge.id,
+                edge.source_question_id,
+                edge.target_question_id,
+                edge.relationship_type,
+                edge.source_answer_id,
+                edge.priority,
+                edge.condition,
+            ]
+            for edge in graph.edges
+        ],
+    }
+    return zlib.compress(
+        json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    )
+
+
+def load_snapshot(version_id, survey_id, number, snapshot):
+    """Собирает версию опроса из снимка"""
+    data = json.loads(zlib.decompress(snapshot))
+    if data["format"] != SNAPSHOT_FORMAT:
+        raise ValueError(f"Неизвестный формат снимка: {data['format']}")
+    # Снимки, опубликованные до появления стратегий перехода, приоритетов
+    # и условий, короче: недостающие поля берутся по умолчанию.
+    questions = [
+        QuestionNode(
+            question_id,
+            text,
+            question_type,
+            order,
+            is_required,
+            tuple(AnswerNode(*answer) for answer in answers),
+            *routing,
+        )
+        for question_id, text, question_type, order, is_required, answers, *routing in (
+            data["questions"]
+        )
+    ]
+    edges = [FlowEdge(*edge) for edge in data["edges"]]
+    return PublishedVersion(
+        id=version_id,
+        survey_id=survey_id,
+        number=number,
+        title=data["title"],
+        description=data["description"],
+        graph=FlowGraph(survey_id, questions, edges),
+    )
+
+
+_versions = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(version):
+    with _lock:
+        _versions[(version.survey_id, version.number)] = version
+        _versions.move_to_end((version.survey_id, version.number))
+        while len(_versions) > VERSION_CACHE_SIZE:
+            _versions.popitem(last=False)
+
+
+def publish_survey(survey_id):
+    """Публикует текущую структуру опроса как новую версию.
+
+    Структура читается внутри транзакции тремя запросами, номер версии
+    на единицу больше последнего. Одновременная публикация того же
+    опроса повторяется один раз после нарушения уникальности номера.
+    Каждая попытка выполняется в своём ``atomic()``: внутри транзакции
+    вызывающего (действия админки, ``ATOMIC_REQUESTS``) это точка
+    сохранения, поэтому ошибка первой попытки откатывается до неё и не
+    ломает внешнюю транзакцию.
+    """
+    try:
+        with transaction.atomic():
+            return _publish(survey_id)
+    except IntegrityError:
+        with transaction.atomic():
+            return _publish(survey_id)
+
+
+def _publish(survey_id):
+    survey = Survey.objects.select_for_update().get(pk=survey_id)
+    graph = FlowGraph.build(survey_id)
+    if not graph.question_ids:
+        raise ValidationError(_("В опросе нет вопросов"))
+    number = (survey.versions.aggregate(last=Max("number"))["last"] or 0) + 1
+    snapshot = dump_snapshot(survey, graph)
+    version = SurveyVersion.objects.create(
+        survey=survey, number=number, snapshot=snapshot
+    )
+    published = PublishedVersion(
+        id=version.pk,
+        survey_id=survey_id,
+        number=number,
+        title=survey.title,
+        description=survey.description,
+        graph=graph,
+    )
+    transaction.on_commit(lambda: _remember(published))
+    return published
+
+
+def get_version(survey_id, number):
+    """Возвращает версию опроса по номеру или None.
+
+    Первый вызов читает снимок одним запросом, дальше версия отдаётся
+    из памяти без обращения к базе данных.
+    """
+    key = (survey_id, number)
+    version = _versions.get(key)
+    if version is not None:
+        return version
+
+    row = (
+        SurveyVersion.objects.filter(survey_id=survey_id, number=number)
+        .values_list("id", "snapshot")
+        .first()
+    )
+    if row is None:
+        return None
+    version = load_snapshot(row[0], survey_id, number, bytes(row[1]))
+    _remember(version)
+    return version
+
+
+def get_latest_version(survey_id):
+    """Последняя опубликованная версия опроса или None"""
+    number = (
+        SurveyVersion.objects.filter(survey_id=survey_id)
+        .order_by("-number")
+        .values_list("number", flat=True)
+        .first()
+    )
+    return None if number is None else get_version(survey_id, number)
+
+
+async def aget_version(survey_id, number):
+    """Асинхронный ``get_version``"""
+    version = _versions.get((survey_id, number))
+    if version is not None:
+        return version
+    return await sync_to_async(get_version)(survey_id, number)
+
+
+async def aget_latest_version(survey_id):
+    """Асинхронный ``get_latest_version``"""
+    number = await (
+        SurveyVersion.objects.filter(survey_id=survey_id)
+        .order_by("-number")
+        .values_list("number", flat=True)
+        .afirst()
+    )
+    return None if number is None else await aget_version(survey_id, number)
+
+
+def forget_versions(survey_id=None):
+    """Убирает из памяти версии удалённого опроса, а без аргумента — все"""
+    with _lock:
+        if survey_id is None:
+            _versions.clear()
+            return
+        for key in [key for key in _versions if key[0] == survey_id]:
+            del _versions[key]
@@ -1,13 +1,620 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from surveys.models import QuestionFlow
-from surveys.serializers import QuestionFlowSerializer
+from surveys import reachability
+from surveys.authentication import (
+    CachedTokenAuthentication,
+    RespondentTokenAuthentication,
+)
+from surveys.bundle import bundle_response, get_bundle, get_survey_state, is_fresh
+from surveys.cache import cache_stats
+from surveys.cloning import clone_survey
+from surveys.constants import QUESTION_FLOW_TYPES
+from surveys.flow_graph import get_flow_graph, invalidate_question_graphs
+from surveys.export import EXPORT_FORMATS, EXPORT_PARTS, iter_export
+from surveys.graph_analysis import analyze
+from surveys.layout import get_layout, layout_response
+from surveys.models import QuestionFlow, Survey
+from surveys.navigation import (
+    answers_data,
+    navigation_data,
+    parse_names,
+    version_number,
+)
+from surveys.pagination import QuestionFlowCursorPagination
+from surveys.permissions import IsSurveyRespondent
+from surveys.respondents import (
+    RespondentSession,
+    respondent_graph,
+    respondent_navigation,
+    start_session,
+)
+from surveys.responses import (
+    Submission,
+    SubmittedItem,
+    item_errors,
+    save_response,
+    submission_graph,
+)
+from surveys.spool import get_spool
+from surveys.statistics import survey_statistics
+from surveys.serializers import (
+    QuestionFlowBulkDeleteSerializer,
+    QuestionFlowBulkItemSerializer,
+    QuestionFlowSerializer,
+    ResponseSubmissionSerializer,
+)
+from surveys.validation import FlowCandidate, validate_flows
+from surveys.versions import get_latest_version, get_version, publish_survey
 
 
 class QuestionFlowViewSet(viewsets.ModelViewSet):
+    """CRUD связей между вопросами.
+
+    Список поддерживает курсорную пагинацию, фильтры ``survey``,
+    ``source_question``, ``target_question``, ``relationship_type`` и
+    разворачивание связанных объектов через ``expand`` (через запятую).
+    Связанные объекты подгружаются JOIN-ом, поэтому число запросов
+    не зависит от размера страницы.
+    """
+
     queryset = QuestionFlow.objects.all()
     serializer_class = QuestionFlowSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = QuestionFlowCursorPagination
+    bulk_max_items = 5000
+    bulk_batch_size = 500
+    filter_fields = {
+        "survey": "source_question__survey_id",
+        "source_question": "source_question_id",
+        "target_question": "target_question_id",
+    }
+
+    def get_expand(self):
+        if not hasattr(self, "_expand"):
+            expand = parse_names(self.request.query_params.getlist("expand"))
+            unknown = set(expand) - set(QuestionFlowSerializer.expandable_fields)
+            if unknown:
+                raise ValidationError(
+                    {
+                        "expand": [
+                            _("Неизвестные поля: {fields}").format(
+                                fields=", ".join(sorted(unknown))
+                            )
+                        ]
+                    }
+                )
+            self._expand = expand
+        return self._expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        expand = self.get_expand()
+        if expand:
+            queryset = queryset.select_related(*expand)
+        if self.action != "list":
+            return queryset
+
+        params = self.request.query_params
+        filters = {}
+        for param, lookup in self.filter_fields.items():
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                filters[lookup] = int(value)
+            except ValueError:
+                raise ValidationError(
+                    {param: [_("Идентификатор должен быть целым числом")]}
+                )
+        relationship_type = params.get("relationship_type")
+        if relationship_type is not None:
+            if relationship_type not in dict(QUESTION_FLOW_TYPES):
+                raise ValidationError(
+                    {"relationship_type": [_("Неизвестный тип связи")]}
+                )
+            filters["relationship_type"] = relationship_type
+        return queryset.filter(**filters)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+    @action(detail=False, methods=["post", "put", "delete"], url_path="bulk")
+    def bulk(self, request):
+        """Массовое создание (POST), изменение (PUT) и удаление (DELETE) связей.
+
+        Все связи проверяются вместе фиксированным числом запросов и
+        записываются одной транзакцией. При ошибке ничего не сохраняется,
+        а в ответе перечисляются ошибки по индексам элементов.
+        """
+        if request.method == "DELETE":
+            return self._bulk_delete(request)
+
+        is_update = request.method == "PUT"
+        # Размер проверяется до сериализатора, чтобы слишком большой набор
+        # не проверялся поэлементно.
+        if isinstance(request.data, list) and len(request.data) > self.bulk_max_items:
+            raise ValidationError(
+                _("За один запрос можно передать не более {count} связей").format(
+                    count=self.bulk_max_items
+                )
+            )
+        serializer = QuestionFlowBulkItemSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return self._bulk_errors(serializer.errors)
+        items = serializer.validated_data
+
+        errors = [{} for _ in items]
+        old_sources = {}
+        if is_update:
+            ids = [item.get("id") for item in items]
+            old_sources = dict(
+                QuestionFlow.objects.filter(pk__in=ids).values_list(
+                    "id", "source_question_id"
+                )
+            )
+            seen = set()
+            for index, pk in enumerate(ids):
+                if pk is None:
+                    errors[index]["id"] = [_("Обязательное поле.")]
+                elif pk not in old_sources:
+                    errors[index]["id"] = [_("Связь не найдена")]
+                elif pk in seen:
+                    errors[index]["id"] = [_("Связь повторяется в одном запросе")]
+                seen.add(pk)
+
+        candidates = [
+            FlowCandidate(
+                pk=item.get("id") if is_update else None,
+                source_question_id=item["source_question"],
+                target_question_id=item["target_question"],
+                relationship_type=item["relationship_type"],
+                source_answer_id=item.get("source_answer"),
+                condition=item["condition"],
+            )
+            for item in items
+        ]
+        for index, flow_errors in enumerate(validate_flows(candidates)):
+            for field, messages in flow_errors.items():
+                errors[index].setdefault(field, []).extend(messages)
+        if any(errors):
+            return self._bulk_errors(errors)
+
+        now = timezone.now()
+        flows = [
+            QuestionFlow(
+                pk=flow.pk,
+                source_question_id=flow.source_question_id,
+                target_question_id=flow.target_question_id,
+                relationship_type=flow.relationship_type,
+                source_answer_id=flow.source_answer_id,
+                priority=item["priority"],
+                condition=flow.condition,
+                updated_at=now,
+            )
+            for flow, item in zip(candidates, items)
+        ]
+        try:
+            with transaction.atomic():
+                if is_update:
+                    QuestionFlow.objects.bulk_update(
+                        flows,
+                        [
+                            "source_question",
+                            "target_question",
+                            "relationship_type",
+                            "source_answer",
+                            "priority",
+                            "condition",
+                            "updated_at",
+                        ],
+                        batch_size=self.bulk_batch_size,
+                    )
+                else:
+                    QuestionFlow.objects.bulk_create(
+                        flows, batch_size=self.bulk_batch_size
+                    )
+        except IntegrityError:
+            return Response(
+                {"detail": _("Сохранение нарушает уникальность связей")},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # Массовые операции не отправляют сигналы, поэтому сбрасываем графы сами.
+        source_ids = {flow.source_question_id for flow in flows}
+        source_ids.update(old_sources.values())
+        invalidate_question_graphs(source_ids)
+        if is_update:
+            for source in source_ids:
+                reachability.edge_changed(source)
+        else:
+            for flow in flows:
+                reachability.edge_added(
+                    flow.source_question_id, flow.target_question_id
+                )
+        return Response(
+            QuestionFlowSerializer(flows, many=True).data,
+            status=status.HTTP_200_OK if is_update else status.HTTP_201_CREATED,
+        )
+
+    def _bulk_delete(self, request):
+        serializer = QuestionFlowBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = QuestionFlow.objects.filter(pk__in=serializer.validated_data["ids"])
+        with transaction.atomic():
+            source_ids = set(queryset.values_list("source_question_id", flat=True))
+            deleted, _details = queryset.delete()
+        invalidate_question_graphs(source_ids)
+        return Response({"deleted": deleted})
+
+    def _bulk_errors(self, errors):
+        if isinstance(errors, list):
+            errors = [
+                {"index": index, "errors": item_errors}
+                for index, item_errors in enumerate(errors)
+                if item_errors
+            ]
+        return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SurveyNavigationView(APIView):
+    """Следующий вопрос опроса по текущему вопросу и выбранным ответам.
+
+    Без параметра ``question`` возвращает первый вопрос опроса. Ответы
+    передаются параметром ``answers``: повторением или через запятую.
+    Маршрут вычисляется по скомпилированному графу без запросов к базе.
+
+    Параметр ``version`` ведёт по опубликованной версии опроса. Первый
+    вопрос опубликованного опроса отдаётся по последней версии, и её
+    номер возвращается в ответе, чтобы клиент закрепил сессию за ней.
+
+    Респондент с токеном сессии идёт по версии из токена, без
+    ``question`` получает текущий вопрос сессии, а в ответе — новый токен.
+    """
+
+    authentication_classes = [CachedTokenAuthentication, RespondentTokenAuthentication]
+    permission_classes = [IsAuthenticated | IsSurveyRespondent]
+
+    def get(self, request, survey_id):
+        if isinstance(request.auth, RespondentSession):
+            graph = respondent_graph(survey_id, request.auth)
+            return Response(
+                respondent_navigation(graph, request.auth, request.query_params)
+            )
+
+        number = version_number(request.query_params)
+        version = None
+        if number is not None:
+            version = get_version(survey_id, number)
+            if version is None:
+                raise NotFound(_("Версия опроса не найдена"))
+        elif "question" not in request.query_params:
+            version = get_latest_version(survey_id)
+
+        graph = version.graph if version is not None else get_flow_graph(survey_id)
+        return Response(navigation_data(graph, version, request.query_params))
+
+
+class SurveyBundleView(APIView):
+    """Весь опрос одним ответом с таблицей маршрутов для офлайн-навигации.
+
+    Ответ кешируется в виде байтов и отдаётся с сильным ETag. Повторный
+    запрос с совпадающим ``If-None-Match`` получает 304 после одного
+    запроса версии к базе данных.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, survey_id):
+        state = get_survey_state(survey_id)
+        if state is None:
+            raise NotFound(_("Опрос не найден"))
+
+        body = None if is_fresh(request, state) else get_bundle(state)
+        return bundle_response(state, body)
+
+
+class SurveyAnswersView(APIView):
+    """Упорядоченные варианты ответа вопроса из скомпилированного графа"""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, survey_id, question_id):
+        return Response(answers_data(get_flow_graph(survey_id), question_id))
+
+
+class SurveyAnalysisView(APIView):
+    """Циклы, недостижимые вопросы, тупики и самый длинный путь опроса"""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, survey_id):
+        graph = get_flow_graph(survey_id)
+        if not graph.question_ids:
+            raise NotFound(_("Опрос не найден"))
+        return Response(analyze(graph).as_dict())
+
+
+class SurveyLayoutView(APIView):
+    """Граф опроса с послойной раскладкой для визуализации.
+
+    Раскладка вычисляется один раз на версию опроса (или на текущую
+    структуру до её изменения) и отдаётся готовыми байтами с ETag.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, survey_id):
+        layout = get_layout(survey_id, version_number(request.query_params))
+        return layout_response(request, layout)
+
+
+class SurveySessionView(APIView):
+    """Начало анонимной сессии респондента.
+
+    Возвращает подписанный токен сессии и первый вопрос. Сессия
+    закрепляется за последней опубликованной версией опроса, если она
+    есть. Ни пользователь, ни строки в базе для сессии не создаются.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, survey_id):
+        version = get_latest_version(survey_id)
+        graph = version.graph if version is not None else get_flow_graph(survey_id)
+        if not graph.question_ids:
+            raise NotFound(_("Опрос не найден"))
+        respondent = start_session(
+            survey_id,
+            version.number if version is not None else None,
+            graph.first_question_id,
+        )
+        data = respondent_navigation(graph, respondent, {})
+        data["session"] = respondent.session
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class SurveyResponseView(APIView):
+    """Приём ответов респондента: всей сессии или её части.
+
+    Ответы проверяются по скомпилированному графу опроса и сохраняются
+    пакетной вставкой, поэтому число запросов не зависит от количества
+    вопросов в сессии. Если включена отложенная запись, отправка только
+    ставится в очередь, а в ответе возвращается 202 без номера сессии.
+
+    Для респондента с токеном сессии ключ сессии и версия берутся из
+    токена, а не из тела запроса.
+    """
+
+    authentication_classes = [CachedTokenAuthentication, RespondentTokenAuthentication]
+    permission_classes = [IsAuthenticated | IsSurveyRespondent]
+
+    def post(self, request, survey_id):
+        respondent = (
+            request.auth if isinstance(request.auth, RespondentSession) else None
+        )
+        serializer = ResponseSubmissionSerializer(
+            data=request.data, context={"respondent": respondent}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if respondent is not None:
+            data["session"] = respondent.session
+            data["version"] = respondent.version
+
+        graph = submission_graph(survey_id, data["version"])[1]
+        if graph is None:
+            raise NotFound(_("Версия опроса не найдена"))
+        if not graph.question_ids:
+            raise NotFound(_("Опрос не найден"))
+
+        items = [
+            SubmittedItem(
+                question_id=item["question"],
+                answer_ids=tuple(dict.fromkeys(item["answers"])),
+                text=item["text"],
+            )
+            for item in data["items"]
+        ]
+        errors = item_errors(graph, items)
+        if any(errors):
+            raise ValidationError({"items": errors})
+
+        spool = get_spool()
+        if spool is not None:
+            spool.append(
+                Submission(
+                    survey_id,
+                    data["session"],
+                    tuple(items),
+                    data["is_complete"],
+                    data["version"],
+                )
+            )
+            return Response(
+                {"session": data["session"], "is_complete": data["is_complete"]},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        try:
+            response = save_response(
+                survey_id,
+                data["session"],
+                items,
+                is_complete=data["is_complete"],
+                version=data["version"],
+            )
+        except IntegrityError:
+            # Версия ссылается на вопрос или ответ, удалённый после публикации.
+            return Response(
+                {"detail": _("Вопросы версии изменились, ответы не сохранены")},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            {
+                "id": response.pk,
+                "session": response.session_key,
+                "is_complete": response.is_complete,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class SurveyStatisticsView(APIView):
+    """Статистика ответов: сессии, отвалы по вопросам, доли вариантов и переходов.
+
+    Отдаётся из предвычисленных счётчиков, которые обновляются при
+    сохранении ответов, без агрегации сырых ответов.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+
+    def get(self, request, survey_id):
+        graph = get_flow_graph(survey_id)
+        if not graph.question_ids:
+            raise NotFound(_("Опрос не найден"))
+        return Response(survey_statistics(graph))
+
+
+class SurveyExportView(APIView):
+    """Потоковая выгрузка опроса и ответов.
+
+    Параметр ``output`` — ``csv`` (по умолчанию) или ``jsonl``; ``include``
+    — ``structure`` и/или ``responses`` через запятую. Строки читаются из
+    базы порциями и отдаются по мере чтения.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, survey_id):
+        export_format = request.query_params.get("output", "csv")
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {
+                    "output": [
+                        _("Допустимые форматы: {formats}").format(formats="csv, jsonl")
+                    ]
+                }
+            )
+        parts = parse_names(request.query_params.getlist("include")) or EXPORT_PARTS
+        unknown = set(parts) - set(EXPORT_PARTS)
+        if unknown:
+            raise ValidationError(
+                {
+                    "include": [
+                        _("Неизвестные части выгрузки: {parts}").format(
+                            parts=", ".join(sorted(unknown))
+                        )
+                    ]
+                }
+            )
+        if not Survey.objects.filter(pk=survey_id).exists():
+            raise NotFound(_("Опрос не найден"))
+
+        response = StreamingHttpResponse(
+            iter_export(survey_id, export_format, parts),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="survey-{survey_id}.{export_format}"'
+        )
+        return response
+
+
+class SurveyCloneView(APIView):
+    """Копия структуры опроса без ответов респондентов.
+
+    Вопросы, ответы и связи копируются пакетными вставками в одной
+    транзакции; в теле можно передать ``title`` нового опроса.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, survey_id):
+        title = request.data.get("title")
+        if title is not None and (not isinstance(title, str) or not title.strip()):
+            raise ValidationError({"title": [_("Название не может быть пустым")]})
+        try:
+            result = clone_survey(survey_id, title=title)
+        except Survey.DoesNotExist:
+            raise NotFound(_("Опрос не найден"))
+        return Response(
+            {
+                "id": result.survey.pk,
+                "title": result.survey.title,
+                "questions": len(result.questions),
+                "answers": len(result.answers),
+                "flows": len(result.flows),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class SurveyPublishView(APIView):
+    """Публикация текущей структуры опроса как неизменяемой версии"""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, survey_id):
+        try:
+            version = publish_survey(survey_id)
+        except Survey.DoesNotExist:
+            raise NotFound(_("Опрос не найден"))
+        except DjangoValidationError as error:
+            raise ValidationError(error.messages)
+        return Response(
+            {
+                "id": version.id,
+                "version": version.number,
+                "questions": len(version.graph.question_ids),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class ResponseSpoolView(APIView):
+    """Состояние очереди отложенной записи ответов: размер, отставание и
+    показатели последнего пакета, сохранённого ``flush_response_spool``.
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        spool = get_spool()
+        if spool is None:
+            raise NotFound(_("Отложенная запись ответов не включена"))
+        return Response(spool.metrics())
+
+
+class SurveyCacheView(APIView):
+    """Попадания и промахи кеша структуры опросов в этом процессе
+    (только для сотрудников).
+    """
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())